@@ -1,12 +1,16 @@
 from flask import Flask, jsonify
+import click
 from datetime import timedelta
 import os
 
 # Import extensions
 from extensions import db, jwt, migrate, cors
+from utils.serialization import APIJSONProvider
+from utils.cache import init_cache
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = APIJSONProvider(app)
 
 # Configuration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -22,12 +26,35 @@ app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
+app.config['CACHE_REDIS_URL'] = os.environ.get('CACHE_REDIS_URL') or os.environ.get('REDIS_URL')
+app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 300))
+app.config['RECEIPT_CACHE_MAX_BYTES'] = int(os.environ.get('RECEIPT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+# nginx internal location prefix for X-Accel-Redirect receipt downloads, e.g. /protected/
+app.config['RECEIPT_ACCEL_REDIRECT'] = os.environ.get('RECEIPT_ACCEL_REDIRECT')
 
 # Initialize extensions with app
 db.init_app(app)
+
+# pysqlite only opens a transaction right before DML, so a SAVEPOINT issued
+# first would start one of its own that RELEASE commits. Take transaction
+# control away from the driver and let SQLAlchemy emit BEGIN itself
+if database_url.startswith('sqlite'):
+    from sqlalchemy import event
+
+    with app.app_context():
+        sqlite_engine = db.engine
+
+    @event.listens_for(sqlite_engine, 'connect')
+    def _sqlite_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(sqlite_engine, 'begin')
+    def _sqlite_begin(connection):
+        connection.exec_driver_sql('BEGIN')
 jwt.init_app(app)
 migrate.init_app(app, db)
 cors.init_app(app, resources={r"/api/*": {"origins": "*"}})
+init_cache(app)
 
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -35,7 +62,7 @@ os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'receipts'), exist_ok=True
 os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'documents'), exist_ok=True)
 
 # Import routes
-from routes import auth_routes, money_routes, property_routes, dashboard_routes, receipt_routes
+from routes import auth_routes, money_routes, property_routes, dashboard_routes, receipt_routes, search_routes, sync_routes, job_routes, document_routes
 
 # Register blueprints
 app.register_blueprint(auth_routes.bp)
@@ -43,6 +70,10 @@ app.register_blueprint(money_routes.bp)
 app.register_blueprint(property_routes.bp)
 app.register_blueprint(dashboard_routes.bp)
 app.register_blueprint(receipt_routes.bp)
+app.register_blueprint(search_routes.bp)
+app.register_blueprint(sync_routes.bp)
+app.register_blueprint(job_routes.bp)
+app.register_blueprint(document_routes.bp)
 
 # ---------------------------
 # Root endpoint (NEW)
@@ -92,12 +123,29 @@ def check_if_token_revoked(jwt_header, jwt_payload):
 with app.app_context():
     try:
         # Import models to ensure they're registered
-        from models import AdminUser, Credit, Expense, Item, Distribution, Receipt
+        from models import AdminUser, Credit, Expense, Item, Distribution, Receipt, LedgerTotals, DailyRollup, Tombstone, TableVersion, ReceiptSequence, Job, OverdueDistribution, RefreshMark, DocumentUpload
         
         # Create all tables
         db.create_all()
         print("✓ Database tables created/verified")
         
+        # Seed running totals and rollups on first start against an existing database
+        from utils.ledger import ensure_totals, get_totals, rebuild_rollups
+        ensure_totals()
+        db.session.commit()
+        totals = get_totals()
+        if (totals.credit_count or totals.expense_count) and not DailyRollup.query.first():
+            rebuild_rollups()
+            db.session.commit()
+        
+        # Write counters behind ETags on read endpoints
+        from utils.versions import ensure_versions
+        ensure_versions()
+        
+        # Create (and backfill) the full-text search index
+        from utils.search import ensure_search_index
+        ensure_search_index()
+        
         # Create default admin user if not exists
         admin = AdminUser.query.filter_by(username='admin').first()
         if not admin:
@@ -117,6 +165,76 @@ with app.app_context():
         print(f"⚠ Error during initialization: {e}")
 
 
+@app.cli.command('rebuild-totals')
+def rebuild_totals_command():
+    """Recompute ledger totals, daily rollups and item stats from the base tables"""
+    from utils.ledger import rebuild_totals, rebuild_rollups, rebuild_item_stats
+    totals = rebuild_totals()
+    rollup_rows = rebuild_rollups()
+    lent_items = rebuild_item_stats()
+    db.session.commit()
+    print(f"✓ Ledger totals rebuilt: {totals.credit_count} credits, "
+          f"{totals.expense_count} expenses, {totals.item_count} items")
+    print(f"✓ Daily rollups rebuilt: {rollup_rows} rows")
+    print(f"✓ Item lending stats rebuilt: {lent_items} items lent")
+
+
+@app.cli.command('refresh-overdue')
+def refresh_overdue_command():
+    """Rebuild the overdue distributions set now instead of waiting for the worker"""
+    from utils.overdue import refresh_overdue
+    count = refresh_overdue()
+    db.session.commit()
+    print(f"✓ Overdue set refreshed: {count} distributions")
+
+
+@app.cli.command('gc-documents')
+def gc_documents_command():
+    """Delete expired uploads and expense documents no expense references"""
+    from utils.documents import collect_garbage
+    stats = collect_garbage(app.config['UPLOAD_FOLDER'])
+    print(f"✓ Removed {stats['expired_uploads']} expired uploads and "
+          f"{stats['orphaned_documents']} orphaned documents ({stats['bytes_freed']} bytes)")
+
+
+@app.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Re-index every searchable record"""
+    from utils.search import ensure_search_index, rebuild_search_index
+    if not ensure_search_index():
+        print("⚠ Full-text search is not available for this database")
+        return
+    count = rebuild_search_index()
+    db.session.commit()
+    print(f"✓ Search index rebuilt: {count} documents")
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if an endpoint query does a full table scan (SQLite) or a list endpoint runs N+1 queries"""
+    from utils.query_plans import run_query_plan_checks
+    raise SystemExit(run_query_plan_checks())
+
+
+@app.cli.command('bench-receipts')
+@click.option('--count', default=50, help='Receipts rendered per run')
+def bench_receipts_command(count):
+    """Report receipt PDF rendering throughput with and without the prepared renderer"""
+    from utils.pdf_generator import benchmark_receipts
+    rates = benchmark_receipts(count)
+    print(f"before (original code path): {rates['before']:.1f} receipts/sec")
+    print(f"after  (prepared renderer): {rates['after']:.1f} receipts/sec")
+
+
+@app.cli.command('worker')
+@click.option('--poll-interval', default=1.0, help='Seconds to wait when the queue is empty')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty')
+def worker_command(poll_interval, burst):
+    """Run queued background jobs (receipt generation, ...)"""
+    from utils.jobs import run_worker
+    run_worker(poll_interval=poll_interval, burst=burst)
+
+
 # Health check endpoint
 @app.route('/api/health', methods=['GET'])
 def health_check():
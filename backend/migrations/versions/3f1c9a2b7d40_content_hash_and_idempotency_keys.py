@@ -0,0 +1,60 @@
+"""content hash dedup columns and idempotency keys
+
+Revision ID: 3f1c9a2b7d40
+Revises: 
+Create Date: 2026-10-16 12:00:00.000000
+
+Tables are created by db.create_all() on startup, so fresh databases already
+have everything here; each step only runs when it is missing.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a2b7d40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _columns(inspector, table):
+    return {c['name'] for c in inspector.get_columns(table)}
+
+
+def _indexes(inspector, table):
+    return {i['name'] for i in inspector.get_indexes(table)}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    for table in ('credits', 'expenses'):
+        if 'content_hash' not in _columns(inspector, table):
+            op.add_column(table, sa.Column('content_hash', sa.String(length=64), nullable=True))
+        if f'ix_{table}_content_hash' not in _indexes(inspector, table):
+            op.create_index(f'ix_{table}_content_hash', table, ['content_hash'], unique=True)
+
+    if not inspector.has_table('idempotency_keys'):
+        op.create_table(
+            'idempotency_keys',
+            sa.Column('key', sa.String(length=255), nullable=False),
+            sa.Column('scope', sa.String(length=50), nullable=False),
+            sa.Column('fingerprint', sa.String(length=64), nullable=False),
+            sa.Column('status_code', sa.Integer(), nullable=False),
+            sa.Column('response_body', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('key')
+        )
+        op.create_index('ix_idempotency_keys_expires_at', 'idempotency_keys', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_keys_expires_at', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
+    for table in ('expenses', 'credits'):
+        op.drop_index(f'ix_{table}_content_hash', table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('content_hash')
@@ -0,0 +1,53 @@
+"""secondary indexes for list, summary and sync queries
+
+Revision ID: 8a4e2c6f1b93
+Revises: 3f1c9a2b7d40
+Create Date: 2026-10-16 13:00:00.000000
+
+Chosen from the EXPLAIN plans of the list/summary endpoints; run
+`flask check-query-plans` to verify none of them fall back to a table scan.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e2c6f1b93'
+down_revision = '3f1c9a2b7d40'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_credits_date_id', 'credits', ['date', 'id']),
+    ('ix_credits_created_at', 'credits', ['created_at']),
+    ('ix_credits_updated_at', 'credits', ['updated_at']),
+    ('ix_credits_donor_name_amount', 'credits', ['donor_name', 'amount']),
+    ('ix_expenses_date_id', 'expenses', ['date', 'id']),
+    ('ix_expenses_category_date_id', 'expenses', ['category', 'date', 'id']),
+    ('ix_expenses_updated_at', 'expenses', ['updated_at']),
+    ('ix_items_name_id', 'items', ['name', 'id']),
+    ('ix_items_updated_at', 'items', ['updated_at']),
+    ('ix_distributions_date_id', 'distributions', ['distribution_date', 'id']),
+    ('ix_distributions_status_date_id', 'distributions', ['status', 'distribution_date', 'id']),
+    ('ix_distributions_item_id', 'distributions', ['item_id']),
+    ('ix_distributions_updated_at', 'distributions', ['updated_at']),
+    ('ix_receipts_date_id', 'receipts', ['date', 'id']),
+    ('ix_receipts_created_at', 'receipts', ['created_at']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = {}
+    for name, table, columns in INDEXES:
+        if table not in existing:
+            existing[table] = {i['name'] for i in inspector.get_indexes(table)}
+        if name not in existing[table]:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
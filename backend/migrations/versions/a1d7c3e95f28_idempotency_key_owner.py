@@ -0,0 +1,52 @@
+"""scope idempotency keys to the user who sent them
+
+Revision ID: a1d7c3e95f28
+Revises: f4b8d2a6c913
+Create Date: 2026-10-18 09:00:00.000000
+
+Stored responses are replay caches with a 24 hour TTL and don't record who
+made the request, so the table is recreated with an (owner, key) primary
+key instead of being backfilled.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d7c3e95f28'
+down_revision = 'f4b8d2a6c913'
+branch_labels = None
+depends_on = None
+
+
+def _create_table(with_owner):
+    columns = [sa.Column('owner', sa.String(length=64), nullable=False)] if with_owner else []
+    op.create_table(
+        'idempotency_keys',
+        *columns,
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('scope', sa.String(length=50), nullable=False),
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=False),
+        sa.Column('response_body', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint(*(['owner', 'key'] if with_owner else ['key']))
+    )
+    op.create_index('ix_idempotency_keys_expires_at', 'idempotency_keys', ['expires_at'])
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {c['name'] for c in inspector.get_columns('idempotency_keys')}
+    if 'owner' not in columns:
+        op.drop_index('ix_idempotency_keys_expires_at', table_name='idempotency_keys')
+        op.drop_table('idempotency_keys')
+        _create_table(with_owner=True)
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_keys_expires_at', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
+    _create_table(with_owner=False)
@@ -0,0 +1,50 @@
+"""overdue distributions set and partial index on outstanding loans
+
+Revision ID: a9c4e1d72b58
+Revises: f1a8d3b56c27
+Create Date: 2026-10-16 19:00:00.000000
+
+The overdue set starts empty; the worker (or `flask refresh-overdue`)
+fills it.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e1d72b58'
+down_revision = 'f1a8d3b56c27'
+branch_labels = None
+depends_on = None
+
+OUTSTANDING = sa.text("status = 'distributed'")
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('overdue_distributions'):
+        op.create_table(
+            'overdue_distributions',
+            sa.Column('distribution_id', sa.Integer(), nullable=False),
+            sa.Column('item_id', sa.Integer(), nullable=False),
+            sa.Column('recipient_name', sa.String(length=255), nullable=False),
+            sa.Column('recipient_contact', sa.String(length=255), nullable=True),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.Column('distribution_date', sa.Date(), nullable=False),
+            sa.Column('expected_return_date', sa.Date(), nullable=False),
+            sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('distribution_id')
+        )
+
+    existing = {i['name'] for i in inspector.get_indexes('distributions')}
+    if 'ix_distributions_outstanding_return' not in existing:
+        op.create_index(
+            'ix_distributions_outstanding_return', 'distributions', ['expected_return_date'],
+            sqlite_where=OUTSTANDING, postgresql_where=OUTSTANDING
+        )
+
+
+def downgrade():
+    op.drop_index('ix_distributions_outstanding_return', table_name='distributions')
+    op.drop_table('overdue_distributions')
@@ -0,0 +1,96 @@
+"""per-item lending stats and an item history index
+
+Revision ID: b3e7d05f9a16
+Revises: a9c4e1d72b58
+Create Date: 2026-10-16 20:00:00.000000
+
+Stats are backfilled from existing distributions; `flask rebuild-totals`
+recomputes them the same way later.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e7d05f9a16'
+down_revision = 'a9c4e1d72b58'
+branch_labels = None
+depends_on = None
+
+STAT_COLUMNS = [
+    sa.Column('times_lent', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('returns_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('loan_days_total', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('last_return_condition', sa.String(length=50), nullable=True),
+]
+
+
+def _backfill(bind):
+    distributions = sa.table(
+        'distributions',
+        sa.column('id', sa.Integer), sa.column('item_id', sa.Integer),
+        sa.column('status', sa.String), sa.column('distribution_date', sa.Date),
+        sa.column('actual_return_date', sa.Date), sa.column('return_condition', sa.String)
+    )
+    items = sa.table(
+        'items',
+        sa.column('id', sa.Integer), sa.column('times_lent', sa.Integer),
+        sa.column('returns_count', sa.Integer), sa.column('loan_days_total', sa.Integer),
+        sa.column('last_return_condition', sa.String)
+    )
+    rows = bind.execute(
+        sa.select(
+            distributions.c.item_id, distributions.c.status, distributions.c.distribution_date,
+            distributions.c.actual_return_date, distributions.c.return_condition
+        ).order_by(distributions.c.actual_return_date, distributions.c.id)
+    )
+    stats = {}
+    for item_id, status, lent_on, returned_on, condition in rows:
+        entry = stats.setdefault(item_id, {
+            'b_id': item_id, 'times_lent': 0, 'returns_count': 0,
+            'loan_days_total': 0, 'last_return_condition': None
+        })
+        entry['times_lent'] += 1
+        if status == 'returned' and returned_on:
+            entry['returns_count'] += 1
+            entry['loan_days_total'] += max((returned_on - lent_on).days, 0)
+            if condition:
+                entry['last_return_condition'] = condition
+    if stats:
+        bind.execute(
+            items.update().where(items.c.id == sa.bindparam('b_id')).values(
+                times_lent=sa.bindparam('times_lent'),
+                returns_count=sa.bindparam('returns_count'),
+                loan_days_total=sa.bindparam('loan_days_total'),
+                last_return_condition=sa.bindparam('last_return_condition')
+            ),
+            list(stats.values())
+        )
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {c['name'] for c in inspector.get_columns('items')}
+    for column in STAT_COLUMNS:
+        if column.name not in columns:
+            op.add_column('items', column)
+    if 'times_lent' not in columns:
+        _backfill(bind)
+
+    indexes = {i['name'] for i in inspector.get_indexes('distributions')}
+    if 'ix_distributions_item_date_id' not in indexes:
+        op.create_index(
+            'ix_distributions_item_date_id', 'distributions', ['item_id', 'distribution_date', 'id']
+        )
+    if 'ix_distributions_item_id' in indexes:
+        op.drop_index('ix_distributions_item_id', table_name='distributions')
+
+
+def downgrade():
+    op.create_index('ix_distributions_item_id', 'distributions', ['item_id'])
+    op.drop_index('ix_distributions_item_date_id', table_name='distributions')
+    with op.batch_alter_table('items') as batch_op:
+        for column in reversed(STAT_COLUMNS):
+            batch_op.drop_column(column.name)
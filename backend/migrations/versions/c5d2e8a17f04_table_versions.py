@@ -0,0 +1,31 @@
+"""per-table write counters for ETags
+
+Revision ID: c5d2e8a17f04
+Revises: 8a4e2c6f1b93
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2e8a17f04'
+down_revision = '8a4e2c6f1b93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('table_versions'):
+        op.create_table(
+            'table_versions',
+            sa.Column('table_name', sa.String(length=50), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('table_name')
+        )
+
+
+def downgrade():
+    op.drop_table('table_versions')
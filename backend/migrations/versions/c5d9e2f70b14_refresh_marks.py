@@ -0,0 +1,34 @@
+"""refresh marks for periodically materialized tables
+
+Revision ID: c5d9e2f70b14
+Revises: d6f2a8c41e93
+Create Date: 2026-10-17 10:00:00.000000
+
+The overdue set counts as never refreshed until the next worker run (or
+`flask refresh-overdue`); until then readers query distributions live.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d9e2f70b14'
+down_revision = 'd6f2a8c41e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('refresh_marks'):
+        op.create_table(
+            'refresh_marks',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade():
+    op.drop_table('refresh_marks')
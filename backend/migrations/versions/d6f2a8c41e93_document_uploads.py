@@ -0,0 +1,44 @@
+"""resumable expense document uploads
+
+Revision ID: d6f2a8c41e93
+Revises: b3e7d05f9a16
+Create Date: 2026-10-16 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6f2a8c41e93'
+down_revision = 'b3e7d05f9a16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('document_uploads'):
+        op.create_table(
+            'document_uploads',
+            sa.Column('id', sa.String(length=32), nullable=False),
+            sa.Column('filename', sa.String(length=255), nullable=False),
+            sa.Column('content_type', sa.String(length=100), nullable=True),
+            sa.Column('size', sa.BigInteger(), nullable=False),
+            sa.Column('received', sa.BigInteger(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('sha256', sa.String(length=64), nullable=True),
+            sa.Column('document_path', sa.String(length=500), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('completed_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_document_uploads_status_updated_at', 'document_uploads', ['status', 'updated_at'])
+        op.create_index('ix_document_uploads_sha256', 'document_uploads', ['sha256'])
+
+
+def downgrade():
+    op.drop_index('ix_document_uploads_sha256', table_name='document_uploads')
+    op.drop_index('ix_document_uploads_status_updated_at', table_name='document_uploads')
+    op.drop_table('document_uploads')
@@ -0,0 +1,34 @@
+"""per-year receipt serial counters
+
+Revision ID: e7b3f9c24a61
+Revises: c5d2e8a17f04
+Create Date: 2026-10-16 17:00:00.000000
+
+Counter rows are created (and seeded from the highest serial already issued
+that year) on first allocation, so no data migration is needed.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3f9c24a61'
+down_revision = 'c5d2e8a17f04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('receipt_sequences'):
+        op.create_table(
+            'receipt_sequences',
+            sa.Column('year', sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column('last_number', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('year')
+        )
+
+
+def downgrade():
+    op.drop_table('receipt_sequences')
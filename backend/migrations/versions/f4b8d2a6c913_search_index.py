@@ -0,0 +1,51 @@
+"""full-text search index
+
+Revision ID: f4b8d2a6c913
+Revises: c5d9e2f70b14
+Create Date: 2026-10-17 11:00:00.000000
+
+An FTS5 table on SQLite, a table with a generated tsvector column and a GIN
+index on PostgreSQL; other databases search with ILIKE. The app backfills
+the index on its next start while it is empty.
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b8d2a6c913'
+down_revision = 'c5d9e2f70b14'
+branch_labels = None
+depends_on = None
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "kind UNINDEXED, ref_id UNINDEXED, title, body, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+
+POSTGRES_DDL = (
+    "CREATE TABLE IF NOT EXISTS search_index ("
+    "kind VARCHAR(20) NOT NULL, "
+    "ref_id INTEGER NOT NULL, "
+    "title TEXT, "
+    "body TEXT, "
+    "document TSVECTOR GENERATED ALWAYS AS "
+    "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(body, ''))) STORED, "
+    "PRIMARY KEY (kind, ref_id))",
+    "CREATE INDEX IF NOT EXISTS ix_search_index_document ON search_index USING GIN (document)"
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(SQLITE_DDL)
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name in ('sqlite', 'postgresql'):
+        op.execute("DROP TABLE IF EXISTS search_index")
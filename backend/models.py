@@ -39,6 +39,12 @@ class AdminUser(db.Model):
 
 class Credit(db.Model):
     __tablename__ = 'credits'
+    __table_args__ = (
+        db.Index('ix_credits_date_id', 'date', 'id'),
+        db.Index('ix_credits_created_at', 'created_at'),
+        db.Index('ix_credits_updated_at', 'updated_at'),
+        db.Index('ix_credits_donor_name_amount', 'donor_name', 'amount'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     donor_name = db.Column(db.String(255), nullable=False)
@@ -48,6 +54,7 @@ class Credit(db.Model):
     payment_method = db.Column(db.String(50), nullable=True)
     contact_info = db.Column(db.String(255), nullable=True)
     receipt_id = db.Column(db.Integer, db.ForeignKey('receipts.id'), nullable=True)
+    content_hash = db.Column(db.String(64), unique=True, index=True, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -69,6 +76,11 @@ class Credit(db.Model):
 
 class Expense(db.Model):
     __tablename__ = 'expenses'
+    __table_args__ = (
+        db.Index('ix_expenses_date_id', 'date', 'id'),
+        db.Index('ix_expenses_category_date_id', 'category', 'date', 'id'),
+        db.Index('ix_expenses_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     amount = db.Column(db.Float, nullable=False)
@@ -77,6 +89,7 @@ class Expense(db.Model):
     category = db.Column(db.String(50), nullable=True)
     beneficiary_name = db.Column(db.String(255), nullable=True)
     document_path = db.Column(db.String(500), nullable=True)
+    content_hash = db.Column(db.String(64), unique=True, index=True, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -95,6 +108,10 @@ class Expense(db.Model):
 
 class Item(db.Model):
     __tablename__ = 'items'
+    __table_args__ = (
+        db.Index('ix_items_name_id', 'name', 'id'),
+        db.Index('ix_items_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
@@ -108,6 +125,12 @@ class Item(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Lending stats, kept current by the distribute/return stock updates
+    times_lent = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    returns_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    loan_days_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_return_condition = db.Column(db.String(50), nullable=True)
+    
     distributions = db.relationship('Distribution', backref='item', lazy=True, cascade='all, delete-orphan')
     
     @property
@@ -128,10 +151,33 @@ class Item(db.Model):
             'description': self.description,
             'created_at': self.created_at.isoformat()
         }
+    
+    def stats(self):
+        return {
+            'times_lent': self.times_lent,
+            'units_out': self.distributed_quantity,
+            'returns': self.returns_count,
+            'average_loan_days': (
+                round(self.loan_days_total / self.returns_count, 1) if self.returns_count else None
+            ),
+            'last_return_condition': self.last_return_condition
+        }
 
 
 class Distribution(db.Model):
     __tablename__ = 'distributions'
+    __table_args__ = (
+        db.Index('ix_distributions_date_id', 'distribution_date', 'id'),
+        db.Index('ix_distributions_status_date_id', 'status', 'distribution_date', 'id'),
+        db.Index('ix_distributions_item_date_id', 'item_id', 'distribution_date', 'id'),
+        db.Index('ix_distributions_updated_at', 'updated_at'),
+        # Outstanding loans only; returned rows never reach the overdue scan
+        db.Index(
+            'ix_distributions_outstanding_return', 'expected_return_date',
+            sqlite_where=db.text("status = 'distributed'"),
+            postgresql_where=db.text("status = 'distributed'")
+        ),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=False)
@@ -167,6 +213,10 @@ class Distribution(db.Model):
 
 class Receipt(db.Model):
     __tablename__ = 'receipts'
+    __table_args__ = (
+        db.Index('ix_receipts_date_id', 'date', 'id'),
+        db.Index('ix_receipts_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     serial_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -188,3 +238,166 @@ class Receipt(db.Model):
             'emailed_to': self.emailed_to,
             'created_at': self.created_at.isoformat()
         }
+
+
+class LedgerTotals(db.Model):
+    """Single-row running totals, maintained by the write paths in utils.ledger"""
+    __tablename__ = 'ledger_totals'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    credit_total = db.Column(db.Float, nullable=False, default=0)
+    credit_count = db.Column(db.Integer, nullable=False, default=0)
+    expense_total = db.Column(db.Float, nullable=False, default=0)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    item_quantity = db.Column(db.Integer, nullable=False, default=0)
+    item_available = db.Column(db.Integer, nullable=False, default=0)
+    active_distributions = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DailyRollup(db.Model):
+    """Per-day sums of credits by payment method and expenses by category"""
+    __tablename__ = 'daily_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'kind', 'dimension', name='uq_daily_rollups_day_kind_dimension'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # 'credit' or 'expense'
+    dimension = db.Column(db.String(50), nullable=False, default='')  # payment method / category
+    amount = db.Column(db.Float, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Tombstone(db.Model):
+    """Record of a deleted row, so delta sync clients can drop it"""
+    __tablename__ = 'tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class IdempotencyKey(db.Model):
+    """Response stored for a client-supplied Idempotency-Key, replayed on retries to the same user"""
+    __tablename__ = 'idempotency_keys'
+    
+    owner = db.Column(db.String(64), primary_key=True)  # JWT identity the key belongs to
+    key = db.Column(db.String(255), primary_key=True)
+    scope = db.Column(db.String(50), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    response_body = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class TableVersion(db.Model):
+    """Write counter per table, bumped by utils.versions and used to build ETags"""
+    __tablename__ = 'table_versions'
+    
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ReceiptSequence(db.Model):
+    """Last receipt serial number issued per year, advanced atomically by utils.serials"""
+    __tablename__ = 'receipt_sequences'
+    
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    last_number = db.Column(db.Integer, nullable=False, default=0)
+
+
+class OverdueDistribution(db.Model):
+    """Distributions past their expected return date, rebuilt periodically by utils.overdue"""
+    __tablename__ = 'overdue_distributions'
+    
+    distribution_id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, nullable=False)
+    recipient_name = db.Column(db.String(255), nullable=False)
+    recipient_contact = db.Column(db.String(255), nullable=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    distribution_date = db.Column(db.Date, nullable=False)
+    expected_return_date = db.Column(db.Date, nullable=False)
+    refreshed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class RefreshMark(db.Model):
+    """When a periodically materialized table (e.g. overdue_distributions) was last rebuilt"""
+    __tablename__ = 'refresh_marks'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+
+class Job(db.Model):
+    """Unit of background work, claimed and run by `flask worker` (see utils.jobs)"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'error': self.error,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class DocumentUpload(db.Model):
+    """Resumable upload of an expense document, stored by content hash once complete (see utils.documents)"""
+    __tablename__ = 'document_uploads'
+    __table_args__ = (
+        db.Index('ix_document_uploads_status_updated_at', 'status', 'updated_at'),
+        db.Index('ix_document_uploads_sha256', 'sha256'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100), nullable=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, complete
+    sha256 = db.Column(db.String(64), nullable=True)
+    document_path = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'content_type': self.content_type,
+            'size': self.size,
+            'offset': self.received,
+            'status': self.status,
+            'sha256': self.sha256,
+            'document_path': self.document_path,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
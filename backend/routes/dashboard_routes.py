@@ -1,55 +1,69 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from extensions import db
-from models import Credit, Expense, Item, Distribution
+from models import Credit, Expense, DailyRollup
 from sqlalchemy import func
+from datetime import datetime, timedelta
+from utils.ledger import get_totals
+from utils.overdue import overdue_count, overdue_state
+from utils.versions import etag
+from utils.cache import cached, get_cache, get_pdf_cache
 
 bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard')
 
 @bp.route('/metrics', methods=['GET'])
 @jwt_required()
+@etag('credits', 'expenses', 'items', 'distributions', 'overdue_distributions', depends_on=overdue_state)
+@cached('credits', 'expenses', 'items', 'distributions', 'overdue_distributions', depends_on=overdue_state)
 def get_dashboard_metrics():
     """Get key metrics for dashboard"""
     
+    totals = get_totals()
+    
     # Financial metrics
-    total_collected = db.session.query(func.sum(Credit.amount)).scalar() or 0
-    total_spent = db.session.query(func.sum(Expense.amount)).scalar() or 0
+    total_collected = totals.credit_total
+    total_spent = totals.expense_total
     available_balance = total_collected - total_spent
     
     # Property metrics
-    total_items = db.session.query(func.sum(Item.total_quantity)).scalar() or 0
-    available_items = db.session.query(func.sum(Item.available_quantity)).scalar() or 0
+    total_items = totals.item_quantity
+    available_items = totals.item_available
     distributed_items = total_items - available_items
     
     # Recent transactions
-    recent_credits = Credit.query.order_by(Credit.date.desc()).limit(5).all()
-    recent_expenses = Expense.query.order_by(Expense.date.desc()).limit(5).all()
+    recent_credits = db.session.query(
+        Credit.id, Credit.date, Credit.amount, Credit.donor_name, Credit.purpose
+    ).order_by(Credit.date.desc(), Credit.id.desc()).limit(5)
+    recent_expenses = db.session.query(
+        Expense.id, Expense.date, Expense.amount, Expense.purpose
+    ).order_by(Expense.date.desc(), Expense.id.desc()).limit(5)
     
     recent_transactions = []
     
-    for credit in recent_credits:
+    for id, date, amount, donor_name, purpose in recent_credits:
         recent_transactions.append({
-            'id': f'credit-{credit.id}',
+            'id': f'credit-{id}',
             'type': 'credit',
-            'date': credit.date.isoformat(),
-            'amount': credit.amount,
-            'description': f'{credit.donor_name} - {credit.purpose}'
+            'date': date,
+            'amount': amount,
+            'description': f'{donor_name} - {purpose}'
         })
     
-    for expense in recent_expenses:
+    for id, date, amount, purpose in recent_expenses:
         recent_transactions.append({
-            'id': f'expense-{expense.id}',
+            'id': f'expense-{id}',
             'type': 'expense',
-            'date': expense.date.isoformat(),
-            'amount': -expense.amount,
-            'description': expense.purpose
+            'date': date,
+            'amount': -amount,
+            'description': purpose
         })
     
     recent_transactions.sort(key=lambda x: x['date'], reverse=True)
     recent_transactions = recent_transactions[:10]
     
-    # Active distributions
-    active_distributions = Distribution.query.filter_by(status='distributed').count()
+    # Active distributions, and those past their return date
+    active_distributions = totals.active_distributions
+    overdue_distributions = overdue_count()
     
     return jsonify({
         'financial': {
@@ -61,38 +75,65 @@ def get_dashboard_metrics():
             'total_items': int(total_items),
             'available_items': int(available_items),
             'distributed_items': int(distributed_items),
-            'active_distributions': active_distributions
+            'active_distributions': active_distributions,
+            'overdue_distributions': overdue_distributions
         },
         'recent_transactions': recent_transactions
     }), 200
 
 
+def _parse_range():
+    """Read optional start_date/end_date query args as dates"""
+    start = request.args.get('start_date')
+    end = request.args.get('end_date')
+    start = datetime.strptime(start, '%Y-%m-%d').date() if start else None
+    end = datetime.strptime(end, '%Y-%m-%d').date() if end else None
+    return start, end
+
+
+def _rollup_query(*columns, start=None, end=None):
+    query = db.session.query(*columns)
+    if start:
+        query = query.filter(DailyRollup.day >= start)
+    if end:
+        query = query.filter(DailyRollup.day <= end)
+    return query
+
+
 @bp.route('/financial-summary', methods=['GET'])
 @jwt_required()
+@etag('credits', 'expenses')
+@cached('credits', 'expenses')
 def get_financial_summary():
-    """Get detailed financial summary"""
-    # Category-wise expenses
-    expense_by_category = db.session.query(
-        Expense.category,
-        func.sum(Expense.amount).label('total')
-    ).group_by(Expense.category).all()
-    
+    """Get detailed financial summary, optionally limited to a date range"""
+    try:
+        start, end = _parse_range()
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    
+    breakdown = _rollup_query(
+        DailyRollup.kind,
+        DailyRollup.dimension,
+        func.sum(DailyRollup.amount),
+        start=start, end=end
+    ).group_by(DailyRollup.kind, DailyRollup.dimension).having(func.sum(DailyRollup.count) > 0)
+    
+    # Category-wise expenses and payment method breakdown
     categories = {}
-    for category, total in expense_by_category:
-        categories[category or 'Other'] = float(total)
-    
-    # Payment method breakdown
-    payment_methods = db.session.query(
-        Credit.payment_method,
-        func.sum(Credit.amount).label('total')
-    ).group_by(Credit.payment_method).all()
-    
     methods = {}
-    for method, total in payment_methods:
-        methods[method or 'Unknown'] = float(total)
-    
-    total_credits = db.session.query(func.sum(Credit.amount)).scalar() or 0
-    total_expenses = db.session.query(func.sum(Expense.amount)).scalar() or 0
+    for kind, dimension, total in breakdown:
+        if kind == 'expense':
+            categories[dimension or 'Other'] = float(total)
+        else:
+            methods[dimension or 'Unknown'] = float(total)
+    
+    if start or end:
+        total_credits = sum(methods.values())
+        total_expenses = sum(categories.values())
+    else:
+        totals = get_totals()
+        total_credits = totals.credit_total
+        total_expenses = totals.expense_total
     
     return jsonify({
         'summary': {
@@ -105,15 +146,84 @@ def get_financial_summary():
     }), 200
 
 
+def _bucket_start(day, interval):
+    """First day of the day/week/month bucket containing `day`"""
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+@bp.route('/timeseries', methods=['GET'])
+@jwt_required()
+@etag('credits', 'expenses')
+@cached('credits', 'expenses')
+def get_timeseries():
+    """Collected vs. spent per day/week/month, read from the daily rollups"""
+    interval = request.args.get('interval', 'day')
+    if interval not in ('day', 'week', 'month'):
+        return jsonify({'error': 'interval must be one of day, week, month'}), 400
+    
+    try:
+        start, end = _parse_range()
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    
+    rows = _rollup_query(
+        DailyRollup.day,
+        DailyRollup.kind,
+        DailyRollup.dimension,
+        DailyRollup.amount,
+        DailyRollup.count,
+        start=start, end=end
+    ).filter(DailyRollup.count > 0).order_by(DailyRollup.day)
+    
+    buckets = {}
+    for day, kind, dimension, amount, count in rows:
+        period = _bucket_start(day, interval)
+        bucket = buckets.get(period)
+        if bucket is None:
+            bucket = buckets[period] = {
+                'period': period.isoformat(),
+                'collected': 0.0,
+                'spent': 0.0,
+                'credit_count': 0,
+                'expense_count': 0,
+                'credits_by_payment_method': {},
+                'expenses_by_category': {}
+            }
+        
+        if kind == 'credit':
+            bucket['collected'] += amount
+            bucket['credit_count'] += count
+            breakdown = bucket['credits_by_payment_method']
+            label = dimension or 'Unknown'
+        else:
+            bucket['spent'] += amount
+            bucket['expense_count'] += count
+            breakdown = bucket['expenses_by_category']
+            label = dimension or 'Other'
+        breakdown[label] = breakdown.get(label, 0.0) + amount
+    
+    return jsonify({
+        'interval': interval,
+        'series': list(buckets.values())
+    }), 200
+
+
 @bp.route('/stats', methods=['GET'])
 @jwt_required()
+@etag('credits', 'items')
+@cached('credits', 'items')
 def get_statistics():
     """Get various statistics"""
     
     # Donor statistics
     total_donors = db.session.query(func.count(func.distinct(Credit.donor_name))).scalar() or 0
-    total_donations = Credit.query.count()
-    avg_donation = db.session.query(func.avg(Credit.amount)).scalar() or 0
+    totals = get_totals()
+    total_donations = totals.credit_count
+    avg_donation = totals.credit_total / totals.credit_count if totals.credit_count else 0
     
     top_donors = db.session.query(
         Credit.donor_name,
@@ -121,7 +231,7 @@ def get_statistics():
     ).group_by(Credit.donor_name).order_by(func.sum(Credit.amount).desc()).limit(5).all()
     
     # Item statistics
-    total_item_types = Item.query.count()
+    total_item_types = totals.item_count
     
     return jsonify({
         'donors': {
@@ -134,3 +244,10 @@ def get_statistics():
             'total_item_types': total_item_types
         }
     }), 200
+
+
+@bp.route('/cache', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    """Result and receipt PDF cache counters for this worker"""
+    return jsonify({**get_cache().stats(), 'receipt_pdfs': get_pdf_cache().stats()}), 200
@@ -0,0 +1,121 @@
+from flask import Blueprint, request, jsonify, current_app, send_file
+from flask_jwt_extended import jwt_required
+from extensions import db
+from models import DocumentUpload
+from utils.documents import create_upload, write_chunk, document_path_for, UploadConflict
+import mimetypes
+import os
+import re
+
+bp = Blueprint('documents', __name__, url_prefix='/api/documents')
+
+SHA256_HEX = re.compile(r'^[0-9a-f]{64}$')
+
+@bp.route('/uploads', methods=['POST'])
+@jwt_required()
+def start_upload():
+    """
+    Start a resumable document upload. Send {filename, size, content_type};
+    then PATCH the bytes in chunks of at most `max_chunk_size`.
+    """
+    data = request.get_json() or {}
+    
+    if not data.get('filename'):
+        return jsonify({'error': 'filename is required'}), 400
+    
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size must be an integer'}), 400
+    
+    try:
+        upload = create_upload(data['filename'], size, data.get('content_type'))
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'upload': upload.to_dict(),
+        'max_chunk_size': current_app.config['MAX_CONTENT_LENGTH']
+    }), 201, {'Location': f'/api/documents/uploads/{upload.id}'}
+
+
+@bp.route('/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(upload_id):
+    """Upload progress; `offset` is where to resume"""
+    upload = db.session.get(DocumentUpload, upload_id)
+    
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    return jsonify({'upload': upload.to_dict()}), 200, {'Upload-Offset': str(upload.received)}
+
+
+@bp.route('/uploads/<upload_id>', methods=['PATCH'])
+@jwt_required()
+def upload_chunk(upload_id):
+    """
+    Append the request body at the `Upload-Offset` header. A wrong offset
+    gets 409 with the offset to resume from; the response to the last
+    chunk carries the stored document's `document_path` for the expense.
+    """
+    upload = db.session.get(DocumentUpload, upload_id)
+    
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Upload-Offset header is required'}), 400
+    
+    try:
+        upload = write_chunk(upload, offset, request.stream, current_app.config['UPLOAD_FOLDER'])
+    except UploadConflict as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'offset': e.offset}), 409, {'Upload-Offset': str(e.offset)}
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({'upload': upload.to_dict()}), 200, {'Upload-Offset': str(upload.received)}
+
+
+@bp.route('/<sha256>', methods=['GET'])
+@jwt_required()
+def download_document(sha256):
+    """Download a stored document by its SHA-256"""
+    if not SHA256_HEX.match(sha256):
+        return jsonify({'error': 'Document not found'}), 404
+    
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], document_path_for(sha256))
+    if not os.path.exists(path):
+        return jsonify({'error': 'Document not found'}), 404
+    
+    upload = DocumentUpload.query.filter_by(sha256=sha256).order_by(
+        DocumentUpload.completed_at.desc()
+    ).first()
+    filename = upload.filename if upload else sha256
+    mimetype = (upload.content_type if upload else None) or mimetypes.guess_type(filename)[0]
+    
+    response = send_file(
+        path,
+        mimetype=mimetype or 'application/octet-stream',
+        as_attachment=True,
+        download_name=filename,
+        etag=sha256,
+        conditional=True,
+        max_age=365 * 24 * 3600
+    )
+    response.cache_control.public = None
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,36 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+from extensions import db
+from models import Job
+import json
+
+bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+@bp.route('/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Status of a background job"""
+    job = db.session.get(Job, job_id)
+    
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({'job': job.to_dict()}), 200
+
+
+@bp.route('/<int:job_id>/result', methods=['GET'])
+@jwt_required()
+def get_job_result(job_id):
+    """Result of a finished job; 202 while it is still queued or running"""
+    job = db.session.get(Job, job_id)
+    
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if job.status == 'succeeded':
+        return jsonify({'job': job.to_dict(), 'result': json.loads(job.result)}), 200
+    
+    if job.status == 'failed':
+        return jsonify({'job': job.to_dict(), 'error': job.error}), 409
+    
+    return jsonify({'job': job.to_dict()}), 202
@@ -1,14 +1,39 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
 from flask_jwt_extended import jwt_required
 from extensions import db
-from models import Credit, Expense
-from datetime import datetime, timedelta
-from sqlalchemy import func
+from models import Credit, Expense, Receipt
+from datetime import datetime, date as date_type
+from sqlalchemy import tuple_
+from utils.ledger import get_totals, record_credit, record_expense, record_batch
+from utils.search import search_filter, index_document, index_documents, remove_document
+from utils.bulk_import import (
+    iter_records, validate_credit, validate_expense, credit_key, expense_key,
+    BATCH_SIZE, MAX_REPORTED_ERRORS
+)
+from utils.sync import record_tombstone
+from utils.idempotency import idempotent, remember_response, insert_once, insert_many_once
+from utils.export import export_response, EXPORT_FORMATS
+from utils.serialization import parse_fields, InvalidFields, dumps
+from utils.projections import CREDIT, EXPENSE
+from utils.pagination import keyset_page, wants_cursor, encode_cursor, decode_cursor, InvalidCursor
+from utils.versions import etag, bump_versions
+from utils.documents import check_document_path
+from utils.cache import cached
+from types import SimpleNamespace
+import csv
+import heapq
 
 bp = Blueprint('money', __name__, url_prefix='/api/money')
 
+# Rows fetched per round trip when streaming large result sets
+STREAM_BATCH_SIZE = 500
+
+# Fields of a combined /transactions entry, selectable with ?fields=
+TRANSACTION_FIELDS = ('id', 'type', 'date', 'amount', 'description')
+
 @bp.route('/credits', methods=['POST'])
 @jwt_required()
+@idempotent('credits')
 def add_credit():
     """Add a new credit/donation"""
     data = request.get_json()
@@ -20,60 +45,131 @@ def add_credit():
     
     try:
         credit_date = datetime.strptime(data.get('date', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d').date()
+        amount = float(data['amount'])
         
-        # Dedup: reject if an identical credit was created within the last 60 seconds
-        cutoff = datetime.utcnow() - timedelta(seconds=60)
-        duplicate = Credit.query.filter(
-            Credit.donor_name == data['donor_name'],
-            Credit.amount == float(data['amount']),
-            Credit.date == credit_date,
-            Credit.purpose == data['purpose'],
-            Credit.created_at >= cutoff
-        ).first()
-        if duplicate:
-            return jsonify({
-                'message': 'Credit already recorded',
-                'credit': duplicate.to_dict()
-            }), 200
-        
-        credit = Credit(
-            donor_name=data['donor_name'],
-            amount=float(data['amount']),
-            date=credit_date,
-            purpose=data['purpose'],
-            payment_method=data.get('payment_method'),
-            contact_info=data.get('contact_info')
+        # Dedup: the unique content hash rejects an identical credit
+        # submitted less than 60 seconds ago (see insert_once)
+        credit, created = insert_once(
+            Credit,
+            Credit(
+                donor_name=data['donor_name'],
+                amount=amount,
+                date=credit_date,
+                purpose=data['purpose'],
+                payment_method=data.get('payment_method'),
+                contact_info=data.get('contact_info')
+            ),
+            data['donor_name'], amount, credit_date, data['purpose']
         )
         
-        db.session.add(credit)
+        if not created:
+            body = {'message': 'Credit already recorded', 'credit': credit.to_dict()}
+            remember_response(body, 200)
+            db.session.commit()
+            return jsonify(body), 200
+        
+        record_credit(credit)
+        index_document('credit', credit)
+        
+        body = {'message': 'Credit added successfully', 'credit': credit.to_dict()}
+        remember_response(body, 201)
         db.session.commit()
         
-        return jsonify({
-            'message': 'Credit added successfully',
-            'credit': credit.to_dict()
-        }), 201
+        return jsonify(body), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
-@bp.route('/credits', methods=['GET'])
-@jwt_required()
-def get_credits():
-    """Get all credits with optional filters"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    search = request.args.get('search', '')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
+def _bulk_import(model, kind, validate, dedupe_key):
+    """
+    Validate, de-duplicate and insert uploaded rows in batched transactions.
+    
+    Each batch is one executemany INSERT plus one totals/rollup/search
+    update. A failing batch is rolled back and reported without aborting
+    the rest of the import.
+    
+    Rows repeated within the upload, and rows identical to a record
+    inserted less than 60 seconds earlier (by this or any other endpoint),
+    are counted as duplicates rather than inserted; as for single inserts,
+    the unique content hash decides (see insert_many_once).
+    """
+    today = datetime.now().date()
+    report = {'received': 0, 'inserted': 0, 'duplicates': 0, 'error_count': 0, 'errors': []}
+    seen = set()
+    batch = []
+    batch_rows = []
     
-    query = Credit.query
+    def add_error(row_number, message):
+        report['error_count'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': row_number, 'error': message})
+    
+    def flush():
+        try:
+            inserted = insert_many_once(model, batch, dedupe_key)
+            rows = [values for _, values in inserted]
+            record_batch(kind, rows)
+            index_documents(kind, [SimpleNamespace(id=id, **values) for id, values in inserted])
+            bump_versions(model.__tablename__)
+            db.session.commit()
+            report['inserted'] += len(inserted)
+            report['duplicates'] += len(batch) - len(inserted)
+        except Exception as e:
+            db.session.rollback()
+            for row_number in batch_rows:
+                add_error(row_number, f'batch failed: {e}')
+        batch.clear()
+        batch_rows.clear()
+    
+    try:
+        for row_number, record in iter_records(request):
+            report['received'] += 1
+            try:
+                values = validate(record, today)
+            except ValueError as e:
+                add_error(row_number, str(e))
+                continue
+            
+            key = dedupe_key(values)
+            if key in seen:
+                report['duplicates'] += 1
+                continue
+            seen.add(key)
+            
+            batch.append(values)
+            batch_rows.append(row_number)
+            if len(batch) >= BATCH_SIZE:
+                flush()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        if report['received'] == 0 and not batch:
+            return jsonify({'error': str(e)}), 400
+        # Keep what was parsed before the upload became unreadable
+        report['aborted'] = str(e)
+    
+    if batch:
+        flush()
+    
+    return jsonify(report), 200
+
+
+@bp.route('/credits/bulk', methods=['POST'])
+@jwt_required()
+def bulk_add_credits():
+    """Import many credits from a CSV, NDJSON or JSON upload"""
+    return _bulk_import(Credit, 'credit', validate_credit, credit_key)
+
+
+def _filter_credits(query, args):
+    """Apply the credit list filters (search, start_date, end_date) to `query`"""
+    search = args.get('search', '')
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
     
     if search:
         query = query.filter(
-            (Credit.donor_name.ilike(f'%{search}%')) | 
-            (Credit.purpose.ilike(f'%{search}%'))
+            search_filter('credit', search, Credit.id, [Credit.donor_name, Credit.purpose])
         )
     
     if start_date:
@@ -82,19 +178,99 @@ def get_credits():
     if end_date:
         query = query.filter(Credit.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
     
-    query = query.order_by(Credit.date.desc())
+    return query
+
+
+def _filter_expenses(query, args):
+    """Apply the expense list filters (search, category, start_date, end_date) to `query`"""
+    search = args.get('search', '')
+    category = args.get('category')
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    
+    if search:
+        query = query.filter(
+            search_filter('expense', search, Expense.id, [Expense.purpose, Expense.beneficiary_name])
+        )
+    
+    if category:
+        query = query.filter(Expense.category == category)
+    
+    if start_date:
+        query = query.filter(Expense.date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+    
+    if end_date:
+        query = query.filter(Expense.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+    
+    return query
+
+
+@bp.route('/credits', methods=['GET'])
+@jwt_required()
+@etag('credits', 'receipts')
+def get_credits():
+    """Get all credits with optional filters"""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    
+    try:
+        fields = parse_fields(request.args.get('fields'), CREDIT.fields)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = _filter_credits(CREDIT.query(fields, keys=('date', 'id')), request.args)
+    
+    if wants_cursor(request.args):
+        total = query.count() if request.args.get('include_total') == 'true' else None
+        try:
+            credits, next_cursor = keyset_page(
+                query, [Credit.date, Credit.id], per_page, request.args.get('cursor')
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'credits': [CREDIT.to_dict(row, fields) for row in credits],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'total': total
+        }), 200
+    
+    query = query.order_by(Credit.date.desc(), Credit.id.desc())
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'credits': [credit.to_dict() for credit in pagination.items],
+        'credits': [CREDIT.to_dict(row, fields) for row in pagination.items],
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
     }), 200
 
 
+@bp.route('/credits/export', methods=['GET'])
+@jwt_required()
+@etag('credits', 'receipts')
+def export_credits():
+    """Stream credits matching the list filters as CSV or XLSX"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be csv or xlsx'}), 400
+    
+    query = db.session.query(
+        Credit.id, Credit.date, Credit.donor_name, Credit.amount, Credit.purpose,
+        Credit.payment_method, Credit.contact_info, Receipt.serial_number, Credit.created_at
+    ).outerjoin(Receipt, Credit.receipt_id == Receipt.id)
+    query = _filter_credits(query, request.args)
+    query = query.order_by(Credit.date.desc(), Credit.id.desc()).yield_per(STREAM_BATCH_SIZE)
+    
+    header = ['id', 'date', 'donor_name', 'amount', 'purpose', 'payment_method',
+              'contact_info', 'receipt_serial', 'created_at']
+    return export_response(fmt, 'credits', header, query)
+
+
 @bp.route('/credits/<int:credit_id>', methods=['GET'])
 @jwt_required()
+@etag('credits', 'receipts')
 def get_credit(credit_id):
     """Get single credit"""
     credit = Credit.query.get(credit_id)
@@ -113,6 +289,9 @@ def delete_credit(credit_id):
 
     try:
         db.session.delete(credit)
+        record_credit(credit, sign=-1)
+        remove_document('credit', credit.id)
+        record_tombstone('credits', credit.id)
         db.session.commit()
         return jsonify({'message': 'Credit deleted successfully'}), 200
     except Exception as e:
@@ -122,6 +301,7 @@ def delete_credit(credit_id):
 
 @bp.route('/expenses', methods=['POST'])
 @jwt_required()
+@idempotent('expenses')
 def add_expense():
     """Add a new expense"""
     data = request.get_json()
@@ -131,84 +311,125 @@ def add_expense():
         if not data.get(field):
             return jsonify({'error': f'{field} is required'}), 400
     
+    try:
+        check_document_path(data.get('document_path'), current_app.config['UPLOAD_FOLDER'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
         expense_date = datetime.strptime(data.get('date', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d').date()
+        amount = float(data['amount'])
         
-        # Dedup: reject if an identical expense was created within the last 60 seconds
-        cutoff = datetime.utcnow() - timedelta(seconds=60)
-        duplicate = Expense.query.filter(
-            Expense.amount == float(data['amount']),
-            Expense.date == expense_date,
-            Expense.purpose == data['purpose'],
-            Expense.created_at >= cutoff
-        ).first()
-        if duplicate:
-            return jsonify({
-                'message': 'Expense already recorded',
-                'expense': duplicate.to_dict()
-            }), 200
-        
-        expense = Expense(
-            amount=float(data['amount']),
-            date=expense_date,
-            purpose=data['purpose'],
-            category=data.get('category'),
-            beneficiary_name=data.get('beneficiary_name'),
-            document_path=data.get('document_path')
+        # Dedup: the unique content hash rejects an identical expense
+        # submitted less than 60 seconds ago (see insert_once)
+        expense, created = insert_once(
+            Expense,
+            Expense(
+                amount=amount,
+                date=expense_date,
+                purpose=data['purpose'],
+                category=data.get('category'),
+                beneficiary_name=data.get('beneficiary_name'),
+                document_path=data.get('document_path')
+            ),
+            amount, expense_date, data['purpose']
         )
         
-        db.session.add(expense)
+        if not created:
+            body = {'message': 'Expense already recorded', 'expense': expense.to_dict()}
+            remember_response(body, 200)
+            db.session.commit()
+            return jsonify(body), 200
+        
+        record_expense(expense)
+        index_document('expense', expense)
+        
+        body = {'message': 'Expense added successfully', 'expense': expense.to_dict()}
+        remember_response(body, 201)
         db.session.commit()
         
-        return jsonify({
-            'message': 'Expense added successfully',
-            'expense': expense.to_dict()
-        }), 201
+        return jsonify(body), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/expenses/bulk', methods=['POST'])
+@jwt_required()
+def bulk_add_expenses():
+    """Import many expenses from a CSV, NDJSON or JSON upload"""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    return _bulk_import(
+        Expense, 'expense',
+        lambda record, today: validate_expense(record, today, upload_folder),
+        expense_key
+    )
+
+
 @bp.route('/expenses', methods=['GET'])
 @jwt_required()
+@etag('expenses')
 def get_expenses():
     """Get all expenses with optional filters"""
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    search = request.args.get('search', '')
-    category = request.args.get('category')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    
-    query = Expense.query
     
-    if search:
-        query = query.filter(
-            (Expense.purpose.ilike(f'%{search}%')) | 
-            (Expense.beneficiary_name.ilike(f'%{search}%'))
-        )
-    
-    if category:
-        query = query.filter(Expense.category == category)
+    try:
+        fields = parse_fields(request.args.get('fields'), EXPENSE.fields)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
     
-    if start_date:
-        query = query.filter(Expense.date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+    query = _filter_expenses(EXPENSE.query(fields, keys=('date', 'id')), request.args)
     
-    if end_date:
-        query = query.filter(Expense.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+    if wants_cursor(request.args):
+        total = query.count() if request.args.get('include_total') == 'true' else None
+        try:
+            expenses, next_cursor = keyset_page(
+                query, [Expense.date, Expense.id], per_page, request.args.get('cursor')
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'expenses': [EXPENSE.to_dict(row, fields) for row in expenses],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'total': total
+        }), 200
     
-    query = query.order_by(Expense.date.desc())
+    query = query.order_by(Expense.date.desc(), Expense.id.desc())
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'expenses': [expense.to_dict() for expense in pagination.items],
+        'expenses': [EXPENSE.to_dict(row, fields) for row in pagination.items],
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
     }), 200
 
 
+@bp.route('/expenses/export', methods=['GET'])
+@jwt_required()
+@etag('expenses')
+def export_expenses():
+    """Stream expenses matching the list filters as CSV or XLSX"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be csv or xlsx'}), 400
+    
+    query = db.session.query(
+        Expense.id, Expense.date, Expense.amount, Expense.purpose, Expense.category,
+        Expense.beneficiary_name, Expense.document_path, Expense.created_at
+    )
+    query = _filter_expenses(query, request.args)
+    query = query.order_by(Expense.date.desc(), Expense.id.desc()).yield_per(STREAM_BATCH_SIZE)
+    
+    header = ['id', 'date', 'amount', 'purpose', 'category', 'beneficiary_name',
+              'document_path', 'created_at']
+    return export_response(fmt, 'expenses', header, query)
+
+
 @bp.route('/expenses/<int:expense_id>', methods=['DELETE'])
 @jwt_required()
 def delete_expense(expense_id):
@@ -219,6 +440,9 @@ def delete_expense(expense_id):
 
     try:
         db.session.delete(expense)
+        record_expense(expense, sign=-1)
+        remove_document('expense', expense.id)
+        record_tombstone('expenses', expense.id)
         db.session.commit()
         return jsonify({'message': 'Expense deleted successfully'}), 200
     except Exception as e:
@@ -228,10 +452,13 @@ def delete_expense(expense_id):
 
 @bp.route('/balance', methods=['GET'])
 @jwt_required()
+@etag('credits', 'expenses')
+@cached('credits', 'expenses')
 def get_balance():
     """Get financial balance summary"""
-    total_credits = db.session.query(func.sum(Credit.amount)).scalar() or 0
-    total_expenses = db.session.query(func.sum(Expense.amount)).scalar() or 0
+    totals = get_totals()
+    total_credits = totals.credit_total
+    total_expenses = totals.expense_total
     balance = total_credits - total_expenses
     
     return jsonify({
@@ -241,33 +468,130 @@ def get_balance():
     }), 200
 
 
+def _credit_rows(start, end, cursor):
+    """Credits as (date, type, id, amount, description), newest first"""
+    query = db.session.query(
+        Credit.date, Credit.id, Credit.amount, Credit.donor_name, Credit.purpose
+    )
+    if start:
+        query = query.filter(Credit.date >= start)
+    if end:
+        query = query.filter(Credit.date <= end)
+    if cursor:
+        cursor_date, cursor_type, cursor_id = cursor
+        # Within one day expenses sort ahead of credits, so after an expense
+        # cursor every credit on that day is still pending
+        if cursor_type == 'expense':
+            query = query.filter(Credit.date <= cursor_date)
+        else:
+            query = query.filter(tuple_(Credit.date, Credit.id) < tuple_(cursor_date, cursor_id))
+    query = query.order_by(Credit.date.desc(), Credit.id.desc()).yield_per(STREAM_BATCH_SIZE)
+    
+    for date, id, amount, donor_name, purpose in query:
+        yield date, 'credit', id, amount, f'{donor_name} - {purpose}'
+
+
+def _expense_rows(start, end, cursor):
+    """Expenses as (date, type, id, amount, description), newest first"""
+    query = db.session.query(Expense.date, Expense.id, Expense.amount, Expense.purpose)
+    if start:
+        query = query.filter(Expense.date >= start)
+    if end:
+        query = query.filter(Expense.date <= end)
+    if cursor:
+        cursor_date, cursor_type, cursor_id = cursor
+        if cursor_type == 'credit':
+            query = query.filter(Expense.date < cursor_date)
+        else:
+            query = query.filter(tuple_(Expense.date, Expense.id) < tuple_(cursor_date, cursor_id))
+    query = query.order_by(Expense.date.desc(), Expense.id.desc()).yield_per(STREAM_BATCH_SIZE)
+    
+    for date, id, amount, purpose in query:
+        yield date, 'expense', id, -amount, purpose
+
+
 @bp.route('/transactions', methods=['GET'])
 @jwt_required()
+@etag('credits', 'expenses')
 def get_all_transactions():
-    """Get combined list of credits and expenses"""
-    credits = Credit.query.all()
-    expenses = Expense.query.all()
-    
-    transactions = []
-    
-    for credit in credits:
-        transactions.append({
-            'id': f'credit-{credit.id}',
-            'type': 'credit',
-            'date': credit.date.isoformat(),
-            'amount': credit.amount,
-            'description': f'{credit.donor_name} - {credit.purpose}'
-        })
-    
-    for expense in expenses:
-        transactions.append({
-            'id': f'expense-{expense.id}',
-            'type': 'expense',
-            'date': expense.date.isoformat(),
-            'amount': -expense.amount,
-            'description': expense.purpose
-        })
-    
-    transactions.sort(key=lambda x: x['date'], reverse=True)
-    
-    return jsonify({'transactions': transactions}), 200
+    """
+    Stream the combined list of credits and expenses, newest first.
+    
+    Both tables are read with date-ordered server-side cursors and merged
+    lazily, so memory stays flat however long the history is. Supports
+    start_date/end_date, limit, cursor and fields; `format=ndjson` (or an
+    application/x-ndjson Accept header) emits one transaction per line.
+    """
+    try:
+        start = request.args.get('start_date')
+        start = datetime.strptime(start, '%Y-%m-%d').date() if start else None
+        end = request.args.get('end_date')
+        end = datetime.strptime(end, '%Y-%m-%d').date() if end else None
+    except ValueError:
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format'}), 400
+    
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        return jsonify({'error': 'limit must be at least 1'}), 400
+    
+    try:
+        fields = parse_fields(request.args.get('fields'), TRANSACTION_FIELDS) or TRANSACTION_FIELDS
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    cursor = None
+    if request.args.get('cursor'):
+        try:
+            cursor = decode_cursor(request.args['cursor'], [date_type, str, int])
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        if cursor[1] not in ('credit', 'expense'):
+            return jsonify({'error': 'Invalid cursor'}), 400
+    
+    ndjson = (request.args.get('format') == 'ndjson'
+              or request.accept_mimetypes.best == 'application/x-ndjson')
+    
+    merged = heapq.merge(
+        _credit_rows(start, end, cursor),
+        _expense_rows(start, end, cursor),
+        key=lambda row: row[:3],
+        reverse=True
+    )
+    
+    def generate():
+        sent = 0
+        last = None
+        next_cursor = None
+        
+        if not ndjson:
+            yield '{"transactions":['
+        
+        for row in merged:
+            if limit is not None and sent >= limit:
+                next_cursor = encode_cursor(last[:3])
+                break
+            
+            date, kind, id, amount, description = row
+            values = {
+                'id': f'{kind}-{id}',
+                'type': kind,
+                'date': date,
+                'amount': amount,
+                'description': description
+            }
+            line = dumps({name: values[name] for name in fields})
+            if ndjson:
+                yield line + '\n'
+            else:
+                yield line if sent == 0 else ',' + line
+            sent += 1
+            last = row
+        
+        if ndjson:
+            if next_cursor:
+                yield dumps({'next_cursor': next_cursor}) + '\n'
+        else:
+            yield '],"next_cursor":' + dumps(next_cursor) + '}'
+    
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
@@ -1,11 +1,34 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required
+from flask import Blueprint, request, jsonify, current_app, send_from_directory, url_for
+from flask_jwt_extended import jwt_required, verify_jwt_in_request
 from extensions import db
 from models import Item, Distribution
 from datetime import datetime
+from sqlalchemy import update, func
+from utils.ledger import apply_delta
+from utils.search import search_filter, index_document, index_documents
+from utils.export import export_response, EXPORT_FORMATS
+from utils.serialization import parse_fields, InvalidFields
+from utils.projections import ITEM, DISTRIBUTION
+from utils.pagination import keyset_page, wants_cursor, InvalidCursor
+from utils.versions import etag, bump_versions
+from utils.overdue import overdue_report, forget_overdue, overdue_state
+from utils.images import store_photo, thumbnail_names, is_thumbnail_name, ThumbnailTimeout, PHOTO_DIR
+import os
 
 bp = Blueprint('property', __name__, url_prefix='/api/property')
 
+# Rows fetched per round trip when streaming large result sets
+STREAM_BATCH_SIZE = 500
+
+# Photos and thumbnails never change under a name, so clients may keep them for a year
+PHOTO_MAX_AGE = 365 * 24 * 3600
+
+# Distribution fields returned by an item's history (the item is implied)
+ITEM_HISTORY_FIELDS = tuple(name for name in DISTRIBUTION.fields if name != 'item_name')
+
+# Most distributions one batch request may record
+MAX_BATCH_DISTRIBUTIONS = 1000
+
 @bp.route('/items', methods=['POST'])
 @jwt_required()
 def add_item():
@@ -30,6 +53,8 @@ def add_item():
         )
         
         db.session.add(item)
+        apply_delta(item_count=1, item_quantity=total_qty, item_available=total_qty)
+        index_document('item', item)
         db.session.commit()
         
         return jsonify({
@@ -42,22 +67,15 @@ def add_item():
         return jsonify({'error': str(e)}), 500
 
 
-@bp.route('/items', methods=['GET'])
-@jwt_required()
-def get_items():
-    """Get all items with filters"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    search = request.args.get('search', '')
-    category = request.args.get('category')
-    status = request.args.get('status')
-    
-    query = Item.query
+def _filter_items(query, args):
+    """Apply the item list filters (search, category, status) to `query`"""
+    search = args.get('search', '')
+    category = args.get('category')
+    status = args.get('status')
     
     if search:
         query = query.filter(
-            (Item.name.ilike(f'%{search}%')) |
-            (Item.description.ilike(f'%{search}%'))
+            search_filter('item', search, Item.id, [Item.name, Item.description])
         )
     
     if category:
@@ -68,34 +86,266 @@ def get_items():
     elif status == 'distributed':
         query = query.filter(Item.available_quantity == 0)
     
-    query = query.order_by(Item.name)
+    return query
+
+
+def _filter_distributions(query, args):
+    """Apply the distribution list filters (status, search) to `query`"""
+    status = args.get('status')
+    search = args.get('search', '')
+    
+    if status:
+        query = query.filter(Distribution.status == status)
+    
+    if search:
+        query = query.filter(
+            search_filter('distribution', search, Distribution.id,
+                          [Distribution.recipient_name, Distribution.recipient_contact])
+        )
+    
+    return query
+
+
+@bp.route('/items', methods=['GET'])
+@jwt_required()
+@etag('items')
+def get_items():
+    """Get all items with filters"""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    
+    try:
+        fields = parse_fields(request.args.get('fields'), ITEM.fields)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = _filter_items(ITEM.query(fields, keys=('name', 'id')), request.args)
+    
+    if wants_cursor(request.args):
+        total = query.count() if request.args.get('include_total') == 'true' else None
+        try:
+            items, next_cursor = keyset_page(
+                query, [Item.name, Item.id], per_page, request.args.get('cursor'),
+                descending=False
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'items': [ITEM.to_dict(row, fields) for row in items],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'total': total
+        }), 200
+    
+    query = query.order_by(Item.name, Item.id)
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'items': [item.to_dict() for item in pagination.items],
+        'items': [ITEM.to_dict(row, fields) for row in pagination.items],
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
     }), 200
 
 
+@bp.route('/items/export', methods=['GET'])
+@jwt_required()
+@etag('items')
+def export_items():
+    """Stream inventory items matching the list filters as CSV or XLSX"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be csv or xlsx'}), 400
+    
+    query = db.session.query(
+        Item.id, Item.name, Item.category, Item.total_quantity, Item.available_quantity,
+        Item.total_quantity - Item.available_quantity, Item.condition, Item.location,
+        Item.description, Item.created_at
+    )
+    query = _filter_items(query, request.args)
+    query = query.order_by(Item.name, Item.id).yield_per(STREAM_BATCH_SIZE)
+    
+    header = ['id', 'name', 'category', 'total_quantity', 'available_quantity',
+              'distributed_quantity', 'condition', 'location', 'description', 'created_at']
+    return export_response(fmt, 'items', header, query)
+
+
 @bp.route('/items/<int:item_id>', methods=['GET'])
 @jwt_required()
+@etag('items')
 def get_item(item_id):
-    """Get single item details"""
+    """Get single item details with its lending stats; history is under /distributions"""
     item = Item.query.get(item_id)
     
     if not item:
         return jsonify({'error': 'Item not found'}), 404
     
-    distributions = Distribution.query.filter_by(item_id=item_id).all()
+    return jsonify({
+        'item': item.to_dict(),
+        'stats': item.stats(),
+        'photo_urls': _photo_urls(item.photo_path)
+    }), 200
+
+
+def _photo_urls(photo_path):
+    """URLs of an uploaded photo and its thumbnails, keyed 'original' and by size"""
+    names = thumbnail_names(photo_path)
+    if not names:
+        return {}
+    urls = {'original': url_for('property.get_photo', filename=os.path.basename(photo_path))}
+    urls.update({str(size): url_for('property.get_photo', filename=name) for size, name in names.items()})
+    return urls
+
+
+@bp.route('/items/<int:item_id>/photo', methods=['PUT', 'POST'])
+@jwt_required()
+def upload_item_photo(item_id):
+    """
+    Set an item's photo from a multipart `photo` field or a raw image body.
+    The upload is streamed to disk, stored under its content hash, and
+    thumbnailed before the response.
+    """
+    item = Item.query.get(item_id)
+    if not item:
+        return jsonify({'error': 'Item not found'}), 404
+    
+    upload = request.files.get('photo')
+    if upload:
+        stream = upload.stream
+    elif request.mimetype.startswith('image/'):
+        stream = request.stream
+    else:
+        return jsonify({'error': 'Send the image as a multipart "photo" field or an image/* body'}), 400
+    
+    try:
+        photo_path = store_photo(stream, current_app.config['UPLOAD_FOLDER'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ThumbnailTimeout as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': f'Could not process photo: {e}'}), 500
+    
+    try:
+        item.photo_path = photo_path
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
     
     return jsonify({
+        'message': 'Photo uploaded successfully',
         'item': item.to_dict(),
-        'distributions': [d.to_dict() for d in distributions]
+        'photo_urls': _photo_urls(photo_path)
     }), 200
 
 
+@bp.route('/photos/<path:filename>', methods=['GET'])
+def get_photo(filename):
+    """
+    Serve an item photo or thumbnail. Names are content hashes, so responses
+    are immutable and may be cached for a year. Thumbnails need no token (an
+    <img> tag cannot send one); full-size originals do, and are only cached
+    privately.
+    """
+    thumbnail = is_thumbnail_name(filename)
+    if not thumbnail:
+        verify_jwt_in_request()
+    
+    response = send_from_directory(
+        os.path.join(current_app.config['UPLOAD_FOLDER'], PHOTO_DIR), filename,
+        max_age=PHOTO_MAX_AGE
+    )
+    response.cache_control.immutable = True
+    if not thumbnail:
+        response.cache_control.public = False
+        response.cache_control.private = True
+    return response
+
+
+@bp.route('/items/<int:item_id>/distributions', methods=['GET'])
+@jwt_required()
+@etag('distributions')
+def get_item_distributions(item_id):
+    """An item's distribution history, newest first, one cursor page at a time"""
+    per_page = request.args.get('per_page', 20, type=int)
+    
+    try:
+        fields = parse_fields(request.args.get('fields'), ITEM_HISTORY_FIELDS) or list(ITEM_HISTORY_FIELDS)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = DISTRIBUTION.query(fields, keys=('distribution_date', 'id')).filter(
+        Distribution.item_id == item_id
+    )
+    
+    try:
+        distributions, next_cursor = keyset_page(
+            query, [Distribution.distribution_date, Distribution.id], per_page,
+            request.args.get('cursor')
+        )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not distributions and not request.args.get('cursor') and db.session.get(Item, item_id) is None:
+        return jsonify({'error': 'Item not found'}), 404
+    
+    return jsonify({
+        'distributions': [DISTRIBUTION.to_dict(row, fields) for row in distributions],
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    }), 200
+
+
+def _reserve_stock(item_id, quantity, loans=1):
+    """
+    Take `quantity` units of an item for `loans` distributions in one
+    conditional UPDATE, counting them in the item's stats. Returns False
+    (changing nothing) when the item is missing or has fewer units left, so
+    concurrent distributions can never overdraw it.
+    """
+    result = db.session.execute(
+        update(Item)
+        .where(Item.id == item_id, Item.available_quantity >= quantity)
+        .values(
+            available_quantity=Item.available_quantity - quantity,
+            times_lent=Item.times_lent + loans
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _release_stock(item_id, quantity, loan_days, condition=None):
+    """
+    Put `quantity` units of a returned loan back on an item and record the
+    loan in its stats; False if the item no longer exists.
+    """
+    values = {
+        'available_quantity': Item.available_quantity + quantity,
+        'returns_count': Item.returns_count + 1,
+        'loan_days_total': Item.loan_days_total + loan_days
+    }
+    if condition:
+        values['last_return_condition'] = condition
+    result = db.session.execute(
+        update(Item)
+        .where(Item.id == item_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _shortage_error(item_id):
+    """Error response for a reservation that matched no row"""
+    available = db.session.query(Item.available_quantity).filter(Item.id == item_id).scalar()
+    if available is None:
+        return jsonify({'error': 'Item not found'}), 404
+    return jsonify({'error': f'Only {available} items available'}), 400
+
+
 @bp.route('/distributions', methods=['POST'])
 @jwt_required()
 def distribute_item():
@@ -108,20 +358,19 @@ def distribute_item():
             return jsonify({'error': f'{field} is required'}), 400
     
     try:
-        item = Item.query.get(data['item_id'])
-        if not item:
-            return jsonify({'error': 'Item not found'}), 404
-        
         quantity = int(data.get('quantity', 1))
-        
-        if item.available_quantity < quantity:
-            return jsonify({'error': f'Only {item.available_quantity} items available'}), 400
+        if quantity < 1:
+            return jsonify({'error': 'quantity must be at least 1'}), 400
         
         dist_date = datetime.strptime(data['distribution_date'], '%Y-%m-%d').date()
         expected_return = None
         if data.get('expected_return_date'):
             expected_return = datetime.strptime(data['expected_return_date'], '%Y-%m-%d').date()
         
+        if not _reserve_stock(data['item_id'], quantity):
+            db.session.rollback()
+            return _shortage_error(data['item_id'])
+        
         distribution = Distribution(
             item_id=data['item_id'],
             recipient_name=data['recipient_name'],
@@ -133,9 +382,10 @@ def distribute_item():
             status='distributed'
         )
         
-        item.available_quantity -= quantity
-        
         db.session.add(distribution)
+        bump_versions('items')
+        apply_delta(item_available=-quantity, active_distributions=1)
+        index_document('distribution', distribution)
         db.session.commit()
         
         return jsonify({
@@ -148,49 +398,199 @@ def distribute_item():
         return jsonify({'error': str(e)}), 500
 
 
+def _batch_lines(data):
+    """
+    Expand a batch distribution request into one line per distribution.
+
+    Accepts explicit `distributions` ({item_id, recipient_name, ...} each)
+    and/or a kit: every entry of `items` ({item_id, quantity}) given to
+    every entry of `recipients` ({recipient_name, recipient_contact}).
+    Raises ValueError for malformed input.
+    """
+    lines = [dict(line) for line in data.get('distributions') or []]
+    for recipient in data.get('recipients') or []:
+        for kit_item in data.get('items') or []:
+            lines.append({**recipient, **kit_item})
+    
+    if not lines:
+        raise ValueError('distributions, or items and recipients, are required')
+    if len(lines) > MAX_BATCH_DISTRIBUTIONS:
+        raise ValueError(f'At most {MAX_BATCH_DISTRIBUTIONS} distributions per batch')
+    
+    for number, line in enumerate(lines, start=1):
+        for field in ('item_id', 'recipient_name'):
+            if not line.get(field):
+                raise ValueError(f'Line {number}: {field} is required')
+        line['item_id'] = int(line['item_id'])
+        line['quantity'] = int(line.get('quantity', 1))
+        if line['quantity'] < 1:
+            raise ValueError(f'Line {number}: quantity must be at least 1')
+    return lines
+
+
+@bp.route('/distributions/batch', methods=['POST'])
+@jwt_required()
+def distribute_batch():
+    """
+    Hand out many items to many recipients in one transaction: either every
+    line is recorded or, if any item is short, none are. Stock is taken with
+    one conditional UPDATE per distinct item.
+    """
+    data = request.get_json() or {}
+    
+    if not data.get('distribution_date'):
+        return jsonify({'error': 'distribution_date is required'}), 400
+    
+    try:
+        lines = _batch_lines(data)
+        dist_date = datetime.strptime(data['distribution_date'], '%Y-%m-%d').date()
+        expected_return = None
+        if data.get('expected_return_date'):
+            expected_return = datetime.strptime(data['expected_return_date'], '%Y-%m-%d').date()
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    wanted = {}
+    loans = {}
+    for line in lines:
+        wanted[line['item_id']] = wanted.get(line['item_id'], 0) + line['quantity']
+        loans[line['item_id']] = loans.get(line['item_id'], 0) + 1
+    
+    try:
+        # Lock items in id order so overlapping batches cannot deadlock
+        short = [
+            item_id for item_id in sorted(wanted)
+            if not _reserve_stock(item_id, wanted[item_id], loans[item_id])
+        ]
+        if short:
+            db.session.rollback()
+            available = dict(
+                db.session.query(Item.id, Item.available_quantity).filter(Item.id.in_(short))
+            )
+            return jsonify({
+                'error': 'Not enough stock for every line; nothing was distributed',
+                'shortages': [
+                    {'item_id': item_id, 'requested': wanted[item_id], 'available': available.get(item_id)}
+                    for item_id in short
+                ]
+            }), 400
+        
+        distributions = [
+            Distribution(
+                item_id=line['item_id'],
+                recipient_name=line['recipient_name'],
+                recipient_contact=line.get('recipient_contact'),
+                quantity=line['quantity'],
+                distribution_date=dist_date,
+                expected_return_date=expected_return,
+                notes=line.get('notes', data.get('notes')),
+                status='distributed'
+            )
+            for line in lines
+        ]
+        db.session.add_all(distributions)
+        db.session.flush()
+        bump_versions('items')
+        apply_delta(item_available=-sum(wanted.values()), active_distributions=len(distributions))
+        index_documents('distribution', distributions)
+        db.session.commit()
+        
+        return jsonify({
+            'message': f'{len(distributions)} distributions recorded',
+            'distributions': [d.to_dict() for d in distributions]
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/distributions', methods=['GET'])
 @jwt_required()
+@etag('distributions', 'items')
 def get_distributions():
     """Get all distributions"""
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
-    status = request.args.get('status')
-    search = request.args.get('search', '')
     
-    query = Distribution.query
+    try:
+        fields = parse_fields(request.args.get('fields'), DISTRIBUTION.fields)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
     
-    if status:
-        query = query.filter(Distribution.status == status)
+    query = _filter_distributions(DISTRIBUTION.query(fields, keys=('distribution_date', 'id')), request.args)
     
-    if search:
-        query = query.filter(
-            (Distribution.recipient_name.ilike(f'%{search}%')) |
-            (Distribution.recipient_contact.ilike(f'%{search}%'))
-        )
+    if wants_cursor(request.args):
+        total = query.count() if request.args.get('include_total') == 'true' else None
+        try:
+            distributions, next_cursor = keyset_page(
+                query, [Distribution.distribution_date, Distribution.id], per_page,
+                request.args.get('cursor')
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'distributions': [DISTRIBUTION.to_dict(row, fields) for row in distributions],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'total': total
+        }), 200
     
-    query = query.order_by(Distribution.distribution_date.desc())
+    query = query.order_by(Distribution.distribution_date.desc(), Distribution.id.desc())
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'distributions': [d.to_dict() for d in pagination.items],
+        'distributions': [DISTRIBUTION.to_dict(row, fields) for row in pagination.items],
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
     }), 200
 
 
+@bp.route('/distributions/export', methods=['GET'])
+@jwt_required()
+@etag('distributions', 'items')
+def export_distributions():
+    """Stream distributions matching the list filters as CSV or XLSX"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be csv or xlsx'}), 400
+    
+    query = db.session.query(
+        Distribution.id, Distribution.item_id, Item.name, Distribution.recipient_name,
+        Distribution.recipient_contact, Distribution.quantity, Distribution.distribution_date,
+        Distribution.expected_return_date, Distribution.actual_return_date,
+        Distribution.return_condition, Distribution.status, Distribution.notes,
+        Distribution.created_at
+    ).join(Item, Distribution.item_id == Item.id)
+    query = _filter_distributions(query, request.args)
+    query = query.order_by(
+        Distribution.distribution_date.desc(), Distribution.id.desc()
+    ).yield_per(STREAM_BATCH_SIZE)
+    
+    header = ['id', 'item_id', 'item_name', 'recipient_name', 'recipient_contact', 'quantity',
+              'distribution_date', 'expected_return_date', 'actual_return_date',
+              'return_condition', 'status', 'notes', 'created_at']
+    return export_response(fmt, 'distributions', header, query)
+
+
+@bp.route('/distributions/overdue', methods=['GET'])
+@jwt_required()
+@etag('overdue_distributions', 'distributions', 'items', depends_on=overdue_state)
+def get_overdue_distributions():
+    """
+    Distributions past their expected return date, grouped by recipient and
+    by item. Read from the overdue set the worker rebuilds periodically
+    (returns drop out of it immediately), or live when the set is stale.
+    """
+    return jsonify(overdue_report()), 200
+
+
 @bp.route('/distributions/<int:dist_id>/return', methods=['POST'])
 @jwt_required()
 def return_item(dist_id):
     """Mark item as returned"""
-    distribution = Distribution.query.get(dist_id)
-    
-    if not distribution:
-        return jsonify({'error': 'Distribution not found'}), 404
-    
-    if distribution.status == 'returned':
-        return jsonify({'error': 'Item already returned'}), 400
-    
     data = request.get_json() or {}
     
     try:
@@ -198,22 +598,44 @@ def return_item(dist_id):
         if data.get('return_date'):
             return_date = datetime.strptime(data['return_date'], '%Y-%m-%d').date()
         
-        distribution.status = 'returned'
-        distribution.actual_return_date = return_date
-        distribution.return_condition = data.get('return_condition')
-        
+        values = {
+            'status': 'returned',
+            'actual_return_date': return_date,
+            'return_condition': data.get('return_condition')
+        }
         if data.get('notes'):
-            distribution.notes = (distribution.notes or '') + '\nReturn: ' + data['notes']
+            values['notes'] = func.coalesce(Distribution.notes, '') + '\nReturn: ' + data['notes']
+        
+        # Only the request that flips the status gets a row back, so a
+        # distribution is never returned (and restocked) twice
+        returned = db.session.execute(
+            update(Distribution)
+            .where(Distribution.id == dist_id, Distribution.status.is_distinct_from('returned'))
+            .values(**values)
+            .returning(Distribution.item_id, Distribution.quantity, Distribution.distribution_date)
+            .execution_options(synchronize_session=False)
+        ).first()
         
-        item = Item.query.get(distribution.item_id)
-        if item:
-            item.available_quantity += distribution.quantity
+        if returned is None:
+            db.session.rollback()
+            if db.session.get(Distribution, dist_id) is None:
+                return jsonify({'error': 'Distribution not found'}), 404
+            return jsonify({'error': 'Item already returned'}), 400
+        
+        item_id, quantity, distribution_date = returned
+        loan_days = max((return_date - distribution_date).days, 0)
+        if _release_stock(item_id, quantity, loan_days, data.get('return_condition')):
+            apply_delta(item_available=quantity, active_distributions=-1)
+        else:
+            apply_delta(active_distributions=-1)
+        bump_versions('distributions', 'items')
+        forget_overdue(dist_id)
         
         db.session.commit()
         
         return jsonify({
             'message': 'Item returned successfully',
-            'distribution': distribution.to_dict()
+            'distribution': db.session.get(Distribution, dist_id).to_dict()
         }), 200
         
     except Exception as e:
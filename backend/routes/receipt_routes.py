@@ -1,32 +1,137 @@
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, request, jsonify, send_file, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required
 from extensions import db
 from models import Receipt, Credit
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import update, bindparam
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+import hashlib
 import os
-from utils.pdf_generator import generate_receipt_pdf
+import re
+import tempfile
+import time
+import uuid
+from utils.pdf_generator import (
+    generate_receipt_pdf, get_render_pool, reset_render_pool, render_receipt_file,
+    render_receipt_bytes, render_receipt_data, get_renderer
+)
+from utils.search import search_filter, index_document
+from utils.serialization import parse_fields, InvalidFields
+from utils.projections import RECEIPT
+from utils.pagination import keyset_page, wants_cursor, InvalidCursor
+from utils.versions import etag, bump_versions
+from utils.serials import allocate_serials
+from utils.jobs import job_handler, periodic_job, enqueue, heartbeat, with_heartbeat, JobFailed
+from utils.serialization import dumps
+from utils.cache import get_pdf_cache
+from utils.export import stream_zip
 
 bp = Blueprint('receipts', __name__, url_prefix='/api/receipts')
 
-def generate_serial_number():
-    """Generate receipt serial number in format RCP-YYYY-NNNN"""
-    year = datetime.now().year
-    year_start = datetime(year, 1, 1)
-    year_end = datetime(year, 12, 31, 23, 59, 59)
+# Most receipts one batch request may allocate
+MAX_BATCH_RECEIPTS = 5000
+
+# Larger batches are rendered by the job worker rather than inside the
+# request, which would outlive gunicorn's worker timeout
+MAX_SYNC_BATCH_RECEIPTS = 200
+
+# Rendered receipts whose pdf_path is committed together
+BATCH_COMMIT_SIZE = 200
+
+# Rows fetched per round trip while exporting
+EXPORT_BATCH_SIZE = 500
+
+# Missing PDFs rendered ahead of the ZIP being written during an export
+EXPORT_RENDER_AHEAD = 16
+
+# Merged PDF exports are written by the job worker under UPLOAD_FOLDER/EXPORT_DIR
+EXPORT_DIR = 'exports'
+
+# Finished merged PDF exports are deleted after this long
+EXPORT_EXPIRY = timedelta(hours=24)
+
+# Filters a merged PDF export job is given, as for get_receipts
+EXPORT_FILTERS = ('search', 'start_date', 'end_date')
+
+EXPORT_NAME = re.compile(r'^[0-9a-f]{32}\.pdf$')
+
+def create_receipt(credit):
+    """
+    Allocate and link the receipt for `credit` and commit, then render its PDF.
+
+    The per-year serial counter row stays locked only until that first
+    commit; the PDF is rendered afterwards and its path recorded in a
+    second short transaction. A receipt whose render fails keeps its serial
+    number and no pdf_path, and download_receipt renders it on demand.
+    """
+    # Reserve the next serial number
+    serial_number = allocate_serials()[0]
+    
+    # Create receipt record
+    receipt = Receipt(
+        serial_number=serial_number,
+        donor_name=credit.donor_name,
+        amount=credit.amount,
+        date=credit.date
+    )
+    
+    db.session.add(receipt)
+    db.session.flush()
+    
+    # Link receipt to credit
+    credit.receipt_id = receipt.id
+    
+    index_document('receipt', receipt)
+    db.session.commit()
+    
+    # Generate actual PDF file
+    pdf_filename = f'{serial_number}.pdf'
+    pdf_relative_path = f'receipts/{pdf_filename}'
+    pdf_full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], pdf_relative_path)
+    
+    try:
+        generate_receipt_pdf(receipt, pdf_full_path)
+    except Exception as e:
+        current_app.logger.warning(f'Receipt {serial_number} PDF render failed: {e}')
+        return receipt
     
-    count = Receipt.query.filter(
-        Receipt.created_at >= year_start,
-        Receipt.created_at <= year_end
-    ).count()
+    # Store the relative path in database
+    receipt.pdf_path = pdf_relative_path
+    db.session.commit()
+    return receipt
+
+
+@job_handler('receipt.generate')
+def generate_receipt_job(payload):
+    """Worker side of generate_receipt's async mode"""
+    credit = Credit.query.get(payload['credit_id'])
+    if not credit:
+        raise JobFailed('Credit not found')
+    
+    # A retried job whose earlier attempt committed just reports the receipt
+    if credit.receipt_id:
+        return {'receipt': Receipt.query.get(credit.receipt_id).to_dict()}
     
-    serial_num = count + 1
-    return f"RCP-{year}-{serial_num:04d}"
+    return {'receipt': create_receipt(credit).to_dict()}
+
+
+def _wants_async():
+    return (request.args.get('async') == 'true'
+            or 'respond-async' in request.headers.get('Prefer', ''))
 
 
 @bp.route('/generate/<int:credit_id>', methods=['POST'])
 @jwt_required()
 def generate_receipt(credit_id):
-    """Generate receipt for a credit"""
+    """
+    Generate receipt for a credit.
+    
+    With `async=true` (or `Prefer: respond-async`) the work is queued for
+    the background worker and 202 is returned with the job to poll at
+    /api/jobs/<id>.
+    """
     credit = Credit.query.get(credit_id)
     
     if not credit:
@@ -36,35 +141,18 @@ def generate_receipt(credit_id):
         return jsonify({'error': 'Receipt already exists for this credit'}), 400
     
     try:
-        # Generate serial number
-        serial_number = generate_serial_number()
-        
-        # Create receipt record
-        receipt = Receipt(
-            serial_number=serial_number,
-            donor_name=credit.donor_name,
-            amount=credit.amount,
-            date=credit.date
-        )
+        if _wants_async():
+            job = enqueue('receipt.generate', {'credit_id': credit.id})
+            db.session.commit()
+            response = jsonify({
+                'message': 'Receipt generation queued',
+                'job': job.to_dict()
+            })
+            response.status_code = 202
+            response.headers['Location'] = f'/api/jobs/{job.id}'
+            return response
         
-        db.session.add(receipt)
-        db.session.flush()
-        
-        # Generate actual PDF file
-        pdf_filename = f'{serial_number}.pdf'
-        pdf_relative_path = f'receipts/{pdf_filename}'
-        pdf_full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], pdf_relative_path)
-        
-        # Generate the PDF
-        generate_receipt_pdf(receipt, pdf_full_path)
-        
-        # Store the relative path in database
-        receipt.pdf_path = pdf_relative_path
-        
-        # Link receipt to credit
-        credit.receipt_id = receipt.id
-        
-        db.session.commit()
+        receipt = create_receipt(credit)
         
         return jsonify({
             'message': 'Receipt generated successfully',
@@ -76,8 +164,218 @@ def generate_receipt(credit_id):
         return jsonify({'error': str(e)}), 500
 
 
+def _batch_credits(data):
+    """
+    Resolve a batch request to (credits to receipt, failures). Accepts
+    `credit_ids` or `start_date`/`end_date` over credit dates.
+    """
+    query = Credit.query
+    failures = []
+    
+    if data.get('credit_ids') is not None:
+        ids = data['credit_ids']
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            raise ValueError('credit_ids must be a list of integers')
+        ids = list(dict.fromkeys(ids))
+        query = query.filter(Credit.id.in_(ids))
+        found = {credit.id: credit for credit in query.order_by(Credit.date, Credit.id).with_for_update()}
+        failures += [{'credit_id': i, 'error': 'Credit not found'} for i in ids if i not in found]
+        credits = list(found.values())
+    elif data.get('start_date') or data.get('end_date'):
+        if data.get('start_date'):
+            query = query.filter(Credit.date >= datetime.strptime(data['start_date'], '%Y-%m-%d').date())
+        if data.get('end_date'):
+            query = query.filter(Credit.date <= datetime.strptime(data['end_date'], '%Y-%m-%d').date())
+        credits = query.filter(Credit.receipt_id.is_(None)).order_by(Credit.date, Credit.id).with_for_update().all()
+    else:
+        raise ValueError('Provide credit_ids or start_date/end_date')
+    
+    pending = []
+    for credit in credits:
+        if credit.receipt_id:
+            failures.append({'credit_id': credit.id, 'error': 'Receipt already exists for this credit'})
+        else:
+            pending.append(credit)
+    return pending, failures
+
+
+def _render_batch(rows, credit_ids, failures):
+    """
+    Render the PDFs of allocated receipts on the process pool, recording
+    their paths every BATCH_COMMIT_SIZE renders. `rows` are (id,
+    serial_number, donor_name, amount, date) tuples. Yields a progress line
+    per receipt and then a summary; render errors are added to `failures`.
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    paths = {row[0]: f'receipts/{row[1]}.pdf' for row in rows}
+    serials = {row[0]: row[1] for row in rows}
+    tasks = [
+        (receipt_id, (*values, os.path.join(upload_folder, paths[receipt_id])))
+        for receipt_id, *values in rows
+    ]
+    
+    def record_paths(done):
+        if not done:
+            return
+        table = Receipt.__table__
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('receipt_id')).values(pdf_path=bindparam('path')),
+            [{'receipt_id': receipt_id, 'path': paths[receipt_id]} for receipt_id in done]
+        )
+        bump_versions('receipts')
+        db.session.commit()
+        done.clear()
+    
+    total = len(tasks)
+    generated = 0
+    done = []
+    
+    pool = get_render_pool()
+    futures = {pool.submit(render_receipt_file, *args): receipt_id for receipt_id, args in tasks}
+    try:
+        for completed, future in enumerate(as_completed(futures), start=1):
+            # No-op in a request; keeps a long render_batch_job claimed
+            heartbeat()
+            receipt_id = futures[future]
+            credit_id = credit_ids[receipt_id]
+            line = {
+                'event': 'progress',
+                'completed': completed,
+                'total': total,
+                'credit_id': credit_id,
+                'receipt_id': receipt_id,
+                'serial_number': serials[receipt_id]
+            }
+            try:
+                future.result()
+            except BrokenProcessPool as e:
+                reset_render_pool()
+                failure = {'credit_id': credit_id, 'receipt_id': receipt_id, 'error': str(e) or 'Render worker died'}
+                failures.append(failure)
+                line['error'] = failure['error']
+            except Exception as e:
+                failure = {'credit_id': credit_id, 'receipt_id': receipt_id, 'error': str(e)}
+                failures.append(failure)
+                line['error'] = failure['error']
+            else:
+                generated += 1
+                done.append(receipt_id)
+                if len(done) >= BATCH_COMMIT_SIZE:
+                    record_paths(done)
+            yield line
+    finally:
+        for future in futures:
+            future.cancel()
+        record_paths(done)
+    
+    yield {'event': 'complete', 'generated': generated, 'failed': failures}
+
+
+@job_handler('receipt.render_batch')
+def render_batch_job(payload):
+    """Worker side of a batch too large to render in the request"""
+    credit_ids = {int(receipt_id): credit_id for receipt_id, credit_id in payload['credit_ids'].items()}
+    # A retried job only renders what earlier attempts did not
+    rows = db.session.query(
+        Receipt.id, Receipt.serial_number, Receipt.donor_name, Receipt.amount, Receipt.date
+    ).filter(Receipt.id.in_(credit_ids), Receipt.pdf_path.is_(None)).order_by(Receipt.id).all()
+    # Don't hold a transaction open through the render; heartbeats write meanwhile
+    db.session.commit()
+    summary = list(_render_batch(rows, credit_ids, list(payload['failed'])))[-1]
+    del summary['event']
+    return summary
+
+
+@bp.route('/generate/batch', methods=['POST'])
+@jwt_required()
+def generate_receipts_batch():
+    """
+    Generate receipts for many credits at once.
+    
+    Receipts and their serial numbers are allocated in one transaction,
+    then the PDFs are rendered in parallel on a process pool. Progress is
+    streamed as NDJSON (`format=ndjson` or an application/x-ndjson Accept
+    header), one line per rendered receipt; otherwise a summary is returned
+    when the batch finishes. Batches over MAX_SYNC_BATCH_RECEIPTS are
+    rendered by the job worker instead: 202 is returned with the job to
+    poll at /api/jobs/<id>. Receipts whose PDF failed to render keep their
+    serial number and are reported with the error.
+    """
+    data = request.get_json() or {}
+    
+    try:
+        credits, failures = _batch_credits(data)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    
+    if len(credits) > MAX_BATCH_RECEIPTS:
+        db.session.rollback()
+        return jsonify({'error': f'At most {MAX_BATCH_RECEIPTS} receipts per batch, got {len(credits)}'}), 400
+    
+    try:
+        serials = allocate_serials(len(credits)) if credits else []
+        receipts = []
+        for credit, serial_number in zip(credits, serials):
+            receipt = Receipt(
+                serial_number=serial_number,
+                donor_name=credit.donor_name,
+                amount=credit.amount,
+                date=credit.date
+            )
+            db.session.add(receipt)
+            receipts.append(receipt)
+        db.session.flush()
+        
+        for credit, receipt in zip(credits, receipts):
+            credit.receipt_id = receipt.id
+            index_document('receipt', receipt)
+        
+        credit_ids = {receipt.id: credit.id for credit, receipt in zip(credits, receipts)}
+        rows = [
+            (receipt.id, receipt.serial_number, receipt.donor_name, receipt.amount, receipt.date)
+            for receipt in receipts
+        ]
+        job = None
+        if len(receipts) > MAX_SYNC_BATCH_RECEIPTS:
+            job = enqueue('receipt.render_batch', {'credit_ids': credit_ids, 'failed': failures})
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    if job is not None:
+        response = jsonify({
+            'message': f'{len(receipts)} receipts allocated; rendering queued',
+            'allocated': len(receipts),
+            'failed': failures,
+            'job': job.to_dict()
+        })
+        response.status_code = 202
+        response.headers['Location'] = f'/api/jobs/{job.id}'
+        return response
+    
+    ndjson = (request.args.get('format') == 'ndjson'
+              or request.accept_mimetypes.best == 'application/x-ndjson')
+    
+    def run():
+        yield {'event': 'allocated', 'total': len(receipts), 'failed': list(failures)}
+        yield from _render_batch(rows, credit_ids, failures)
+    
+    if ndjson:
+        return Response(
+            stream_with_context(dumps(line) + '\n' for line in run()),
+            mimetype='application/x-ndjson'
+        )
+    
+    summary = list(run())[-1]
+    del summary['event']
+    return jsonify(summary), 200
+
+
 @bp.route('/<int:receipt_id>', methods=['GET'])
 @jwt_required()
+@etag('receipts')
 def get_receipt(receipt_id):
     """Get receipt details"""
     receipt = Receipt.query.get(receipt_id)
@@ -88,53 +386,293 @@ def get_receipt(receipt_id):
     return jsonify({'receipt': receipt.to_dict()}), 200
 
 
+def _filter_receipts(query, args):
+    """Apply the receipt list filters (search, start_date, end_date) to `query`"""
+    search = args.get('search', '')
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    
+    if search:
+        query = query.filter(
+            search_filter('receipt', search, Receipt.id, [Receipt.donor_name, Receipt.serial_number])
+        )
+    
+    if start_date:
+        query = query.filter(Receipt.date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+    
+    if end_date:
+        query = query.filter(Receipt.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+    
+    return query
+
+
 @bp.route('', methods=['GET'])
 @jwt_required()
+@etag('receipts')
 def get_receipts():
     """Get all receipts with pagination"""
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    search = request.args.get('search', '')
     
-    query = Receipt.query
+    try:
+        fields = parse_fields(request.args.get('fields'), RECEIPT.fields)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
     
-    if search:
-        query = query.filter(
-            (Receipt.donor_name.ilike(f'%{search}%')) |
-            (Receipt.serial_number.ilike(f'%{search}%'))
-        )
+    try:
+        query = _filter_receipts(RECEIPT.query(fields, keys=('date', 'id')), request.args)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    
+    if wants_cursor(request.args):
+        total = query.count() if request.args.get('include_total') == 'true' else None
+        try:
+            receipts, next_cursor = keyset_page(
+                query, [Receipt.date, Receipt.id], per_page, request.args.get('cursor')
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'receipts': [RECEIPT.to_dict(row, fields) for row in receipts],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'total': total
+        }), 200
     
-    query = query.order_by(Receipt.date.desc())
+    query = query.order_by(Receipt.date.desc(), Receipt.id.desc())
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
-        'receipts': [receipt.to_dict() for receipt in pagination.items],
+        'receipts': [RECEIPT.to_dict(row, fields) for row in pagination.items],
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
     }), 200
 
 
+def _receipt_sources(rows):
+    """
+    Yield (row, source) for export rows in order, where source is the stored
+    PDF's path or freshly rendered bytes. Missing PDFs are rendered on the
+    process pool up to EXPORT_RENDER_AHEAD receipts ahead of the consumer.
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    pending = deque()
+    rows = iter(rows)
+    
+    def submit_next():
+        row = next(rows, None)
+        if row is None:
+            return False
+        path = os.path.join(upload_folder, row.pdf_path) if row.pdf_path else None
+        if path and os.path.exists(path):
+            pending.append((row, path))
+        else:
+            pool = get_render_pool()
+            pending.append((row, pool.submit(
+                render_receipt_data, row.serial_number, row.donor_name, row.amount, row.date
+            )))
+        return True
+    
+    try:
+        while len(pending) < EXPORT_RENDER_AHEAD and submit_next():
+            pass
+        while pending:
+            row, source = pending.popleft()
+            submit_next()
+            if not isinstance(source, str):
+                try:
+                    source = source.result()
+                except BrokenProcessPool:
+                    reset_render_pool()
+                    raise
+            yield row, source
+    finally:
+        for _, source in pending:
+            if not isinstance(source, str):
+                source.cancel()
+
+
+def _export_query(args):
+    """Receipts matching the list filters in `args`, oldest first, fetched in batches"""
+    query = db.session.query(
+        Receipt.id, Receipt.serial_number, Receipt.donor_name, Receipt.amount,
+        Receipt.date, Receipt.pdf_path, Receipt.created_at
+    )
+    query = _filter_receipts(query, args)
+    return query.order_by(Receipt.date, Receipt.id).yield_per(EXPORT_BATCH_SIZE)
+
+
+@bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_receipts():
+    """
+    Export every receipt matching the list filters as one download.
+    
+    format=zip (default) streams a ZIP of the individual PDFs as they are
+    read or rendered. format=pdf is a single merged PDF, one page each;
+    reportlab only writes a document once it is complete, so it is built by
+    the job worker: 202 is returned with the job to poll at /api/jobs/<id>,
+    whose result names the download URL.
+    """
+    fmt = request.args.get('format', 'zip')
+    if fmt not in ('zip', 'pdf'):
+        return jsonify({'error': 'format must be zip or pdf'}), 400
+    
+    try:
+        query = _export_query(request.args)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    
+    if fmt == 'pdf':
+        filters = {name: request.args[name] for name in EXPORT_FILTERS if request.args.get(name)}
+        job = enqueue('receipt.export_pdf', {'filters': filters})
+        db.session.commit()
+        
+        response = jsonify({'message': 'Merged PDF export queued', 'job': job.to_dict()})
+        response.status_code = 202
+        response.headers['Location'] = f'/api/jobs/{job.id}'
+        return response
+    
+    entries = (
+        (f'{row.serial_number}.pdf', row.created_at.timetuple()[:6], source)
+        for row, source in _receipt_sources(query)
+    )
+    return Response(
+        stream_with_context(stream_zip(entries)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename="receipts.zip"'}
+    )
+
+
+@job_handler('receipt.export_pdf')
+def export_pdf_job(payload):
+    """
+    Worker side of a merged PDF export: render every matching receipt as a
+    page of one PDF (pages share one copy of the template) under EXPORT_DIR.
+    """
+    export_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], EXPORT_DIR)
+    os.makedirs(export_dir, exist_ok=True)
+    
+    rows = _export_query(payload['filters'])
+    name = f'{uuid.uuid4().hex}.pdf'
+    fd, tmp_path = tempfile.mkstemp(dir=export_dir, suffix='.tmp')
+    os.close(fd)
+    try:
+        get_renderer().render_many(with_heartbeat(rows), tmp_path)
+        os.replace(tmp_path, os.path.join(export_dir, name))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return {'download_url': f'/api/receipts/export/{name}'}
+
+
+@bp.route('/export/<name>', methods=['GET'])
+@jwt_required()
+def download_export(name):
+    """Download a merged PDF export built by export_pdf_job"""
+    if not EXPORT_NAME.match(name):
+        return jsonify({'error': 'Export not found'}), 404
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], EXPORT_DIR, name)
+    if not os.path.isfile(path):
+        return jsonify({'error': 'Export not found'}), 404
+    return send_file(path, as_attachment=True, download_name='receipts.pdf',
+                     mimetype='application/pdf', conditional=True)
+
+
+def expire_exports(upload_folder, now=None):
+    """Delete merged PDF exports (and abandoned partial ones) older than EXPORT_EXPIRY"""
+    export_dir = os.path.join(upload_folder, EXPORT_DIR)
+    cutoff = (now or time.time()) - EXPORT_EXPIRY.total_seconds()
+    removed = 0
+    for entry in os.scandir(export_dir) if os.path.isdir(export_dir) else ():
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    return {'removed': removed}
+
+
+@periodic_job('receipt.expire_exports', timedelta(hours=1))
+def expire_exports_job(payload):
+    return expire_exports(current_app.config['UPLOAD_FOLDER'])
+
+
+def receipt_fingerprint(receipt):
+    """Hash of everything printed on a receipt; identical fingerprints render identical PDFs"""
+    payload = '|'.join([
+        str(receipt.id), receipt.serial_number, receipt.donor_name,
+        repr(receipt.amount), receipt.date.isoformat()
+    ])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
 @bp.route('/download/<int:receipt_id>', methods=['GET'])
 @jwt_required()
 def download_receipt(receipt_id):
-    """Download receipt PDF"""
+    """
+    Download receipt PDF.
+
+    The file written at generation time is served when it is still on disk
+    (through nginx when RECEIPT_ACCEL_REDIRECT is set); otherwise the PDF is
+    re-rendered from the receipt row and kept in a size-bounded in-memory
+    LRU. Responses carry an ETag and Last-Modified and honour Range.
+    """
     receipt = Receipt.query.get(receipt_id)
     
     if not receipt:
         return jsonify({'error': 'Receipt not found'}), 404
     
-    if not receipt.pdf_path:
-        return jsonify({'error': 'PDF not generated yet'}), 404
+    download_name = f"{receipt.serial_number}.pdf"
+    tag = receipt_fingerprint(receipt)
+    
+    pdf_full_path = None
+    if receipt.pdf_path:
+        pdf_full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], receipt.pdf_path)
+        try:
+            stat = os.stat(pdf_full_path)
+            # The stored file and a fresh render differ in their timestamps
+            tag = f"{tag}-{int(stat.st_mtime)}-{stat.st_size}"
+        except OSError:
+            pdf_full_path = None
     
-    pdf_full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], receipt.pdf_path)
+    if pdf_full_path and current_app.config.get('RECEIPT_ACCEL_REDIRECT'):
+        response = current_app.response_class(mimetype='application/pdf')
+        response.headers['X-Accel-Redirect'] = (
+            current_app.config['RECEIPT_ACCEL_REDIRECT'].rstrip('/') + '/' + receipt.pdf_path
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.set_etag(tag)
+        return response
     
-    if not os.path.exists(pdf_full_path):
-        return jsonify({'error': 'PDF file not found'}), 404
+    if pdf_full_path:
+        response = send_file(
+            pdf_full_path,
+            as_attachment=True,
+            download_name=download_name,
+            mimetype='application/pdf',
+            etag=tag,
+            last_modified=receipt.created_at,
+            conditional=True
+        )
+    else:
+        response = current_app.response_class(mimetype='application/pdf')
+        response.set_etag(tag)
+        response.last_modified = receipt.created_at
+        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        
+        # Answer If-None-Match before rendering anything
+        if request.if_none_match.contains(tag):
+            response.status_code = 304
+        else:
+            cache = get_pdf_cache()
+            data = cache.get(tag)
+            if data is None:
+                data = render_receipt_bytes(receipt)
+                cache.set(tag, data)
+            response.set_data(data)
+            response.make_conditional(request, accept_ranges=True, complete_length=len(data))
     
-    return send_file(
-        pdf_full_path,
-        as_attachment=True,
-        download_name=f"{receipt.serial_number}.pdf",
-        mimetype='application/pdf'
-    )
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,30 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from utils.search import search, KIND_CODES
+
+bp = Blueprint('search', __name__, url_prefix='/api/search')
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+def unified_search():
+    """Ranked search across credits, expenses, items, distributions and receipts"""
+    term = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    types = request.args.get('types')
+    kinds = types.split(',') if types else None
+    
+    if kinds and any(k not in KIND_CODES for k in kinds):
+        return jsonify({'error': f'types must be among: {", ".join(KIND_CODES)}'}), 400
+    
+    if not term:
+        return jsonify({'results': []}), 200
+    
+    results = [{
+        'type': kind,
+        'id': ref_id,
+        'title': title,
+        'subtitle': body,
+        'rank': float(rank)
+    } for kind, ref_id, title, body, rank in search(term, kinds, limit)]
+    
+    return jsonify({'results': results}), 200
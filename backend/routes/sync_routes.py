@@ -0,0 +1,26 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from utils.pagination import InvalidCursor
+from utils.sync import collect_changes, parse_token
+
+bp = Blueprint('sync', __name__, url_prefix='/api/sync')
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+def sync():
+    """Rows created, updated or deleted since the client's last sync token"""
+    since = None
+    if request.args.get('since'):
+        try:
+            since = parse_token(request.args['since'])
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid sync token'}), 400
+    
+    changes, deleted, full, token = collect_changes(since)
+    
+    return jsonify({
+        'token': token,
+        'full': full,
+        **changes,
+        'deleted': deleted
+    }), 200
@@ -0,0 +1,93 @@
+"""Shared fixtures: the app on a throwaway, fully migrated SQLite database"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# app.py reads DATABASE_URL at import time, so point it at a scratch file first
+TMP_DIR = tempfile.mkdtemp(prefix='centswise-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TMP_DIR, 'centswise.db')}"
+
+from app import app as flask_app  # noqa: E402
+from extensions import db  # noqa: E402
+
+
+def make_auth_headers(app):
+    """A bearer token for the admin user app.py creates on startup"""
+    from flask_jwt_extended import create_access_token
+    from models import AdminUser
+
+    with app.app_context():
+        admin = AdminUser.query.filter_by(username='admin').first()
+        return {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+
+
+@pytest.fixture(scope='session')
+def app():
+    """The app with every migration applied and some rows in each table"""
+    from flask_migrate import upgrade
+    from utils.search import ensure_search_index
+    from utils.overdue import refresh_overdue
+
+    flask_app.config['TESTING'] = True
+    flask_app.config['UPLOAD_FOLDER'] = os.path.join(TMP_DIR, 'uploads')
+    for folder in ('receipts', 'documents'):
+        os.makedirs(os.path.join(flask_app.config['UPLOAD_FOLDER'], folder), exist_ok=True)
+
+    with flask_app.app_context():
+        upgrade(directory=os.path.join(BACKEND_DIR, 'migrations'))
+        ensure_search_index()
+
+    _seed(flask_app)
+
+    with flask_app.app_context():
+        refresh_overdue()
+        db.session.commit()
+    return flask_app
+
+
+@pytest.fixture(scope='session')
+def auth_headers(app):
+    return make_auth_headers(app)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        db.session.rollback()
+
+
+def _seed(app):
+    """Enough related rows that a per-row lazy load shows up in query counts"""
+    client = app.test_client()
+    headers = make_auth_headers(app)
+
+    def post(url, payload):
+        response = client.post(url, json=payload, headers=headers)
+        assert response.status_code in (200, 201), response.get_json()
+        return response.get_json()
+
+    for i in range(30):
+        post('/api/money/credits', {'donor_name': f'Donor {i}', 'amount': 10 + i,
+                                    'purpose': 'zakat', 'date': '2024-03-01',
+                                    'payment_method': 'cash'})
+        post('/api/money/expenses', {'amount': 5 + i, 'purpose': 'food', 'category': 'medical',
+                                     'beneficiary_name': f'Beneficiary {i}',
+                                     'date': '2024-03-02'})
+        post('/api/property/items', {'name': f'Item {i}', 'category': 'furniture',
+                                     'total_quantity': 5, 'condition': 'good'})
+    for i in range(5):
+        post('/api/property/distributions', {'item_id': 1, 'recipient_name': f'Recipient {i}',
+                                             'quantity': 1, 'distribution_date': '2024-03-05'})
+    for credit_id in range(1, 6):
+        post(f'/api/receipts/generate/{credit_id}', {})
@@ -0,0 +1,84 @@
+"""Bulk credit/expense import (utils/bulk_import.py, /api/money/*/bulk)"""
+from datetime import date
+
+import pytest
+
+from utils.bulk_import import validate_credit, validate_expense
+
+TODAY = date(2024, 6, 1)
+
+
+@pytest.mark.parametrize('amount', ['nan', 'inf', '-inf', 'NaN', '1e999', '0', '-5', 'abc'])
+def test_non_finite_and_non_positive_amounts_are_rejected(amount):
+    with pytest.raises(ValueError):
+        validate_credit({'donor_name': 'A', 'amount': amount, 'purpose': 'zakat'}, TODAY)
+
+
+def test_amount_with_thousands_separator_is_accepted():
+    values = validate_credit({'donor_name': 'A', 'amount': '1,250.50', 'purpose': 'zakat'}, TODAY)
+    assert values['amount'] == 1250.5
+    assert values['date'] == TODAY
+
+
+def test_expense_document_path_must_name_a_stored_document(tmp_path):
+    record = {'amount': '10', 'purpose': 'rent', 'document_path': 'documents/ab/' + 'ab' * 32}
+    with pytest.raises(ValueError):
+        validate_expense(record, TODAY, str(tmp_path))
+
+
+def test_csv_import_reports_bad_rows_and_in_file_duplicates(client, auth_headers):
+    body = (
+        'donor_name,amount,purpose,date\n'
+        'Bulk Donor 1,100,zakat,2024-04-01\n'
+        'Bulk Donor 1,100,zakat,2024-04-01\n'
+        'Bulk Donor 2,nan,zakat,2024-04-01\n'
+        'Bulk Donor 3,25,sadaqah,2024-04-02\n'
+    )
+    before = client.get('/api/money/balance', headers=auth_headers).get_json()
+
+    response = client.post('/api/money/credits/bulk', data=body,
+                           headers=dict(auth_headers, **{'Content-Type': 'text/csv'}))
+    report = response.get_json()
+    assert response.status_code == 200
+    assert report['received'] == 4
+    assert report['inserted'] == 2
+    assert report['duplicates'] == 1
+    assert report['errors'] == [{'row': 4, 'error': 'amount must be a finite number'}]
+
+    after = client.get('/api/money/balance', headers=auth_headers).get_json()
+    assert after['total_collected'] == pytest.approx(before['total_collected'] + 125)
+
+
+def test_expense_import_rejects_unknown_document(client, auth_headers):
+    rows = [{'amount': 10, 'purpose': 'rent', 'document_path': 'documents/00/' + '0' * 64}]
+    response = client.post('/api/money/expenses/bulk', json=rows, headers=auth_headers)
+    report = response.get_json()
+    assert report['inserted'] == 0
+    assert report['errors'][0]['error'] == 'document_path does not name an uploaded document'
+
+
+def test_reposting_the_same_file_inserts_nothing(client, auth_headers):
+    body = (
+        'donor_name,amount,purpose,date\n'
+        'Repost Donor 1,40,zakat,2024-04-03\n'
+        'Repost Donor 2,60,zakat,2024-04-03\n'
+    )
+    headers = dict(auth_headers, **{'Content-Type': 'text/csv'})
+    first = client.post('/api/money/credits/bulk', data=body, headers=headers).get_json()
+    assert (first['inserted'], first['duplicates']) == (2, 0)
+    before = client.get('/api/money/balance', headers=auth_headers).get_json()
+
+    again = client.post('/api/money/credits/bulk', data=body, headers=headers).get_json()
+    assert (again['received'], again['inserted'], again['duplicates']) == (2, 0, 2)
+    after = client.get('/api/money/balance', headers=auth_headers).get_json()
+    assert after['total_collected'] == pytest.approx(before['total_collected'])
+
+
+def test_bulk_row_matching_a_recent_single_insert_is_a_duplicate(client, auth_headers):
+    client.post('/api/money/expenses', json={'amount': 17, 'purpose': 'bulk after single',
+                                             'date': '2024-04-04'},
+                headers=auth_headers)
+    rows = [{'amount': 17, 'purpose': 'bulk after single', 'date': '2024-04-04'},
+            {'amount': 18, 'purpose': 'bulk after single', 'date': '2024-04-04'}]
+    report = client.post('/api/money/expenses/bulk', json=rows, headers=auth_headers).get_json()
+    assert (report['inserted'], report['duplicates']) == (1, 1)
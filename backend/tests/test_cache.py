@@ -0,0 +1,62 @@
+"""The result cache behind the dashboard summaries (utils/cache.py)"""
+import pickle
+import uuid
+
+from utils.cache import MemoryCache, decode_entry, encode_entry
+
+
+def test_repeat_is_a_hit_until_a_write_to_a_keyed_table(client, auth_headers):
+    url = f'/api/dashboard/stats?probe={uuid.uuid4().hex}'
+    assert client.get(url, headers=auth_headers).headers['X-Cache'] == 'MISS'
+    hit = client.get(url, headers=auth_headers)
+    assert hit.headers['X-Cache'] == 'HIT'
+
+    client.post('/api/money/credits', json={'donor_name': f'Cache {uuid.uuid4().hex}', 'amount': 9,
+                                            'purpose': 'zakat'},
+                headers=auth_headers)
+    after = client.get(url, headers=auth_headers)
+    assert after.headers['X-Cache'] == 'MISS'
+    assert (after.get_json()['donors']['total_donations']
+            == hit.get_json()['donors']['total_donations'] + 1)
+
+
+def test_writes_to_other_tables_keep_the_entry(client, auth_headers):
+    url = f'/api/dashboard/stats?probe={uuid.uuid4().hex}'
+    client.get(url, headers=auth_headers)
+    client.post('/api/money/expenses', json={'amount': 2, 'purpose': f'cache {uuid.uuid4().hex}'},
+                headers=auth_headers)
+    assert client.get(url, headers=auth_headers).headers['X-Cache'] == 'HIT'
+
+
+def test_counters_are_reported(client, auth_headers):
+    before = client.get('/api/dashboard/cache', headers=auth_headers).get_json()
+    url = f'/api/dashboard/stats?probe={uuid.uuid4().hex}'
+    client.get(url, headers=auth_headers)
+    client.get(url, headers=auth_headers)
+    after = client.get('/api/dashboard/cache', headers=auth_headers).get_json()
+    assert after['backend'] == 'memory'
+    assert (after['hits'] - before['hits'], after['misses'] - before['misses']) == (1, 1)
+
+
+def test_memory_cache_evicts_least_recently_used_and_expired():
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', 1, ttl=60)
+    cache.set('b', 2, ttl=60)
+    assert cache.get('a') == 1
+    cache.set('c', 3, ttl=60)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+    cache.set('gone', 4, ttl=-1)
+    assert cache.get('gone') is None
+
+
+def test_redis_entries_round_trip_as_json():
+    entry = (b'{"ok": true}\x00\xff', 200, 'application/json')
+    assert decode_entry(encode_entry(entry).encode()) == entry
+
+
+def test_foreign_redis_values_read_as_misses():
+    assert decode_entry(pickle.dumps((b'body', 200, 'text/plain'))) is None
+    assert decode_entry(b'{"body": "not base64!", "status": 200, "mimetype": "text/plain"}') is None
+    assert decode_entry(b'[]') is None
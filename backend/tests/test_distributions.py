@@ -0,0 +1,90 @@
+"""Stock reservation for distributions (routes/property_routes.py)"""
+import threading
+import uuid
+
+DAY = '2024-06-01'
+
+
+def new_item(client, headers, quantity):
+    body = client.post('/api/property/items', headers=headers,
+                       json={'name': f'Stock {uuid.uuid4().hex}', 'category': 'tools',
+                             'total_quantity': quantity, 'condition': 'good'}).get_json()
+    return body['item']['id']
+
+
+def available(client, headers, item_id):
+    return client.get(f'/api/property/items/{item_id}', headers=headers).get_json()['item']['available_quantity']
+
+
+def distribute(client, headers, item_id, quantity=1):
+    return client.post('/api/property/distributions', headers=headers,
+                       json={'item_id': item_id, 'recipient_name': 'Racer', 'quantity': quantity,
+                             'distribution_date': DAY})
+
+
+def test_concurrent_distributions_never_overdraw(app, client, auth_headers):
+    item_id = new_item(client, auth_headers, 3)
+    statuses = []
+    start = threading.Barrier(8)
+
+    def worker():
+        own_client = app.test_client()
+        start.wait()
+        statuses.append(distribute(own_client, auth_headers, item_id).status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201] * 3 + [400] * 5
+    assert available(client, auth_headers, item_id) == 0
+
+
+def test_shortage_and_missing_item_leave_stock_alone(client, auth_headers):
+    item_id = new_item(client, auth_headers, 2)
+    response = distribute(client, auth_headers, item_id, quantity=3)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Only 2 items available'
+    assert available(client, auth_headers, item_id) == 2
+
+    assert distribute(client, auth_headers, 999999).status_code == 404
+
+
+def test_batch_is_all_or_nothing(client, auth_headers):
+    plenty = new_item(client, auth_headers, 10)
+    scarce = new_item(client, auth_headers, 1)
+    response = client.post('/api/property/distributions/batch', headers=auth_headers, json={
+        'distribution_date': DAY,
+        'items': [{'item_id': plenty, 'quantity': 2}, {'item_id': scarce}],
+        'recipients': [{'recipient_name': 'Kit A'}, {'recipient_name': 'Kit B'}]
+    })
+    assert response.status_code == 400
+    assert response.get_json()['shortages'] == [{'item_id': scarce, 'requested': 2, 'available': 1}]
+    assert (available(client, auth_headers, plenty), available(client, auth_headers, scarce)) == (10, 1)
+
+
+def test_kit_batch_expands_to_every_recipient(client, auth_headers):
+    first = new_item(client, auth_headers, 10)
+    second = new_item(client, auth_headers, 10)
+    response = client.post('/api/property/distributions/batch', headers=auth_headers, json={
+        'distribution_date': DAY,
+        'items': [{'item_id': first, 'quantity': 2}, {'item_id': second}],
+        'recipients': [{'recipient_name': 'Kit A'}, {'recipient_name': 'Kit B'}]
+    })
+    assert response.status_code == 201
+    lines = [(d['recipient_name'], d['item_id'], d['quantity'])
+             for d in response.get_json()['distributions']]
+    assert lines == [('Kit A', first, 2), ('Kit A', second, 1), ('Kit B', first, 2), ('Kit B', second, 1)]
+    assert (available(client, auth_headers, first), available(client, auth_headers, second)) == (6, 8)
+
+
+def test_second_return_does_not_restock_again(client, auth_headers):
+    item_id = new_item(client, auth_headers, 4)
+    dist_id = distribute(client, auth_headers, item_id, quantity=3).get_json()['distribution']['id']
+
+    url = f'/api/property/distributions/{dist_id}/return'
+    assert client.post(url, headers=auth_headers, json={}).status_code == 200
+    assert client.post(url, headers=auth_headers, json={}).status_code == 400
+    assert available(client, auth_headers, item_id) == 4
@@ -0,0 +1,147 @@
+"""Resumable document uploads and the document collector (utils/documents.py)"""
+from datetime import datetime, timedelta
+import hashlib
+import os
+import uuid
+
+import pytest
+
+from extensions import db
+from models import DocumentUpload, Expense
+import utils.documents
+from utils.documents import (ORPHAN_GRACE, UPLOAD_EXPIRY, PARTIAL_DIR, collect_garbage,
+                             document_path_for)
+from utils.ledger import record_expense
+
+
+def start(client, headers, data):
+    response = client.post('/api/documents/uploads', headers=headers,
+                           json={'filename': 'bill.pdf', 'size': len(data),
+                                 'content_type': 'application/pdf'})
+    assert response.status_code == 201
+    return response.headers['Location']
+
+
+def patch(client, headers, location, offset, chunk):
+    return client.patch(location, data=chunk,
+                        headers=dict(headers, **{'Upload-Offset': str(offset)}))
+
+
+def test_chunks_assemble_into_a_content_addressed_document(client, auth_headers):
+    data = os.urandom(1000)
+    location = start(client, auth_headers, data)
+
+    first = patch(client, auth_headers, location, 0, data[:400])
+    assert (first.status_code, first.headers['Upload-Offset']) == (200, '400')
+    assert first.get_json()['upload']['status'] == 'pending'
+
+    last = patch(client, auth_headers, location, 400, data[400:]).get_json()['upload']
+    sha256 = hashlib.sha256(data).hexdigest()
+    assert (last['status'], last['sha256']) == ('complete', sha256)
+    assert last['document_path'] == document_path_for(sha256)
+
+    download = client.get(f'/api/documents/{sha256}', headers=auth_headers)
+    assert download.data == data
+    assert 'bill.pdf' in download.headers['Content-Disposition']
+
+
+def test_wrong_offset_is_a_conflict_that_says_where_to_resume(client, auth_headers):
+    data = os.urandom(300)
+    location = start(client, auth_headers, data)
+    patch(client, auth_headers, location, 0, data[:100])
+
+    for offset in (0, 200):
+        response = patch(client, auth_headers, location, offset, data[offset:])
+        assert response.status_code == 409
+        assert (response.get_json()['offset'], response.headers['Upload-Offset']) == (100, '100')
+    assert client.get(location, headers=auth_headers).headers['Upload-Offset'] == '100'
+
+
+def test_chunk_past_the_declared_size_is_rejected(client, auth_headers):
+    data = os.urandom(100)
+    location = start(client, auth_headers, data)
+    assert patch(client, auth_headers, location, 0, data + b'extra').status_code == 400
+    assert client.get(location, headers=auth_headers).headers['Upload-Offset'] == '0'
+
+
+def test_resume_on_another_worker_rehashes_the_file(client, auth_headers, monkeypatch):
+    data = os.urandom(500)
+    location = start(client, auth_headers, data)
+    patch(client, auth_headers, location, 0, data[:250])
+
+    # A different process has no running hash for this upload
+    monkeypatch.setattr(utils.documents, '_hashers', type(utils.documents._hashers)())
+    upload = patch(client, auth_headers, location, 250, data[250:]).get_json()['upload']
+    assert upload['sha256'] == hashlib.sha256(data).hexdigest()
+
+
+def test_lost_partial_file_restarts_the_upload(app, client, auth_headers):
+    data = os.urandom(200)
+    location = start(client, auth_headers, data)
+    patch(client, auth_headers, location, 0, data[:100])
+    upload_id = location.rsplit('/', 1)[-1]
+    os.remove(os.path.join(app.config['UPLOAD_FOLDER'], PARTIAL_DIR, f'{upload_id}.part'))
+
+    response = patch(client, auth_headers, location, 100, data[100:])
+    assert (response.status_code, response.get_json()['offset']) == (409, 0)
+    assert patch(client, auth_headers, location, 0, data).get_json()['upload']['status'] == 'complete'
+
+
+def test_same_content_twice_is_stored_once(app, client, auth_headers):
+    data = os.urandom(64)
+    paths = []
+    for _ in range(2):
+        location = start(client, auth_headers, data)
+        paths.append(patch(client, auth_headers, location, 0, data).get_json()['upload']['document_path'])
+    assert paths[0] == paths[1]
+    shard = os.path.dirname(os.path.join(app.config['UPLOAD_FOLDER'], paths[0]))
+    assert os.listdir(shard).count(os.path.basename(paths[0])) == 1
+
+
+def write(root, relative_path, age):
+    """Create a file under `root` last modified `age` ago"""
+    path = os.path.join(root, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * 10)
+    mtime = (datetime.utcnow() - age).timestamp()
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def gc_folder(app, tmp_path):
+    """A scratch upload folder holding one of each kind of file the collector looks at"""
+    old = max(UPLOAD_EXPIRY, ORPHAN_GRACE) + timedelta(hours=1)
+    hashes = {name: hashlib.sha256(f'{name} {uuid.uuid4()}'.encode()).hexdigest()
+              for name in ('orphan', 'young', 'referenced')}
+    expired_id = uuid.uuid4().hex
+
+    with app.app_context():
+        expense = Expense(amount=1.0, date=datetime.utcnow().date(), purpose='gc',
+                          document_path=document_path_for(hashes['referenced']))
+        db.session.add(expense)
+        record_expense(expense)
+        db.session.add(DocumentUpload(id=expired_id, filename='stale.pdf', size=10, received=5,
+                                      updated_at=datetime.utcnow() - old))
+        db.session.commit()
+
+    files = {
+        'orphan': write(tmp_path, document_path_for(hashes['orphan']), old),
+        'young': write(tmp_path, document_path_for(hashes['young']), timedelta(minutes=5)),
+        'referenced': write(tmp_path, document_path_for(hashes['referenced']), old),
+        'expired': write(tmp_path, os.path.join(PARTIAL_DIR, f'{expired_id}.part'), old),
+        'stray': write(tmp_path, os.path.join(PARTIAL_DIR, f'{uuid.uuid4().hex}.part'), old),
+    }
+    return tmp_path, files, expired_id
+
+
+def test_collector_removes_only_expired_and_unreferenced_files(app, gc_folder):
+    folder, files, expired_id = gc_folder
+    with app.app_context():
+        stats = collect_garbage(str(folder))
+        assert db.session.get(DocumentUpload, expired_id) is None
+
+    assert stats['orphaned_documents'] == 1
+    assert stats['expired_uploads'] >= 1
+    assert {name for name, path in files.items() if os.path.exists(path)} == {'young', 'referenced'}
@@ -0,0 +1,47 @@
+"""Ledger and inventory exports (utils/export.py)"""
+import csv
+import io
+import os
+import tempfile
+import zipfile
+
+import pytest
+
+from utils.export import stream_csv, write_xlsx, CSV_CHUNK_ROWS
+
+
+def test_csv_is_yielded_in_chunks():
+    rows = ([i, f'row {i}'] for i in range(CSV_CHUNK_ROWS * 2 + 1))
+    chunks = list(stream_csv(['id', 'name'], rows))
+    assert len(chunks) == 3
+    parsed = list(csv.reader(io.StringIO(''.join(chunks))))
+    assert parsed[0] == ['id', 'name']
+    assert len(parsed) == CSV_CHUNK_ROWS * 2 + 2
+
+
+def test_failed_xlsx_write_removes_its_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+
+    def rows():
+        yield [1, 'fine']
+        raise RuntimeError('database went away')
+
+    with pytest.raises(RuntimeError):
+        write_xlsx(['id', 'name'], rows(), 'credits')
+    assert os.listdir(tmp_path) == []
+
+
+def test_credit_export_filters_rows(client, auth_headers):
+    response = client.get('/api/money/credits/export?start_date=2024-03-01&end_date=2024-03-01',
+                          headers=auth_headers)
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert rows
+    assert {row['date'] for row in rows} == {'2024-03-01'}
+
+
+def test_xlsx_export_is_a_workbook(client, auth_headers):
+    response = client.get('/api/property/items/export?format=xlsx', headers=auth_headers)
+    assert response.status_code == 200
+    workbook = zipfile.ZipFile(io.BytesIO(response.get_data()))
+    assert 'xl/worksheets/sheet1.xml' in workbook.namelist()
@@ -0,0 +1,110 @@
+"""Idempotency-Key replay and content-hash de-duplication (utils/idempotency.py)"""
+from datetime import date, datetime, timedelta
+import uuid
+
+from flask_jwt_extended import create_access_token
+
+from extensions import db
+from models import AdminUser, Credit
+from utils.idempotency import insert_many_once, insert_once
+
+
+def insert(donor_name, now):
+    """insert_once a fixed credit for `donor_name` at `now`, recording it as created then"""
+    credit = Credit(donor_name=donor_name, amount=100.0, date=date(2024, 5, 1), purpose='zakat',
+                    created_at=now)
+    return insert_once(Credit, credit, donor_name, 100.0, date(2024, 5, 1), 'zakat', now=now)
+
+
+def test_identical_insert_in_the_same_minute_is_rejected(app_context):
+    now = datetime(2024, 5, 1, 10, 30, 15)
+    first, created = insert('Same Minute', now)
+    assert created
+
+    second, created = insert('Same Minute', now + timedelta(seconds=30))
+    assert not created
+    assert second.id == first.id
+
+
+def test_duplicate_across_the_minute_boundary_is_rejected(app_context):
+    now = datetime(2024, 5, 1, 10, 30, 59)
+    first, created = insert('Boundary', now)
+    assert created
+
+    second, created = insert('Boundary', now + timedelta(seconds=2))
+    assert not created
+    assert second.id == first.id
+
+
+def test_same_record_after_the_window_is_inserted(app_context):
+    now = datetime(2024, 5, 1, 10, 30, 0)
+    first, _ = insert('Later', now)
+
+    second, created = insert('Later', now + timedelta(seconds=90))
+    assert created
+    assert second.id != first.id
+
+
+def test_bulk_insert_skips_duplicates_across_the_minute_boundary(app_context):
+    def rows(*names):
+        return [dict(donor_name=name, amount=100.0, date=date(2024, 5, 2), purpose='zakat')
+                for name in names]
+
+    def key(row):
+        return row['donor_name'], row['amount'], row['date'], row['purpose']
+
+    now = datetime(2024, 5, 2, 10, 30, 59)
+    first = insert_many_once(Credit, rows('Bulk Boundary A', 'Bulk Boundary B'), key, now=now)
+    assert len(first) == 2
+
+    later = now + timedelta(seconds=2)
+    second = insert_many_once(Credit, rows('Bulk Boundary A', 'Bulk Boundary C'), key, now=later)
+    assert [row['donor_name'] for _, row in second] == ['Bulk Boundary C']
+
+    much_later = now + timedelta(seconds=90)
+    third = insert_many_once(Credit, rows('Bulk Boundary A'), key, now=much_later)
+    assert len(third) == 1
+
+
+def test_repeated_key_replays_the_stored_response(client, auth_headers):
+    headers = dict(auth_headers, **{'Idempotency-Key': str(uuid.uuid4())})
+    payload = {'donor_name': 'Replay Donor', 'amount': 42, 'purpose': 'sadaqah'}
+
+    first = client.post('/api/money/credits', json=payload, headers=headers)
+    assert first.status_code == 201
+    replay = client.post('/api/money/credits', json=payload, headers=headers)
+    assert replay.status_code == 201
+    assert replay.get_json() == first.get_json()
+
+    conflict = client.post('/api/money/credits', json=dict(payload, amount=43), headers=headers)
+    assert conflict.status_code == 422
+
+
+def test_keys_are_scoped_to_the_user(app, client, auth_headers):
+    with app.app_context():
+        other = AdminUser.query.filter_by(username='idempotency-other').first()
+        if other is None:
+            other = AdminUser(username='idempotency-other', password_hash='-',
+                              email='other@centswise.local')
+            db.session.add(other)
+            db.session.commit()
+        other_headers = {'Authorization': f'Bearer {create_access_token(identity=str(other.id))}'}
+
+    key = str(uuid.uuid4())
+    mine = client.post('/api/money/credits',
+                       json={'donor_name': 'Scoped A', 'amount': 7, 'purpose': 'zakat'},
+                       headers=dict(auth_headers, **{'Idempotency-Key': key}))
+    theirs = client.post('/api/money/credits',
+                         json={'donor_name': 'Scoped A', 'amount': 7, 'purpose': 'zakat'},
+                         headers=dict(other_headers, **{'Idempotency-Key': key}))
+    assert mine.status_code == 201
+    # Not a replay of the first user's response: the content hash catches the duplicate
+    assert theirs.status_code == 200
+    assert theirs.get_json()['message'] == 'Credit already recorded'
+
+
+def test_rolled_back_request_leaves_no_row(app):
+    with app.app_context():
+        insert('Rolled Back', datetime(2024, 5, 1, 11, 0, 0))
+        db.session.rollback()
+        assert Credit.query.filter_by(donor_name='Rolled Back').count() == 0
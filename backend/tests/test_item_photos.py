@@ -0,0 +1,93 @@
+"""Item photo uploads and thumbnails (utils/images.py)"""
+import io
+import os
+import uuid
+
+import pytest
+from PIL import Image
+
+import utils.images
+from utils.images import PHOTO_DIR, THUMBNAIL_SIZES, get_image_pool
+
+
+def png(width, height, color=(200, 30, 30, 128)):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def item_id(client, auth_headers):
+    return client.post('/api/property/items', headers=auth_headers,
+                       json={'name': f'Photo {uuid.uuid4().hex}', 'category': 'tools',
+                             'total_quantity': 1, 'condition': 'good'}).get_json()['item']['id']
+
+
+def upload(client, headers, item_id, data, content_type='image/png'):
+    return client.put(f'/api/property/items/{item_id}/photo', data=data,
+                      headers=dict(headers, **{'Content-Type': content_type}))
+
+
+def test_upload_makes_public_thumbnails_and_a_private_original(client, auth_headers, item_id):
+    response = upload(client, auth_headers, item_id, png(2000, 1000))
+    assert response.status_code == 200
+    urls = response.get_json()['photo_urls']
+    assert set(urls) == {'original'} | {str(size) for size in THUMBNAIL_SIZES}
+
+    for size in THUMBNAIL_SIZES:
+        thumbnail = client.get(urls[str(size)])
+        assert thumbnail.status_code == 200
+        assert 'immutable' in thumbnail.headers['Cache-Control']
+        with Image.open(io.BytesIO(thumbnail.data)) as image:
+            assert (image.format, image.size) == ('JPEG', (size, size // 2))
+
+    assert client.get(urls['original']).status_code == 401
+    original = client.get(urls['original'], headers=auth_headers)
+    assert original.status_code == 200
+    assert 'private' in original.headers['Cache-Control']
+
+
+def test_identical_bytes_share_one_stored_photo(client, auth_headers, item_id):
+    data = png(40, 40, (1, 2, 3, 255))
+    first = upload(client, auth_headers, item_id, data).get_json()['item']['photo_path']
+    second = upload(client, auth_headers, item_id, data).get_json()['item']['photo_path']
+    assert first == second
+    assert first.startswith(f'{PHOTO_DIR}/') and first.endswith('.png')
+
+
+def test_multipart_upload_is_accepted(client, auth_headers, item_id):
+    response = client.post(f'/api/property/items/{item_id}/photo', headers=auth_headers,
+                           data={'photo': (io.BytesIO(png(30, 60)), 'photo.png')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.get_json()['item']['photo_path'].endswith('.png')
+
+
+def test_non_image_is_rejected_without_leaving_files(app, client, auth_headers, item_id):
+    folder = os.path.join(app.config['UPLOAD_FOLDER'], PHOTO_DIR)
+    before = set(os.listdir(folder)) if os.path.isdir(folder) else set()
+
+    response = upload(client, auth_headers, item_id, b'not really a png')
+    assert response.status_code == 400
+    assert set(os.listdir(folder)) == before
+
+    response = upload(client, auth_headers, item_id, b'{}', content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_thumbnail_timeout_leaves_no_files_behind(app, client, auth_headers, item_id, monkeypatch):
+    folder = os.path.join(app.config['UPLOAD_FOLDER'], PHOTO_DIR)
+    os.makedirs(folder, exist_ok=True)
+    before = set(os.listdir(folder))
+    # A warm pool, so the thumbnail task is already running when the request gives up
+    pool = get_image_pool()
+    pool.submit(os.getpid).result()
+    monkeypatch.setattr(utils.images, 'THUMBNAIL_TIMEOUT', 0.3)
+
+    response = upload(client, auth_headers, item_id, png(6000, 4000, (9, 8, 7, 255)))
+    assert response.status_code == 503
+
+    # Let the abandoned task run to the end before looking
+    pool.shutdown(wait=True)
+    monkeypatch.setattr(utils.images, '_pool', None)
+    assert set(os.listdir(folder)) == before
@@ -0,0 +1,65 @@
+"""Item lending stats and paged item history (/api/property/items/<id>)"""
+import uuid
+
+import pytest
+
+from extensions import db
+from models import Item
+from utils.ledger import rebuild_item_stats
+
+
+@pytest.fixture
+def lent_item(client, auth_headers):
+    """An item lent three times, two of the loans since returned; returns its id"""
+    item_id = client.post('/api/property/items', headers=auth_headers,
+                          json={'name': f'Lent {uuid.uuid4().hex}', 'category': 'tools',
+                                'total_quantity': 5, 'condition': 'good'}).get_json()['item']['id']
+    loans = []
+    for day, quantity in (('2024-01-01', 1), ('2024-01-05', 2), ('2024-01-09', 1)):
+        loans.append(client.post('/api/property/distributions', headers=auth_headers, json={
+            'item_id': item_id, 'recipient_name': 'Borrower', 'quantity': quantity,
+            'distribution_date': day
+        }).get_json()['distribution']['id'])
+    for dist_id, returned, condition in ((loans[0], '2024-01-11', 'good'),
+                                         (loans[1], '2024-01-10', 'damaged')):
+        client.post(f'/api/property/distributions/{dist_id}/return', headers=auth_headers,
+                    json={'return_date': returned, 'return_condition': condition})
+    return item_id
+
+
+def test_stats_follow_loans_and_returns(client, auth_headers, lent_item):
+    body = client.get(f'/api/property/items/{lent_item}', headers=auth_headers).get_json()
+    assert body['stats'] == {
+        'times_lent': 3,
+        'units_out': 1,
+        'returns': 2,
+        'average_loan_days': 7.5,
+        'last_return_condition': 'damaged'
+    }
+    assert 'distributions' not in body['item']
+
+
+def test_rebuild_agrees_with_the_incremental_stats(app, client, auth_headers, lent_item):
+    before = client.get(f'/api/property/items/{lent_item}', headers=auth_headers).get_json()['stats']
+    with app.app_context():
+        rebuild_item_stats()
+        db.session.flush()
+        rebuilt = db.session.get(Item, lent_item).stats()
+        db.session.rollback()
+    # The backdated return was recorded last, so its condition wins in both
+    assert rebuilt == before
+
+
+def test_history_pages_newest_first(client, auth_headers, lent_item):
+    url = f'/api/property/items/{lent_item}/distributions'
+    first = client.get(url, headers=auth_headers, query_string={'per_page': 2}).get_json()
+    assert [d['distribution_date'] for d in first['distributions']] == ['2024-01-09', '2024-01-05']
+    second = client.get(url, headers=auth_headers,
+                        query_string={'per_page': 2, 'cursor': first['next_cursor']}).get_json()
+    assert [d['distribution_date'] for d in second['distributions']] == ['2024-01-01']
+    assert second['next_cursor'] is None
+
+
+def test_history_of_a_missing_item_is_404(client, auth_headers):
+    response = client.get('/api/property/items/999999/distributions', headers=auth_headers)
+    assert response.status_code == 404
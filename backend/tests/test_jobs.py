@@ -0,0 +1,156 @@
+"""The database-backed job queue (utils/jobs.py, /api/jobs)"""
+from datetime import datetime, timedelta
+import json
+
+import pytest
+from sqlalchemy import update
+
+from extensions import db
+from models import Job
+import utils.jobs
+from utils.jobs import (HEARTBEAT_INTERVAL, JOB_TIMEOUT, RETRY_BASE_DELAY, JobFailed, claim_next,
+                        enqueue, heartbeat, job_handler, run_job)
+
+# Due long before anything else in the shared queue, so claim_next takes these first
+LONG_AGO = datetime(2000, 1, 1)
+
+
+@job_handler('test.echo')
+def echo_job(payload):
+    return {'echo': payload['value']}
+
+
+@job_handler('test.flaky')
+def flaky_job(payload):
+    raise RuntimeError('try again')
+
+
+@job_handler('test.slow')
+def slow_job(payload):
+    # Stand-in for a long render loop: the first beat is due straight away
+    utils.jobs._current.job['beat'] -= HEARTBEAT_INTERVAL
+    heartbeat()
+    locked_at = db.session.query(Job.locked_at).filter(Job.id == payload['job_id']).scalar()
+    return {'locked_at': locked_at.isoformat()}
+
+
+@job_handler('test.reclaimed')
+def reclaimed_job(payload):
+    # Another worker takes the job over while this one is still running it
+    db.session.execute(update(Job).where(Job.id == payload['job_id'])
+                       .values(locked_by='other-worker', attempts=Job.attempts + 1))
+    db.session.commit()
+    return {'done': True}
+
+
+@job_handler('test.broken')
+def broken_job(payload):
+    raise JobFailed('cannot be fixed by retrying')
+
+
+def queue(kind, max_attempts=3, **columns):
+    job = enqueue(kind, {'value': 7}, max_attempts=max_attempts, run_at=LONG_AGO)
+    for name, value in columns.items():
+        setattr(job, name, value)
+    db.session.commit()
+    return job.id
+
+
+def claim(job_id):
+    job = claim_next('test-worker')
+    assert job is not None and job.id == job_id
+    return job
+
+
+def test_successful_job_result_is_served(app, client, auth_headers):
+    with app.app_context():
+        job_id = queue('test.echo')
+        assert run_job(claim(job_id))
+
+    response = client.get(f'/api/jobs/{job_id}/result', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.get_json()['result'] == {'echo': 7}
+    assert response.get_json()['job']['attempts'] == 1
+
+
+def test_failing_job_backs_off_then_fails_after_its_last_attempt(app):
+    with app.app_context():
+        job_id = queue('test.flaky', max_attempts=2)
+        before = datetime.utcnow()
+        assert not run_job(claim(job_id))
+
+        job = db.session.get(Job, job_id)
+        assert job.status == 'queued'
+        assert job.error == 'RuntimeError: try again'
+        assert job.run_at >= before + RETRY_BASE_DELAY
+
+        job.run_at = LONG_AGO
+        db.session.commit()
+        assert not run_job(claim(job_id))
+        job = db.session.get(Job, job_id)
+        assert (job.status, job.attempts) == ('failed', 2)
+        assert job.finished_at is not None
+
+
+def test_job_failed_is_not_retried(app):
+    with app.app_context():
+        job_id = queue('test.broken')
+        assert not run_job(claim(job_id))
+        job = db.session.get(Job, job_id)
+        assert (job.status, job.attempts) == ('failed', 1)
+
+
+def stale(attempts):
+    """A running test.echo job whose worker stopped updating it past JOB_TIMEOUT"""
+    return queue('test.echo', status='running', attempts=attempts, locked_by='dead-worker',
+                 locked_at=datetime.utcnow() - JOB_TIMEOUT - timedelta(minutes=1))
+
+
+def test_timed_out_job_is_reclaimed(app):
+    with app.app_context():
+        job_id = stale(attempts=1)
+        job = claim(job_id)
+        assert (job.attempts, job.locked_by) == (2, 'test-worker')
+        assert run_job(job)
+
+
+def test_timed_out_job_on_its_last_attempt_fails(app):
+    with app.app_context():
+        job_id = stale(attempts=3)
+        # The exhausted job is failed, so the next due job is claimed instead
+        assert run_job(claim(queue('test.echo')))
+        job = db.session.get(Job, job_id)
+        assert job.status == 'failed'
+        assert job.error.startswith('Timed out')
+
+
+def test_heartbeat_moves_locked_at_forward(app):
+    with app.app_context():
+        job_id = queue('test.slow')
+        job = claim(job_id)
+        job.payload = json.dumps({'job_id': job_id})
+        claimed_at = job.locked_at
+        db.session.commit()
+        assert run_job(job)
+
+        result = json.loads(db.session.get(Job, job_id).result)
+        assert datetime.fromisoformat(result['locked_at']) > claimed_at
+
+
+def test_reclaimed_job_keeps_the_new_workers_state(app):
+    with app.app_context():
+        job_id = queue('test.reclaimed')
+        job = claim(job_id)
+        job.payload = json.dumps({'job_id': job_id})
+        db.session.commit()
+        assert not run_job(job)
+
+        job = db.session.get(Job, job_id)
+        assert (job.status, job.locked_by, job.attempts, job.result) == (
+            'running', 'other-worker', 2, None
+        )
+
+
+def test_unknown_kind_cannot_be_enqueued(app_context):
+    with pytest.raises(ValueError):
+        enqueue('test.missing')
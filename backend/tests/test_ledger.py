@@ -0,0 +1,92 @@
+"""Running ledger totals and daily rollups (utils/ledger.py)"""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import func
+
+from extensions import db
+from models import Credit, Expense, LedgerTotals, DailyRollup
+from utils.ledger import TOTALS_ID, _insert_totals_row, ensure_totals, get_totals
+
+
+def base_totals():
+    credits = db.session.query(func.coalesce(func.sum(Credit.amount), 0), func.count(Credit.id)).one()
+    expenses = db.session.query(func.coalesce(func.sum(Expense.amount), 0), func.count(Expense.id)).one()
+    return float(credits[0]), credits[1], float(expenses[0]), expenses[1]
+
+
+def drop_totals_row():
+    db.session.query(LedgerTotals).delete()
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def test_writes_keep_totals_equal_to_the_base_tables(app, client, auth_headers):
+    client.post('/api/money/credits', json={'donor_name': 'Ledger Donor', 'amount': 70,
+                                            'purpose': 'zakat', 'payment_method': 'upi'},
+                headers=auth_headers)
+    credit_id = client.post('/api/money/credits', json={'donor_name': 'Ledger Donor 2', 'amount': 30,
+                                                        'purpose': 'zakat'},
+                            headers=auth_headers).get_json()['credit']['id']
+    client.delete(f'/api/money/credits/{credit_id}', headers=auth_headers)
+
+    with app.app_context():
+        totals = get_totals()
+        credit_total, credit_count, expense_total, expense_count = base_totals()
+        assert totals.credit_total == pytest.approx(credit_total)
+        assert totals.credit_count == credit_count
+        assert totals.expense_total == pytest.approx(expense_total)
+        assert totals.expense_count == expense_count
+
+
+def test_first_write_without_a_totals_row_counts_itself_once(app, client, auth_headers):
+    with app.app_context():
+        drop_totals_row()
+
+    response = client.post('/api/money/expenses', json={'amount': 12, 'purpose': 'first write'},
+                           headers=auth_headers)
+    assert response.status_code == 201
+
+    with app.app_context():
+        totals = db.session.get(LedgerTotals, TOTALS_ID)
+        expense_total, expense_count = base_totals()[2:]
+        assert totals.expense_count == expense_count
+        assert totals.expense_total == pytest.approx(expense_total)
+
+
+def test_totals_row_is_inserted_once(app):
+    with app.app_context():
+        drop_totals_row()
+        assert _insert_totals_row() is True
+        assert _insert_totals_row() is False
+        db.session.rollback()
+
+        assert ensure_totals() is True
+        assert ensure_totals() is False
+        db.session.commit()
+        assert db.session.get(LedgerTotals, TOTALS_ID).credit_count == base_totals()[1]
+
+
+def test_rollups_sum_to_the_totals(app):
+    with app.app_context():
+        totals = get_totals()
+        collected = db.session.query(func.sum(DailyRollup.amount)).filter_by(kind='credit').scalar()
+        spent = db.session.query(func.sum(DailyRollup.amount)).filter_by(kind='expense').scalar()
+        assert collected == pytest.approx(totals.credit_total)
+        assert spent == pytest.approx(totals.expense_total)
+
+
+def test_reading_totals_without_a_row_writes_nothing(app):
+    with app.app_context():
+        drop_totals_row()
+        db.session.add(Credit(donor_name='Uncommitted', amount=5.0, date=date(2024, 1, 1),
+                              purpose='zakat'))
+        totals = get_totals()
+        assert totals.credit_count == base_totals()[1]
+        db.session.rollback()
+
+        assert Credit.query.filter_by(donor_name='Uncommitted').count() == 0
+        assert db.session.get(LedgerTotals, TOTALS_ID) is None
+        ensure_totals()
+        db.session.commit()
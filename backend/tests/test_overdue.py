@@ -0,0 +1,73 @@
+"""The materialized overdue set (utils/overdue.py, /api/property/distributions/overdue)"""
+from datetime import date, datetime
+import uuid
+
+import pytest
+
+from extensions import db
+from models import RefreshMark
+from utils.overdue import OVERDUE_STALE_AFTER, refresh_overdue
+
+
+def refresh(app):
+    with app.app_context():
+        refresh_overdue()
+        db.session.commit()
+
+
+def overdue_ids(client, headers):
+    body = client.get('/api/property/distributions/overdue', headers=headers).get_json()
+    return body['source'], {entry['distribution_id'] for entry in body['overdue']}
+
+
+@pytest.fixture
+def late_loan(client, auth_headers):
+    """A fresh distribution that was due back in 2024"""
+    item_id = client.post('/api/property/items', headers=auth_headers,
+                          json={'name': f'Overdue {uuid.uuid4().hex}', 'category': 'tools',
+                                'total_quantity': 1, 'condition': 'good'}).get_json()['item']['id']
+    return client.post('/api/property/distributions', headers=auth_headers,
+                       json={'item_id': item_id, 'recipient_name': 'Late Borrower',
+                             'distribution_date': '2024-01-01',
+                             'expected_return_date': '2024-02-01'}).get_json()['distribution']['id']
+
+
+@pytest.fixture
+def stale_set(app):
+    """Backdate the overdue set's refresh mark past OVERDUE_STALE_AFTER"""
+    with app.app_context():
+        mark = db.session.get(RefreshMark, 'overdue_distributions')
+        mark.refreshed_at = datetime.utcnow() - OVERDUE_STALE_AFTER * 2
+        db.session.commit()
+    yield
+    refresh(app)
+
+
+def test_fresh_set_picks_up_new_loans_on_refresh(app, client, auth_headers, late_loan):
+    refresh(app)
+    source, ids = overdue_ids(client, auth_headers)
+    assert source == 'overdue_set'
+    assert late_loan in ids
+
+
+def test_return_drops_out_of_the_set_before_the_next_refresh(app, client, auth_headers, late_loan):
+    refresh(app)
+    client.post(f'/api/property/distributions/{late_loan}/return', headers=auth_headers, json={})
+    assert late_loan not in overdue_ids(client, auth_headers)[1]
+
+
+def test_stale_set_falls_back_to_a_live_query(client, auth_headers, late_loan, stale_set):
+    source, ids = overdue_ids(client, auth_headers)
+    assert source == 'live'
+    assert late_loan in ids
+
+
+def test_report_groups_by_recipient_and_item(app, client, auth_headers, late_loan):
+    refresh(app)
+    body = client.get('/api/property/distributions/overdue', headers=auth_headers).get_json()
+    entry = next(e for e in body['overdue'] if e['distribution_id'] == late_loan)
+    assert entry['days_overdue'] == (date.today() - date(2024, 2, 1)).days
+    assert body['total'] == len(body['overdue'])
+    borrower = next(r for r in body['by_recipient'] if r['recipient_name'] == 'Late Borrower')
+    assert borrower['distributions'] >= 1
+    assert any(i['item_id'] == entry['item_id'] and i['quantity'] == 1 for i in body['by_item'])
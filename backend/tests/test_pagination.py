@@ -0,0 +1,67 @@
+"""Keyset pagination (utils/pagination.py) as served by the list endpoints"""
+from datetime import date
+
+import pytest
+
+from utils.pagination import encode_cursor, decode_cursor, InvalidCursor
+
+# The 30 seeded credits all share this date, so every page boundary is a tie on date
+SEEDED_DAY = {'start_date': '2024-03-01', 'end_date': '2024-03-01'}
+
+
+def walk(client, headers, per_page, **params):
+    """Follow next_cursor from the first page to the last; returns the pages' ids"""
+    pages = []
+    cursor = ''
+    while cursor is not None:
+        response = client.get('/api/money/credits', headers=headers,
+                              query_string=dict(params, cursor=cursor, per_page=per_page))
+        assert response.status_code == 200
+        body = response.get_json()
+        pages.append([credit['id'] for credit in body['credits']])
+        assert body['has_more'] == (body['next_cursor'] is not None)
+        cursor = body['next_cursor']
+    return pages
+
+
+def test_cursor_pages_match_offset_order_across_ties(client, auth_headers):
+    offset = client.get('/api/money/credits', headers=auth_headers,
+                        query_string=dict(SEEDED_DAY, per_page=100)).get_json()
+    expected = [credit['id'] for credit in offset['credits']]
+    assert len(expected) >= 30
+
+    pages = walk(client, auth_headers, 7, **SEEDED_DAY)
+    assert [len(page) for page in pages[:-1]] == [7] * (len(pages) - 1)
+    assert 1 <= len(pages[-1]) <= 7
+    assert [credit_id for page in pages for credit_id in page] == expected
+
+
+def test_page_that_ends_exactly_on_the_last_row_has_no_next_cursor(client, auth_headers):
+    total = client.get('/api/money/credits', headers=auth_headers,
+                       query_string=dict(SEEDED_DAY, per_page=100)).get_json()['total']
+
+    pages = walk(client, auth_headers, total, **SEEDED_DAY)
+    assert len(pages) == 1
+    assert len(pages[0]) == total
+
+
+def test_cursor_past_the_last_row_returns_an_empty_page(client, auth_headers):
+    cursor = encode_cursor([date(2024, 3, 1), 0])
+    response = client.get('/api/money/credits', headers=auth_headers,
+                          query_string=dict(SEEDED_DAY, cursor=cursor))
+    body = response.get_json()
+    assert body['credits'] == []
+    assert body['next_cursor'] is None
+
+
+def test_tampered_cursor_is_rejected(client, auth_headers):
+    response = client.get('/api/money/credits', headers=auth_headers,
+                          query_string={'cursor': 'not-a-cursor'})
+    assert response.status_code == 400
+
+
+def test_cursor_round_trips_dates_and_checks_arity():
+    token = encode_cursor([date(2024, 3, 1), 17])
+    assert decode_cursor(token, [date, int]) == [date(2024, 3, 1), 17]
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, [date, int, int])
@@ -0,0 +1,51 @@
+"""Prepared receipt renderer (utils/pdf_generator.py)"""
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from reportlab.pdfbase import pdfmetrics
+
+from utils.pdf_generator import (
+    ReceiptRenderer, fitted_font_size, render_receipt_bytes, NAME_FONT
+)
+
+
+def sample_receipt(**fields):
+    values = dict(serial_number='RCP-2024-0001', donor_name='Test Donor',
+                  amount=1500.0, date=date(2024, 3, 1))
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+
+@pytest.mark.parametrize('text', ['A,', 'AN AVERAGE DONOR NAME,', 'X' * 80])
+def test_fitted_font_size_matches_shrinking_loop(text):
+    max_width = 150
+    size = 44
+    while pdfmetrics.stringWidth(text, NAME_FONT, size) > max_width and size > 22:
+        size -= 1
+    assert fitted_font_size(text, NAME_FONT, max_width, 44, 22) == size
+
+
+def test_template_is_embedded_losslessly():
+    pdf = render_receipt_bytes(sample_receipt())
+    assert pdf.startswith(b'%PDF')
+    assert b'/FlateDecode' in pdf
+    assert b'/DCTDecode' not in pdf
+
+
+def test_render_is_reproducible():
+    assert render_receipt_bytes(sample_receipt()) == render_receipt_bytes(sample_receipt())
+    assert render_receipt_bytes(sample_receipt()) != render_receipt_bytes(sample_receipt(amount=2))
+
+
+def test_merged_pdf_embeds_background_once(tmp_path):
+    renderer = ReceiptRenderer()
+    single = renderer.render(sample_receipt(), str(tmp_path / 'one.pdf'))
+    merged = renderer.render_many(
+        [sample_receipt(serial_number=f'RCP-2024-{i:04d}') for i in range(5)],
+        str(tmp_path / 'many.pdf')
+    )
+    single_pdf = open(single, 'rb').read()
+    merged_pdf = open(merged, 'rb').read()
+    assert merged_pdf.count(b'/Subtype /Image') == 1
+    assert len(merged_pdf) < 2 * len(single_pdf)
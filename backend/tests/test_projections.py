@@ -0,0 +1,31 @@
+"""List endpoints serve column projections that must match the models' to_dict()"""
+import pytest
+
+from extensions import db
+from models import Credit, Item, Distribution
+
+LISTS = [
+    ('/api/money/credits?per_page=100', 'credits', Credit),
+    ('/api/property/items?per_page=100', 'items', Item),
+    ('/api/property/distributions?per_page=100', 'distributions', Distribution),
+]
+
+
+@pytest.mark.parametrize('url, key, model', LISTS)
+def test_projected_rows_match_to_dict(app, client, auth_headers, url, key, model):
+    rows = client.get(url, headers=auth_headers).get_json()[key]
+    assert rows
+
+    with app.app_context():
+        for row in rows:
+            assert row == db.session.get(model, row['id']).to_dict()
+
+
+def test_related_lookups_are_filled_in(client, auth_headers):
+    credits = client.get('/api/money/credits?per_page=100', headers=auth_headers).get_json()['credits']
+    serials = {credit['id']: credit['receipt_serial'] for credit in credits}
+    assert all(serials[credit_id] for credit_id in range(1, 6))
+
+    distributions = client.get('/api/property/distributions?per_page=100',
+                               headers=auth_headers).get_json()['distributions']
+    assert {d['item_name'] for d in distributions if d['item_id'] == 1} == {'Item 0'}
@@ -0,0 +1,51 @@
+"""List endpoints must not run more queries for a bigger page (no per-row lazy loads)"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+
+# List endpoints whose query count must not grow with the page size
+COUNTED_ENDPOINTS = [
+    '/api/money/credits?per_page={per_page}',
+    '/api/money/credits?cursor=&per_page={per_page}',
+    '/api/money/expenses?per_page={per_page}',
+    '/api/property/items?per_page={per_page}',
+    '/api/property/items/1/distributions?per_page={per_page}',
+    '/api/property/distributions?per_page={per_page}',
+    '/api/receipts?per_page={per_page}',
+    '/api/sync',
+]
+
+
+@contextmanager
+def count_queries(engine):
+    """Count the statements sent to the database inside the block"""
+    counter = {'count': 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['count'] += 1
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.mark.parametrize('endpoint', COUNTED_ENDPOINTS)
+def test_query_count_does_not_grow_with_page_size(app, client, auth_headers, endpoint):
+    with app.app_context():
+        engine = db.engine
+
+    counts = []
+    for per_page in (1, 100):
+        with count_queries(engine) as counter:
+            response = client.get(endpoint.format(per_page=per_page), headers=auth_headers)
+            response.get_data()
+        assert response.status_code == 200
+        counts.append(counter['count'])
+
+    small, large = counts
+    assert large <= small, f"{small} queries for one row, {large} for a full page"
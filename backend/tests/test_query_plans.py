@@ -0,0 +1,97 @@
+"""Endpoint queries must be served from indexes: EXPLAIN every SELECT they issue (SQLite)"""
+from datetime import datetime
+import re
+
+from sqlalchemy import event
+
+from extensions import db
+
+# GET endpoints whose queries must be served from indexes
+CHECKED_ENDPOINTS = [
+    '/api/money/credits',
+    '/api/money/credits?cursor=',
+    '/api/money/credits?start_date=2024-01-01&end_date=2024-12-31',
+    '/api/money/credits?search=zakat',
+    '/api/money/expenses',
+    '/api/money/expenses?category=medical',
+    '/api/money/expenses?category=medical&start_date=2024-01-01&cursor=',
+    '/api/money/balance',
+    '/api/money/transactions?limit=50',
+    '/api/money/transactions?start_date=2024-01-01&end_date=2024-12-31&limit=50',
+    '/api/property/items',
+    '/api/property/items?cursor=',
+    '/api/property/items/1',
+    '/api/property/items/1/distributions',
+    '/api/property/items/1/distributions?cursor=',
+    '/api/property/distributions',
+    '/api/property/distributions?status=distributed',
+    '/api/property/distributions?status=distributed&cursor=',
+    '/api/property/distributions/overdue',
+    '/api/receipts',
+    '/api/receipts?cursor=',
+    '/api/dashboard/metrics',
+    '/api/dashboard/financial-summary?start_date=2024-01-01&end_date=2024-12-31',
+    '/api/dashboard/timeseries?start_date=2024-01-01&end_date=2024-12-31',
+    '/api/dashboard/stats',
+    '/api/sync?since={sync_token}',
+]
+
+# Aggregate tables that are small by construction and read whole on purpose
+SCAN_ALLOWED = {'ledger_totals', 'daily_rollups', 'overdue_distributions'}
+
+# "SCAN credits" without a USING INDEX clause is a full table scan
+TABLE_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+def capture_selects(engine):
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    return captured, lambda: event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def table_scans(connection, statement, parameters):
+    """Return (table, plan_detail) for every full table scan in the statement's plan"""
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    scans = []
+    for row in rows:
+        detail = row[-1]
+        match = TABLE_SCAN.match(detail)
+        if match and match.group(1) not in SCAN_ALLOWED:
+            scans.append((match.group(1), detail))
+    return scans
+
+
+def test_endpoints_do_not_scan_tables(app, client, auth_headers):
+    from utils.sync import new_token
+
+    with app.app_context():
+        engine = db.engine
+        sync_token = new_token(datetime.utcnow())
+    assert engine.dialect.name == 'sqlite'
+
+    failures = []
+    for endpoint in CHECKED_ENDPOINTS:
+        url = endpoint.format(sync_token=sync_token)
+        captured, stop = capture_selects(engine)
+        try:
+            response = client.get(url, headers=auth_headers)
+            response.get_data()  # drain streamed responses
+        finally:
+            stop()
+        assert response.status_code == 200, url
+
+        with engine.connect() as connection:
+            for statement, parameters in captured:
+                scans = table_scans(connection, statement, parameters)
+                if scans:
+                    failures.append((url, statement, scans))
+
+    assert failures == [], '\n'.join(
+        f"{url}: {'; '.join(detail for _, detail in scans)}\n    {' '.join(statement.split())}"
+        for url, statement, scans in failures
+    )
@@ -0,0 +1,68 @@
+"""Batch receipt generation (/api/receipts/generate/batch)"""
+import json
+import os
+import uuid
+
+import routes.receipt_routes
+
+
+def new_credits(client, headers, count):
+    """Fresh credits with no receipt yet; returns their ids"""
+    tag = uuid.uuid4().hex[:8]
+    return [
+        client.post('/api/money/credits', json={'donor_name': f'Batch {tag} {i}', 'amount': 20 + i,
+                                                'purpose': 'zakat'},
+                    headers=headers).get_json()['credit']['id']
+        for i in range(count)
+    ]
+
+
+def receipt_of(client, headers, credit_id):
+    credit = client.get(f'/api/money/credits/{credit_id}', headers=headers).get_json()['credit']
+    return credit['receipt_serial']
+
+
+def test_batch_renders_each_pdf_and_reports_bad_ids(app, client, auth_headers):
+    credit_ids = new_credits(client, auth_headers, 3)
+    response = client.post('/api/receipts/generate/batch', headers=auth_headers,
+                           json={'credit_ids': credit_ids + [1, 999999]})
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert summary['generated'] == 3
+    assert sorted((f['credit_id'], f['error']) for f in summary['failed']) == [
+        (1, 'Receipt already exists for this credit'), (999999, 'Credit not found')
+    ]
+
+    serials = [receipt_of(client, auth_headers, credit_id) for credit_id in credit_ids]
+    numbers = [int(serial.rsplit('-', 1)[1]) for serial in serials]
+    assert numbers == list(range(numbers[0], numbers[0] + 3))
+    for serial in serials:
+        path = os.path.join(app.config['UPLOAD_FOLDER'], 'receipts', f'{serial}.pdf')
+        with open(path, 'rb') as f:
+            assert f.read(4) == b'%PDF'
+
+
+def test_ndjson_streams_a_line_per_receipt(client, auth_headers):
+    credit_ids = new_credits(client, auth_headers, 2)
+    response = client.post('/api/receipts/generate/batch?format=ndjson', headers=auth_headers,
+                           json={'credit_ids': credit_ids})
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['event'] for line in lines] == ['allocated', 'progress', 'progress', 'complete']
+    assert sorted(line['credit_id'] for line in lines[1:3]) == sorted(credit_ids)
+    assert lines[-1]['generated'] == 2
+
+
+def test_large_batch_is_queued(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(routes.receipt_routes, 'MAX_SYNC_BATCH_RECEIPTS', 1)
+    credit_ids = new_credits(client, auth_headers, 2)
+    response = client.post('/api/receipts/generate/batch', headers=auth_headers,
+                           json={'credit_ids': credit_ids})
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['allocated'] == 2
+    assert response.headers['Location'] == f"/api/jobs/{body['job']['id']}"
+
+
+def test_batch_needs_ids_or_dates(client, auth_headers):
+    response = client.post('/api/receipts/generate/batch', headers=auth_headers, json={})
+    assert response.status_code == 400
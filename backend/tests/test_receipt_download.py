@@ -0,0 +1,74 @@
+"""Receipt downloads: conditional GET, Range, on-demand rendering (/api/receipts/download)"""
+import os
+import uuid
+
+import pytest
+
+from utils.cache import SizedLRU
+
+
+@pytest.fixture
+def receipt(app, client, auth_headers):
+    """A fresh receipt: (id, absolute path of its stored PDF)"""
+    credit_id = client.post('/api/money/credits', json={'donor_name': f'Download {uuid.uuid4().hex}',
+                                                        'amount': 33, 'purpose': 'zakat'},
+                            headers=auth_headers).get_json()['credit']['id']
+    body = client.post(f'/api/receipts/generate/{credit_id}', headers=auth_headers,
+                       json={}).get_json()['receipt']
+    return body['id'], os.path.join(app.config['UPLOAD_FOLDER'], body['pdf_path'])
+
+
+def download(client, headers, receipt_id, **extra):
+    return client.get(f'/api/receipts/download/{receipt_id}', headers=dict(headers, **extra))
+
+
+def test_stored_pdf_answers_304_and_ranges(client, auth_headers, receipt):
+    receipt_id, _ = receipt
+    full = download(client, auth_headers, receipt_id)
+    assert full.status_code == 200
+    assert full.data.startswith(b'%PDF')
+    tag = full.headers['ETag']
+
+    assert download(client, auth_headers, receipt_id, **{'If-None-Match': tag}).status_code == 304
+    partial = download(client, auth_headers, receipt_id, Range='bytes=0-3')
+    assert partial.status_code == 206
+    assert partial.data == b'%PDF'
+
+
+def test_missing_file_is_rendered_once_then_served_from_memory(app, client, auth_headers, receipt):
+    receipt_id, path = receipt
+    os.remove(path)
+
+    first = download(client, auth_headers, receipt_id)
+    assert first.status_code == 200
+    assert first.data.startswith(b'%PDF')
+    tag = first.headers['ETag']
+
+    before = client.get('/api/dashboard/cache', headers=auth_headers).get_json()['receipt_pdfs']
+    again = download(client, auth_headers, receipt_id)
+    assert again.data == first.data
+    assert download(client, auth_headers, receipt_id, **{'If-None-Match': tag}).status_code == 304
+    after = client.get('/api/dashboard/cache', headers=auth_headers).get_json()['receipt_pdfs']
+    # The 304 is answered from the tag alone, without a cache lookup
+    assert (after['hits'] - before['hits'], after['misses'] - before['misses']) == (1, 0)
+
+
+def test_accel_redirect_hands_the_file_to_nginx(app, client, auth_headers, receipt, monkeypatch):
+    receipt_id, path = receipt
+    monkeypatch.setitem(app.config, 'RECEIPT_ACCEL_REDIRECT', '/protected/')
+    response = download(client, auth_headers, receipt_id)
+    assert response.headers['X-Accel-Redirect'] == '/protected/receipts/' + os.path.basename(path)
+    assert response.data == b''
+
+
+def test_sized_lru_is_bounded_by_bytes():
+    cache = SizedLRU(max_bytes=10)
+    cache.set('a', b'xxxx')
+    cache.set('b', b'yyyy')
+    cache.get('a')
+    cache.set('c', b'zzzz')
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (b'xxxx', None, b'zzzz')
+    assert cache.bytes == 8
+
+    cache.set('huge', b'0' * 11)
+    assert cache.get('huge') is None
@@ -0,0 +1,63 @@
+"""Receipt exports: streamed ZIP and the merged PDF job (/api/receipts/export)"""
+import io
+import zipfile
+
+from extensions import db
+from models import Job, Receipt
+from utils.jobs import run_job
+
+
+def test_zip_export_contains_every_matching_receipt(app, client, auth_headers):
+    with app.app_context():
+        serials = sorted(serial for serial, in db.session.query(Receipt.serial_number))
+
+    response = client.get('/api/receipts/export?format=zip', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.is_streamed
+    archive = zipfile.ZipFile(io.BytesIO(response.get_data()))
+    assert sorted(archive.namelist()) == [f'{serial}.pdf' for serial in serials]
+    assert all(archive.read(name).startswith(b'%PDF') for name in archive.namelist())
+
+
+def test_zip_export_applies_the_list_filters(client, auth_headers):
+    response = client.get('/api/receipts/export?start_date=2030-01-01', headers=auth_headers)
+    assert zipfile.ZipFile(io.BytesIO(response.get_data())).namelist() == []
+
+    response = client.get('/api/receipts/export?start_date=2030-13-01', headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_pdf_export_is_built_by_a_job_and_downloaded(app, client, auth_headers):
+    response = client.get('/api/receipts/export?format=pdf&start_date=2024-01-01',
+                          headers=auth_headers)
+    assert response.status_code == 202
+    job_id = response.get_json()['job']['id']
+    assert response.headers['Location'] == f'/api/jobs/{job_id}'
+
+    with app.app_context():
+        count = Receipt.query.filter(Receipt.date >= '2024-01-01').count()
+        assert run_job(db.session.get(Job, job_id))
+
+    result = client.get(f'/api/jobs/{job_id}/result', headers=auth_headers).get_json()['result']
+    download = client.get(result['download_url'], headers=auth_headers)
+    assert download.status_code == 200
+    assert download.mimetype == 'application/pdf'
+    assert download.get_data().count(b'/Type /Page\n') == count
+
+
+def test_export_download_rejects_other_names(client, auth_headers):
+    for name in ('../centswise.db', 'missing.pdf', '0' * 32 + '.pdf'):
+        assert client.get(f'/api/receipts/export/{name}', headers=auth_headers).status_code == 404
+
+
+def test_expired_exports_are_removed(tmp_path):
+    from routes.receipt_routes import expire_exports, EXPORT_DIR, EXPORT_EXPIRY
+
+    export_dir = tmp_path / EXPORT_DIR
+    export_dir.mkdir()
+    (export_dir / ('a' * 32 + '.pdf')).write_bytes(b'%PDF')
+
+    assert expire_exports(str(tmp_path)) == {'removed': 0}
+    later = (export_dir / ('a' * 32 + '.pdf')).stat().st_mtime + EXPORT_EXPIRY.total_seconds() + 1
+    assert expire_exports(str(tmp_path), now=later) == {'removed': 1}
+    assert list(export_dir.iterdir()) == []
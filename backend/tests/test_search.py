@@ -0,0 +1,43 @@
+"""Unified search and its ILIKE fallback (utils/search.py, /api/search)"""
+import pytest
+
+import utils.search
+
+
+def results(client, auth_headers, query):
+    response = client.get(f'/api/search?{query}', headers=auth_headers)
+    assert response.status_code == 200
+    return response.get_json()['results']
+
+
+def test_indexed_search_matches_word_prefixes(client, auth_headers):
+    found = results(client, auth_headers, 'q=donor&types=credit&limit=100')
+    assert found
+    assert {r['type'] for r in found} == {'credit'}
+    assert all('Donor' in r['title'] for r in found)
+    # The index matches whole-word prefixes, not fragments from inside a word
+    assert results(client, auth_headers, 'q=onor&types=credit') == []
+
+
+@pytest.mark.parametrize('limit', ['-1', '0'])
+def test_limit_is_at_least_one(client, auth_headers, limit):
+    assert len(results(client, auth_headers, f'q=donor&limit={limit}')) == 1
+
+
+def test_limit_is_at_most_one_hundred(client, auth_headers):
+    assert len(results(client, auth_headers, 'q=zakat&limit=1000')) <= 100
+
+
+def test_unknown_type_is_rejected(client, auth_headers):
+    response = client.get('/api/search?q=donor&types=credit,unicorn', headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_without_the_index_search_falls_back_to_substring_matching(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(utils.search, '_available', False)
+
+    found = results(client, auth_headers, 'q=onor%201&types=credit,receipt&limit=100')
+    assert found
+    assert all('onor 1' in r['title'] or 'onor 1' in r['subtitle'] for r in found)
+    assert {r['type'] for r in found} <= {'credit', 'receipt'}
+    assert len(results(client, auth_headers, 'q=item&types=item&limit=3')) == 3
@@ -0,0 +1,46 @@
+"""Response encoding and ?fields= sparse fieldsets (utils/serialization.py)"""
+from datetime import date, datetime
+
+import pytest
+
+from utils.serialization import InvalidFields, dumps, parse_fields
+
+
+def test_fields_limits_each_entry_to_the_named_fields(client, auth_headers):
+    body = client.get('/api/money/credits', headers=auth_headers,
+                      query_string={'fields': 'donor_name,amount', 'per_page': 5}).get_json()
+    assert body['credits']
+    assert all(list(credit) == ['donor_name', 'amount'] for credit in body['credits'])
+
+
+def test_fields_still_pages_by_cursor(client, auth_headers):
+    first = client.get('/api/money/credits', headers=auth_headers,
+                       query_string={'fields': 'amount', 'cursor': '', 'per_page': 2}).get_json()
+    assert all(list(credit) == ['amount'] for credit in first['credits'])
+
+    second = client.get('/api/money/credits', headers=auth_headers,
+                        query_string={'fields': 'id', 'cursor': first['next_cursor'],
+                                      'per_page': 2}).get_json()
+    full = client.get('/api/money/credits', headers=auth_headers,
+                      query_string={'fields': 'id', 'per_page': 4}).get_json()
+    assert second['credits'] == full['credits'][2:]
+
+
+def test_unknown_field_is_rejected(client, auth_headers):
+    response = client.get('/api/money/credits', headers=auth_headers,
+                          query_string={'fields': 'amount,password'})
+    assert response.status_code == 400
+    assert 'password' in response.get_json()['error']
+
+
+def test_parse_fields_dedupes_and_treats_empty_as_everything():
+    assert parse_fields(' amount, id ,amount,', ('id', 'amount')) == ['amount', 'id']
+    assert parse_fields('', ('id',)) is None
+    assert parse_fields(' , ', ('id',)) is None
+    with pytest.raises(InvalidFields):
+        parse_fields('nope', ('id',))
+
+
+def test_dates_are_written_in_iso_format():
+    encoded = dumps({'day': date(2024, 3, 1), 'at': datetime(2024, 3, 1, 9, 30, 5, 120000)})
+    assert encoded == '{"day":"2024-03-01","at":"2024-03-01T09:30:05.120000"}'
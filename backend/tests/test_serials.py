@@ -0,0 +1,47 @@
+"""Per-year receipt serial allocation (utils/serials.py)"""
+from datetime import date
+
+from extensions import db
+from models import Receipt
+from utils.serials import allocate_serials
+
+
+def test_allocations_are_consecutive_within_a_year(app_context):
+    first = allocate_serials(year=2001)
+    rest = allocate_serials(3, year=2001)
+    assert [first[0]] + rest == ['RCP-2001-0001', 'RCP-2001-0002', 'RCP-2001-0003', 'RCP-2001-0004']
+
+
+def test_each_year_has_its_own_counter(app_context):
+    assert allocate_serials(2, year=2002) == ['RCP-2002-0001', 'RCP-2002-0002']
+    assert allocate_serials(year=2003) == ['RCP-2003-0001']
+    assert allocate_serials(year=2002) == ['RCP-2002-0003']
+
+
+def test_new_counter_continues_after_serials_already_issued(app_context):
+    db.session.add(Receipt(serial_number='RCP-2004-0041', donor_name='Legacy', amount=1.0,
+                           date=date(2004, 1, 1)))
+    db.session.flush()
+    assert allocate_serials(year=2004) == ['RCP-2004-0042']
+
+
+def test_rolled_back_allocation_leaves_no_gap(app_context):
+    assert allocate_serials(year=2005) == ['RCP-2005-0001']
+    db.session.rollback()
+    assert allocate_serials(year=2005) == ['RCP-2005-0001']
+
+
+def test_receipts_take_this_years_next_serial(client, auth_headers):
+    serials = []
+    for i in range(2):
+        credit_id = client.post('/api/money/credits', json={'donor_name': f'Serial Donor {i}',
+                                                            'amount': 15, 'purpose': 'zakat'},
+                                headers=auth_headers).get_json()['credit']['id']
+        response = client.post(f'/api/receipts/generate/{credit_id}', headers=auth_headers, json={})
+        assert response.status_code == 201
+        serials.append(response.get_json()['receipt']['serial_number'])
+
+    year = date.today().year
+    first, second = (serial.split('-') for serial in serials)
+    assert first[:2] == second[:2] == ['RCP', str(year)]
+    assert int(second[2]) == int(first[2]) + 1
@@ -0,0 +1,65 @@
+"""Delta sync tokens and tombstones (utils/sync.py, /api/sync)"""
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Tombstone
+from utils.sync import SYNC_MODELS, SYNC_OVERLAP, TOMBSTONE_RETENTION, new_token, record_tombstone
+
+
+def sync(client, headers, since=None):
+    response = client.get('/api/sync', headers=headers,
+                          query_string={'since': since} if since else {})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_delta_carries_new_rows_and_tombstones(client, auth_headers):
+    kept = client.post('/api/money/credits', json={'donor_name': 'Sync Kept', 'amount': 11,
+                                                   'purpose': 'zakat'},
+                       headers=auth_headers).get_json()['credit']['id']
+    baseline = sync(client, auth_headers)
+    assert baseline['full']
+    assert kept in [credit['id'] for credit in baseline['credits']]
+    assert baseline['deleted'] == {name: [] for name in baseline['deleted']}
+
+    added = client.post('/api/money/credits', json={'donor_name': 'Sync Added', 'amount': 12,
+                                                    'purpose': 'zakat'},
+                        headers=auth_headers).get_json()['credit']['id']
+    client.delete(f'/api/money/credits/{kept}', headers=auth_headers)
+
+    delta = sync(client, auth_headers, baseline['token'])
+    assert not delta['full']
+    assert added in [credit['id'] for credit in delta['credits']]
+    assert kept not in [credit['id'] for credit in delta['credits']]
+    assert kept in delta['deleted']['credits']
+
+
+def test_rows_older_than_the_overlap_window_are_not_resent(client, auth_headers):
+    body = sync(client, auth_headers, new_token(datetime.utcnow() + SYNC_OVERLAP))
+    assert not body['full']
+    assert all(body[name] == [] for name in SYNC_MODELS)
+
+
+def test_token_older_than_retention_forces_a_full_resync(client, auth_headers):
+    stale = new_token(datetime.utcnow() - TOMBSTONE_RETENTION - timedelta(minutes=1))
+    body = sync(client, auth_headers, stale)
+    assert body['full']
+    assert all(ids == [] for ids in body['deleted'].values())
+
+
+def test_recording_a_delete_prunes_expired_tombstones(app_context):
+    expired = Tombstone(table_name='credits', row_id=-1,
+                        deleted_at=datetime.utcnow() - TOMBSTONE_RETENTION - timedelta(days=1))
+    db.session.add(expired)
+    db.session.flush()
+
+    record_tombstone('credits', -2)
+    db.session.flush()
+    row_ids = {row_id for (row_id,) in db.session.query(Tombstone.row_id)}
+    assert -1 not in row_ids
+    assert -2 in row_ids
+
+
+def test_garbage_token_is_rejected(client, auth_headers):
+    response = client.get('/api/sync', headers=auth_headers, query_string={'since': 'garbage'})
+    assert response.status_code == 400
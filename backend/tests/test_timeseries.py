@@ -0,0 +1,70 @@
+"""Daily rollups as served by /api/dashboard/timeseries and /financial-summary"""
+import pytest
+
+# A month no other test writes to: 2019-07-01 is a Monday
+JULY_2019 = {'start_date': '2019-07-01', 'end_date': '2019-07-31'}
+
+
+@pytest.fixture(scope='module')
+def july(app, auth_headers):
+    """Two credits and an expense in the first week of July 2019, one credit in the second"""
+    client = app.test_client()
+
+    def post(url, payload):
+        response = client.post(url, json=payload, headers=auth_headers)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+
+    post('/api/money/credits', {'donor_name': 'Rollup A', 'amount': 100, 'purpose': 'zakat',
+                                'date': '2019-07-02', 'payment_method': 'cash'})
+    post('/api/money/credits', {'donor_name': 'Rollup B', 'amount': 50, 'purpose': 'zakat',
+                                'date': '2019-07-03', 'payment_method': 'upi'})
+    post('/api/money/expenses', {'amount': 30, 'purpose': 'rollup', 'category': 'food',
+                                 'date': '2019-07-03'})
+    late = post('/api/money/credits', {'donor_name': 'Rollup C', 'amount': 20,
+                                       'purpose': 'zakat', 'date': '2019-07-09',
+                                       'payment_method': 'cash'})
+    return late['credit']['id']
+
+
+def series(client, headers, interval):
+    response = client.get('/api/dashboard/timeseries', headers=headers,
+                          query_string=dict(JULY_2019, interval=interval))
+    assert response.status_code == 200
+    return response.get_json()['series']
+
+
+def test_daily_buckets_follow_the_writes(client, auth_headers, july):
+    days = {bucket['period']: bucket for bucket in series(client, auth_headers, 'day')}
+    assert sorted(days) == ['2019-07-02', '2019-07-03', '2019-07-09']
+    assert days['2019-07-03']['collected'] == 50
+    assert days['2019-07-03']['spent'] == 30
+    assert days['2019-07-03']['expenses_by_category'] == {'food': 30}
+
+
+def test_weeks_and_months_regroup_the_same_rollups(client, auth_headers, july):
+    weeks = series(client, auth_headers, 'week')
+    assert [(w['period'], w['collected'], w['credit_count']) for w in weeks] == [
+        ('2019-07-01', 150, 2), ('2019-07-08', 20, 1)
+    ]
+    assert weeks[0]['credits_by_payment_method'] == {'cash': 100, 'upi': 50}
+
+    [month] = series(client, auth_headers, 'month')
+    assert month['period'] == '2019-07-01'
+    assert (month['collected'], month['spent']) == (170, 30)
+
+
+def test_summary_range_and_deletes_come_from_the_rollups(client, auth_headers, july):
+    summary = client.get('/api/dashboard/financial-summary', headers=auth_headers,
+                         query_string=JULY_2019).get_json()
+    assert summary['summary'] == {'total_credits': 170, 'total_expenses': 30, 'net_balance': 140}
+
+    assert client.delete(f'/api/money/credits/{july}', headers=auth_headers).status_code == 200
+    weeks = series(client, auth_headers, 'week')
+    assert [w['period'] for w in weeks] == ['2019-07-01']
+
+
+def test_unknown_interval_is_rejected(client, auth_headers):
+    response = client.get('/api/dashboard/timeseries', headers=auth_headers,
+                          query_string={'interval': 'year'})
+    assert response.status_code == 400
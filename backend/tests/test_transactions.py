@@ -0,0 +1,65 @@
+"""The merged /api/money/transactions stream"""
+import json
+
+# Seeded credits are dated 2024-03-01 and expenses 2024-03-02
+SEEDED_DAYS = {'start_date': '2024-03-01', 'end_date': '2024-03-02'}
+
+
+def fetch(client, headers, **params):
+    response = client.get('/api/money/transactions', headers=headers,
+                          query_string=dict(SEEDED_DAYS, **params))
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def sort_key(entry):
+    kind, id = entry['id'].split('-')
+    return entry['date'], kind, int(id)
+
+
+def test_merge_is_newest_first_across_both_tables(client, auth_headers):
+    transactions = fetch(client, auth_headers)['transactions']
+    kinds = [entry['type'] for entry in transactions]
+    assert kinds.count('credit') >= 30 and kinds.count('expense') >= 30
+
+    assert [sort_key(entry) for entry in transactions] == sorted(
+        (sort_key(entry) for entry in transactions), reverse=True
+    )
+    # The later-dated expenses come out before any credit, with their sign flipped
+    first_credit = kinds.index('credit')
+    assert kinds == ['expense'] * first_credit + ['credit'] * (len(kinds) - first_credit)
+    assert all(entry['amount'] < 0 for entry in transactions[:first_credit])
+
+
+def test_cursor_pages_resume_the_merge_where_they_stopped(client, auth_headers):
+    expected = [entry['id'] for entry in fetch(client, auth_headers)['transactions']]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {'limit': 11}
+        if cursor:
+            params['cursor'] = cursor
+        body = fetch(client, auth_headers, **params)
+        seen.extend(entry['id'] for entry in body['transactions'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+def test_ndjson_streams_the_same_entries(client, auth_headers):
+    expected = fetch(client, auth_headers, limit=5)
+
+    response = client.get('/api/money/transactions', headers=auth_headers,
+                          query_string=dict(SEEDED_DAYS, limit=5, format='ndjson'))
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[:-1] == expected['transactions']
+    assert lines[-1] == {'next_cursor': expected['next_cursor']}
+
+
+def test_limit_below_one_is_rejected(client, auth_headers):
+    response = client.get('/api/money/transactions', headers=auth_headers,
+                          query_string={'limit': 0})
+    assert response.status_code == 400
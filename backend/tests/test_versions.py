@@ -0,0 +1,48 @@
+"""Version-based ETags and the result cache (utils/versions.py, utils/cache.py)"""
+from datetime import date, timedelta
+
+import pytest
+
+import utils.overdue
+
+
+def test_unchanged_list_answers_304_and_a_write_changes_the_tag(client, auth_headers):
+    first = client.get('/api/money/expenses', headers=auth_headers)
+    tag = first.headers['ETag']
+    assert first.status_code == 200
+
+    again = client.get('/api/money/expenses', headers=dict(auth_headers, **{'If-None-Match': tag}))
+    assert again.status_code == 304
+
+    client.post('/api/money/expenses', json={'amount': 3, 'purpose': 'etag test'}, headers=auth_headers)
+    after = client.get('/api/money/expenses', headers=dict(auth_headers, **{'If-None-Match': tag}))
+    assert after.status_code == 200
+    assert after.headers['ETag'] != tag
+
+
+def test_tag_depends_on_the_query_string(client, auth_headers):
+    one = client.get('/api/money/expenses?per_page=1', headers=auth_headers).headers['ETag']
+    two = client.get('/api/money/expenses?per_page=2', headers=auth_headers).headers['ETag']
+    assert one != two
+
+
+@pytest.fixture
+def tomorrow(monkeypatch):
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+
+    monkeypatch.setattr(utils.overdue, 'date', Tomorrow)
+
+
+@pytest.mark.parametrize('url', ['/api/property/distributions/overdue', '/api/dashboard/metrics'])
+def test_date_dependent_responses_change_tag_at_midnight(client, auth_headers, url, request):
+    tag = client.get(url, headers=auth_headers).headers['ETag']
+    assert client.get(url, headers=dict(auth_headers, **{'If-None-Match': tag})).status_code == 304
+
+    request.getfixturevalue('tomorrow')
+    response = client.get(url, headers=dict(auth_headers, **{'If-None-Match': tag}))
+    assert response.status_code == 200
+    assert response.headers['ETag'] != tag
+    assert response.headers.get('X-Cache', 'MISS') == 'MISS'
@@ -0,0 +1,133 @@
+"""Streaming CSV/JSON parsing and validation for bulk credit/expense imports"""
+from utils.documents import check_document_path
+import csv
+import io
+import json
+import math
+from datetime import datetime
+
+# Rows inserted per executemany round trip / transaction
+BATCH_SIZE = 1000
+
+# Cap on per-row errors echoed back, so a bad file can't produce a huge report
+MAX_REPORTED_ERRORS = 1000
+
+
+def iter_records(req):
+    """
+    Yield (row_number, dict) pairs from a CSV, NDJSON or JSON-array upload.
+
+    CSV and NDJSON are read line by line from the request stream (or the
+    uploaded `file` field); a JSON array is bounded by MAX_CONTENT_LENGTH.
+    """
+    upload = req.files.get('file')
+    if upload:
+        stream = upload.stream
+        filename = (upload.filename or '').lower()
+        content_type = upload.mimetype or ''
+        if filename.endswith('.csv'):
+            content_type = 'text/csv'
+        elif filename.endswith(('.ndjson', '.jsonl')):
+            content_type = 'application/x-ndjson'
+        elif filename.endswith('.json'):
+            content_type = 'application/json'
+    else:
+        stream = req.stream
+        content_type = req.mimetype or ''
+
+    if content_type in ('text/csv', 'application/csv'):
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        # Header is line 1, so data rows start at 2 like in a spreadsheet
+        for row_number, row in enumerate(csv.DictReader(text), start=2):
+            yield row_number, {k.strip(): (v.strip() if isinstance(v, str) else v)
+                               for k, v in row.items() if k}
+    elif content_type == 'application/x-ndjson':
+        text = io.TextIOWrapper(stream, encoding='utf-8')
+        for row_number, line in enumerate(text, start=1):
+            if line.strip():
+                yield row_number, _loads_object(line)
+    elif content_type == 'application/json':
+        records = json.load(io.TextIOWrapper(stream, encoding='utf-8'))
+        if isinstance(records, dict):
+            records = records.get('rows', [])
+        if not isinstance(records, list):
+            raise ValueError('JSON body must be an array of rows')
+        for row_number, record in enumerate(records, start=1):
+            yield row_number, record if isinstance(record, dict) else None
+    else:
+        raise ValueError('Upload CSV, NDJSON or a JSON array')
+
+
+def _loads_object(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _parse_amount(value):
+    try:
+        amount = float(str(value).replace(',', ''))
+    except (TypeError, ValueError):
+        raise ValueError('amount must be a number')
+    if not math.isfinite(amount):
+        raise ValueError('amount must be a finite number')
+    if amount <= 0:
+        raise ValueError('amount must be positive')
+    return amount
+
+
+def _parse_date(value, default):
+    if not value:
+        return default
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('date must be in YYYY-MM-DD format')
+
+
+def validate_credit(record, today):
+    """Return column values for a credit row or raise ValueError"""
+    if record is None:
+        raise ValueError('row is not an object')
+    for field in ('donor_name', 'amount', 'purpose'):
+        if not record.get(field):
+            raise ValueError(f'{field} is required')
+    return {
+        'donor_name': str(record['donor_name']),
+        'amount': _parse_amount(record['amount']),
+        'date': _parse_date(record.get('date'), today),
+        'purpose': str(record['purpose']),
+        'payment_method': record.get('payment_method') or None,
+        'contact_info': record.get('contact_info') or None
+    }
+
+
+def validate_expense(record, today, upload_folder):
+    """
+    Return column values for an expense row or raise ValueError. A
+    `document_path` must name a stored document, as for add_expense.
+    """
+    if record is None:
+        raise ValueError('row is not an object')
+    for field in ('amount', 'purpose'):
+        if not record.get(field):
+            raise ValueError(f'{field} is required')
+    check_document_path(record.get('document_path') or None, upload_folder)
+    return {
+        'amount': _parse_amount(record['amount']),
+        'date': _parse_date(record.get('date'), today),
+        'purpose': str(record['purpose']),
+        'category': record.get('category') or None,
+        'beneficiary_name': record.get('beneficiary_name') or None,
+        'document_path': record.get('document_path') or None
+    }
+
+
+def credit_key(values):
+    return (values['donor_name'], values['amount'], values['date'], values['purpose'])
+
+
+def expense_key(values):
+    return (values['amount'], values['date'], values['purpose'])
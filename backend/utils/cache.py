@@ -0,0 +1,255 @@
+"""Result cache for read-heavy summary endpoints, invalidated by table versions"""
+from flask import request, current_app, make_response
+from functools import wraps
+from collections import OrderedDict
+from utils.versions import current_versions
+import base64
+import hashlib
+import json
+import threading
+import time
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_PDF_CACHE_BYTES = 32 * 1024 * 1024
+
+
+class MemoryCache:
+    """Per-process LRU cache with a TTL on every entry"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class SizedLRU:
+    """
+    Per-process LRU bounded by the total size of its byte-string values
+    rather than the number of entries. Values larger than the whole budget
+    are not kept.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_PDF_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._entries[key] = value
+            self.bytes += len(value)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes
+        }
+
+
+def encode_entry(entry):
+    """Serialize a cached (body, status, mimetype) response as JSON, the body base64-encoded"""
+    body, status, mimetype = entry
+    return json.dumps({'body': base64.b64encode(body).decode(), 'status': status, 'mimetype': mimetype})
+
+
+def decode_entry(data):
+    """
+    Inverse of encode_entry. Anything else, such as a value written by
+    another client of the same Redis, reads as a miss (None).
+    """
+    try:
+        entry = json.loads(data)
+        return base64.b64decode(entry['body'], validate=True), int(entry['status']), str(entry['mimetype'])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+class RedisCache:
+    """
+    Cache shared by every gunicorn worker (and host) through Redis.
+
+    Redis evicts by TTL; errors are treated as misses so an unreachable
+    Redis slows the dashboard down instead of breaking it. Entries are
+    plain JSON (see encode_entry), so whoever can write to the Redis can at
+    worst plant a wrong response, never run code in the workers.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url, prefix='centswise:cache:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            data = self.client.get(self.prefix + key)
+        except Exception as e:
+            current_app.logger.warning(f'Result cache read failed: {e}')
+            return None
+        return decode_entry(data) if data is not None else None
+
+    def set(self, key, value, ttl):
+        try:
+            self.client.set(self.prefix + key, encode_entry(value), ex=ttl)
+        except Exception as e:
+            current_app.logger.warning(f'Result cache write failed: {e}')
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=self.prefix + '*'))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            current_app.logger.warning(f'Result cache clear failed: {e}')
+
+    def size(self):
+        try:
+            return sum(1 for _ in self.client.scan_iter(match=self.prefix + '*'))
+        except Exception:
+            return None
+
+
+class ResultCache:
+    """Backend plus this process's hit/miss counters"""
+
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.backend.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'entries': self.backend.size(),
+            'ttl': self.ttl
+        }
+
+
+def init_cache(app):
+    """
+    Attach the result cache to `app`: Redis when CACHE_REDIS_URL is set,
+    otherwise an in-process LRU.
+    """
+    url = app.config.get('CACHE_REDIS_URL')
+    if url:
+        backend = RedisCache(url)
+    else:
+        backend = MemoryCache(app.config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+    app.extensions['result_cache'] = ResultCache(backend, app.config.get('CACHE_TTL', DEFAULT_TTL))
+    app.extensions['pdf_cache'] = SizedLRU(
+        app.config.get('RECEIPT_CACHE_MAX_BYTES', DEFAULT_PDF_CACHE_BYTES)
+    )
+    return app.extensions['result_cache']
+
+
+def get_cache():
+    return current_app.extensions['result_cache']
+
+
+def get_pdf_cache():
+    return current_app.extensions['pdf_cache']
+
+
+def cached(*tables, ttl=None, depends_on=None):
+    """
+    Serve a GET endpoint's 200 responses from the result cache.
+
+    Entries are keyed by endpoint, query string and the current versions of
+    `tables`, so any committed write to one of those tables makes the old
+    entry unreachable; it then ages out through LRU/TTL. As for etag(),
+    `depends_on` returns any other state the response depends on, which is
+    added to the key. Responses carry an X-Cache: HIT/MISS header.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            versions = current_versions(tables)
+            payload = '|'.join(
+                [request.endpoint, request.full_path]
+                + [f'{name}={versions.get(name, 0)}' for name in sorted(tables)]
+                + ([str(depends_on())] if depends_on else [])
+            )
+            key = hashlib.sha1(payload.encode()).hexdigest()
+
+            entry = cache.backend.get(key)
+            if entry is not None:
+                cache.hits += 1
+                body, status, mimetype = entry
+                response = current_app.response_class(body, status=status, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            cache.misses += 1
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                cache.backend.set(
+                    key, (response.get_data(), response.status_code, response.mimetype),
+                    ttl or cache.ttl
+                )
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,286 @@
+"""Resumable, content-addressed upload store for expense documents"""
+from flask import current_app
+from extensions import db
+from models import DocumentUpload, Expense
+from utils.jobs import periodic_job
+from sqlalchemy import update
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import os
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no advisory locks on Windows
+    fcntl = None
+
+# Stored documents live under UPLOAD_FOLDER/DOCUMENT_DIR/<first two hex digits>/<sha256>
+DOCUMENT_DIR = 'documents'
+
+# Uploads in progress, one <upload id>.part file each
+PARTIAL_DIR = os.path.join(DOCUMENT_DIR, 'partial')
+
+# Largest document one upload may declare; each chunk is also capped by MAX_CONTENT_LENGTH
+MAX_DOCUMENT_SIZE = 512 * 1024 * 1024
+
+# Unfinished uploads untouched this long are discarded by the collector
+UPLOAD_EXPIRY = timedelta(hours=24)
+
+# Unreferenced documents younger than this are kept, so an upload can be attached to an expense
+ORPHAN_GRACE = timedelta(hours=24)
+
+# How often the worker runs the collector
+DOCUMENT_GC_INTERVAL = timedelta(hours=6)
+
+CHUNK_SIZE = 64 * 1024
+
+# Running SHA-256 per upload in this process, so the file is hashed as it
+# streams in; an upload whose chunks landed on another worker is re-read
+# once at the end instead
+_HASHERS_MAX = 128
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+class UploadConflict(Exception):
+    """A chunk was sent for the wrong offset; `offset` is where the upload stands"""
+
+    def __init__(self, offset):
+        super().__init__(f'Upload is at offset {offset}')
+        self.offset = offset
+
+
+def document_path_for(sha256):
+    """Path, relative to UPLOAD_FOLDER, of the stored document with this hash"""
+    return f'{DOCUMENT_DIR}/{sha256[:2]}/{sha256}'
+
+
+def check_document_path(document_path, upload_folder):
+    """
+    Raise ValueError unless a `documents/...` path names a stored document.
+    Other paths (from before the upload store) are left alone. Touching the
+    file restarts the collector's grace period, so it can't be collected
+    before the expense referencing it commits.
+    """
+    if not document_path or not document_path.startswith(f'{DOCUMENT_DIR}/'):
+        return
+    sha256 = document_path.rsplit('/', 1)[-1]
+    path = os.path.join(upload_folder, document_path_for(sha256))
+    if document_path != document_path_for(sha256) or not os.path.isfile(path):
+        raise ValueError('document_path does not name an uploaded document')
+    os.utime(path)
+
+
+def _part_path(upload_folder, upload_id):
+    return os.path.join(upload_folder, PARTIAL_DIR, f'{upload_id}.part')
+
+
+def _remember_hasher(upload_id, offset, hasher):
+    with _hashers_lock:
+        _hashers[upload_id] = (offset, hasher)
+        _hashers.move_to_end(upload_id)
+        while len(_hashers) > _HASHERS_MAX:
+            _hashers.popitem(last=False)
+
+
+def _take_hasher(upload_id, offset):
+    with _hashers_lock:
+        entry = _hashers.pop(upload_id, None)
+    if entry is not None and entry[0] == offset:
+        return entry[1]
+    return None
+
+
+def create_upload(filename, size, content_type=None):
+    """Start an upload of `size` bytes in the caller's transaction"""
+    if size < 1 or size > MAX_DOCUMENT_SIZE:
+        raise ValueError(f'size must be between 1 and {MAX_DOCUMENT_SIZE} bytes')
+    upload = DocumentUpload(
+        id=uuid.uuid4().hex,
+        filename=os.path.basename(filename)[:255],
+        content_type=content_type,
+        size=size
+    )
+    db.session.add(upload)
+    db.session.flush()
+    return upload
+
+
+def write_chunk(upload, offset, stream, upload_folder):
+    """
+    Append the bytes of `stream` to `upload` at `offset`, hashing them on
+    the way, and store the document once the last byte is in. Commits and
+    returns the refreshed upload.
+
+    Raises UploadConflict when `offset` is not where the upload stands
+    (including when a concurrent request wrote the same range first) and
+    ValueError when the chunk runs past the declared size.
+    """
+    if upload.status != 'pending' or offset != upload.received:
+        raise UploadConflict(upload.received)
+
+    path = _part_path(upload_folder, upload.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if offset and (not os.path.exists(path) or os.path.getsize(path) < offset):
+        # The partial file is gone (e.g. a redeploy wiped the disk): restart
+        db.session.execute(
+            update(DocumentUpload).where(DocumentUpload.id == upload.id).values(received=0)
+        )
+        db.session.commit()
+        raise UploadConflict(0)
+
+    hasher = _take_hasher(upload.id, offset)
+    if hasher is None and offset == 0:
+        hasher = hashlib.sha256()
+
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'w+b') as f:
+        # One writer per upload; re-check the offset under the lock so a
+        # request that lost a race never overwrites committed bytes
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                raise UploadConflict(upload.received)
+        current = db.session.query(DocumentUpload.received).filter(
+            DocumentUpload.id == upload.id
+        ).scalar()
+        db.session.commit()
+        if current != offset:
+            raise UploadConflict(current)
+
+        f.seek(offset)
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            if offset + written > upload.size:
+                f.truncate(offset)
+                raise ValueError('Chunk runs past the declared upload size')
+            f.write(chunk)
+            if hasher is not None:
+                hasher.update(chunk)
+        f.truncate()
+        f.flush()
+
+        received = offset + written
+        result = db.session.execute(
+            update(DocumentUpload)
+            .where(DocumentUpload.id == upload.id, DocumentUpload.received == offset)
+            .values(received=received)
+        )
+        if result.rowcount == 0:
+            db.session.rollback()
+            current = db.session.get(DocumentUpload, upload.id)
+            raise UploadConflict(current.received if current else 0)
+
+        if received == upload.size:
+            _finish(upload.id, path, hasher, upload_folder)
+        elif hasher is not None:
+            _remember_hasher(upload.id, received, hasher)
+
+        db.session.commit()
+    return db.session.get(DocumentUpload, upload.id)
+
+
+def _finish(upload_id, path, hasher, upload_folder):
+    """Move a complete upload to its content address, or drop it if that document exists"""
+    if hasher is None:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+    sha256 = hasher.hexdigest()
+
+    document_path = document_path_for(sha256)
+    destination = os.path.join(upload_folder, document_path)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if os.path.exists(destination):
+        os.remove(path)
+        # Restart the collector's grace period for the re-uploaded document
+        os.utime(destination)
+    else:
+        os.replace(path, destination)
+
+    db.session.execute(
+        update(DocumentUpload).where(DocumentUpload.id == upload_id).values(
+            status='complete', sha256=sha256, document_path=document_path,
+            completed_at=datetime.utcnow()
+        )
+    )
+
+
+def collect_garbage(upload_folder, now=None):
+    """
+    Delete expired unfinished uploads and stored documents that no expense
+    references (once past ORPHAN_GRACE). Returns counts of what was removed.
+    """
+    now = now or datetime.utcnow()
+    stats = {'expired_uploads': 0, 'orphaned_documents': 0, 'bytes_freed': 0}
+
+    def remove(path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return False
+        stats['bytes_freed'] += size
+        return True
+
+    expired = db.session.query(DocumentUpload.id).filter(
+        DocumentUpload.status == 'pending', DocumentUpload.updated_at < now - UPLOAD_EXPIRY
+    ).all()
+    for (upload_id,) in expired:
+        remove(_part_path(upload_folder, upload_id))
+    if expired:
+        db.session.query(DocumentUpload).filter(
+            DocumentUpload.id.in_([upload_id for (upload_id,) in expired])
+        ).delete(synchronize_session=False)
+        stats['expired_uploads'] = len(expired)
+
+    # Partial files left behind by an upload row that was never committed
+    partial_dir = os.path.join(upload_folder, PARTIAL_DIR)
+    cutoff = (now - UPLOAD_EXPIRY).timestamp()
+    if os.path.isdir(partial_dir):
+        pending = {upload_id for (upload_id,) in db.session.query(DocumentUpload.id).filter(
+            DocumentUpload.status == 'pending'
+        )}
+        for name in os.listdir(partial_dir):
+            path = os.path.join(partial_dir, name)
+            if name[:-len('.part')] not in pending and os.path.getmtime(path) < cutoff:
+                remove(path)
+
+    referenced = {path for (path,) in db.session.query(Expense.document_path).filter(
+        Expense.document_path.like(f'{DOCUMENT_DIR}/%')
+    )}
+    cutoff = (now - ORPHAN_GRACE).timestamp()
+    removed = []
+    document_root = os.path.join(upload_folder, DOCUMENT_DIR)
+    for shard in os.listdir(document_root) if os.path.isdir(document_root) else []:
+        shard_dir = os.path.join(document_root, shard)
+        if len(shard) != 2 or not os.path.isdir(shard_dir):
+            continue
+        for name in os.listdir(shard_dir):
+            document_path = f'{DOCUMENT_DIR}/{shard}/{name}'
+            path = os.path.join(shard_dir, name)
+            if document_path not in referenced and os.path.getmtime(path) < cutoff and remove(path):
+                removed.append(document_path)
+    if removed:
+        db.session.query(DocumentUpload).filter(
+            DocumentUpload.document_path.in_(removed)
+        ).delete(synchronize_session=False)
+        stats['orphaned_documents'] = len(removed)
+
+    db.session.commit()
+    return stats
+
+
+@periodic_job('documents.gc', DOCUMENT_GC_INTERVAL)
+def collect_garbage_job(payload):
+    return collect_garbage(current_app.config['UPLOAD_FOLDER'])
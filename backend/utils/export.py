@@ -0,0 +1,161 @@
+"""Streaming CSV/XLSX/ZIP export responses"""
+from flask import Response, stream_with_context
+from datetime import date, datetime
+import csv
+import io
+import os
+import tempfile
+import zipfile
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# Rows buffered before a CSV chunk is sent
+CSV_CHUNK_ROWS = 500
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def _cell(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(header, rows):
+    """Yield CSV text in chunks of CSV_CHUNK_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_cell(v) for v in row])
+        if count % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def write_xlsx(header, rows, sheet_name):
+    """
+    Write rows to a temporary XLSX file and return its path; the file is
+    removed if writing fails.
+
+    XlsxWriter's constant_memory mode flushes each row to disk as it is
+    written, so memory does not grow with the row count. The workbook is
+    only a valid ZIP once closed, though, so unlike CSV nothing can be sent
+    until every row is written.
+    """
+    import xlsxwriter
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    # XlsxWriter's per-sheet scratch files go in their own directory, which
+    # is removed even when close() is never reached
+    with tempfile.TemporaryDirectory(prefix='xlsx-') as scratch:
+        try:
+            workbook = xlsxwriter.Workbook(path, {
+                'constant_memory': True, 'remove_timezone': True, 'tmpdir': scratch
+            })
+            sheet = workbook.add_worksheet(sheet_name)
+            sheet.write_row(0, 0, header)
+            for row_number, row in enumerate(rows, start=1):
+                sheet.write_row(row_number, 0, [_cell(v) for v in row])
+            workbook.close()
+        except BaseException:
+            os.remove(path)
+            raise
+    return path
+
+
+def stream_temp_file(path):
+    """Yield a temporary file in chunks and delete it afterwards"""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+class _ChunkSink:
+    """Write-only, unseekable file that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _zip_chunks(entries):
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for name, date_time, source in entries:
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w', force_zip64=True) as member:
+                if isinstance(source, (bytes, bytearray)):
+                    member.write(source)
+                else:
+                    with open(source, 'rb') as f:
+                        while True:
+                            chunk = f.read(FILE_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            member.write(chunk)
+                            yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_zip(entries):
+    """
+    Yield a ZIP archive of `entries` as it is built.
+
+    Each entry is (name, date_time, source) where source is a file path or
+    bytes. zipfile writes to an unseekable sink using data descriptors, so
+    each member goes out as soon as it is compressed and the archive never
+    sits in memory; files are copied in FILE_CHUNK_SIZE pieces. PDFs and
+    images are already compressed, so deflate runs at its fastest level.
+    """
+    for chunk in _zip_chunks(entries):
+        if chunk:
+            yield chunk
+
+
+def export_response(fmt, name, header, rows):
+    """
+    Build an attachment response for `rows` in CSV or XLSX format. CSV is
+    streamed as rows are read; XLSX is written to disk first (see
+    write_xlsx), so very large ledgers are better exported as CSV.
+    """
+    if fmt == 'xlsx':
+        path = write_xlsx(header, rows, name)
+        return Response(
+            stream_temp_file(path),
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            headers={
+                'Content-Disposition': f'attachment; filename="{name}.xlsx"',
+                'Content-Length': str(os.path.getsize(path))
+            }
+        )
+
+    return Response(
+        stream_with_context(stream_csv(header, rows)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{name}.csv"'}
+    )
@@ -0,0 +1,209 @@
+"""Idempotency-Key handling and content-hash de-duplication for write endpoints"""
+from flask import request, jsonify, g
+from flask_jwt_extended import get_jwt_identity
+from functools import wraps
+from extensions import db
+from models import IdempotencyKey
+from sqlalchemy import delete, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import hashlib
+import json
+
+# How long a stored response can be replayed
+IDEMPOTENCY_TTL = timedelta(hours=24)
+
+# Identical submissions less than this far apart are recorded once
+DEDUP_WINDOW_SECONDS = 60
+
+
+def content_hash(*fields, now=None):
+    """
+    Hash a record's identifying fields together with the current dedup window.
+
+    Stored in a unique column, this turns "same record submitted twice in
+    one clock minute" into a constraint violation; insert_once also probes
+    the previous minute's hash.
+    """
+    now = now or datetime.utcnow()
+    window = int(now.timestamp()) // DEDUP_WINDOW_SECONDS
+    payload = json.dumps([str(f) for f in fields] + [window])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _flush_with_hash(row, *fingerprints):
+    """
+    Flush `row` in a savepoint, setting each of `fingerprints` as its
+    content hash in turn. Returns None on success, or the fingerprint the
+    unique index rejected; the savepoint is then rolled back.
+    """
+    claimed = None
+    try:
+        with db.session.begin_nested():
+            db.session.add(row)
+            for claimed in fingerprints:
+                row.content_hash = claimed
+                db.session.flush()
+        return None
+    except IntegrityError:
+        return claimed
+
+
+def insert_once(model, row, *fields, now=None):
+    """
+    Insert `row` unless an identical record (same `fields`) was inserted
+    less than DEDUP_WINDOW_SECONDS before `now`. Returns (row, True) when
+    inserted, (existing_row, False) for a duplicate.
+
+    The unique content_hash index decides; nothing is read first. Windows
+    are fixed clock minutes, so the row first claims the previous minute's
+    hash, which fails if a record from that minute exists, then moves to
+    its own, which fails for one from this minute. The existing row is
+    only loaded after a conflict.
+    """
+    now = now or datetime.utcnow()
+    window = timedelta(seconds=DEDUP_WINDOW_SECONDS)
+    fingerprint = content_hash(*fields, now=now)
+    previous = content_hash(*fields, now=now - window)
+
+    rejected = _flush_with_hash(row, previous, fingerprint)
+    if rejected == previous:
+        existing = model.query.filter_by(content_hash=previous).first()
+        if existing is not None and existing.created_at > now - window:
+            return existing, False
+        # Last minute's record is older than the window: only this minute counts
+        rejected = _flush_with_hash(row, fingerprint)
+
+    if rejected is None:
+        return row, True
+    existing = model.query.filter_by(content_hash=fingerprint).first()
+    if existing is None:
+        raise RuntimeError(f'{model.__tablename__} content hash conflict with no matching row')
+    return existing, False
+
+
+def insert_many_once(model, rows, fields, now=None):
+    """
+    Bulk counterpart of insert_once: insert the column-value dicts in
+    `rows`, skipping any identical (same `fields(row)`) to a record
+    inserted less than DEDUP_WINDOW_SECONDS before `now`. Sets each row's
+    content_hash (and created_at, if missing) and returns (id, row) for
+    the rows actually inserted.
+
+    Rows matching last minute's hash of a recent record are filtered out
+    first; the current minute's hash is left to the unique index, with
+    ON CONFLICT DO NOTHING on PostgreSQL and SQLite and a lookup of the
+    existing hashes elsewhere. `rows` must not repeat a record.
+    """
+    now = now or datetime.utcnow()
+    window = timedelta(seconds=DEDUP_WINDOW_SECONDS)
+    previous = []
+    for row in rows:
+        row.setdefault('created_at', now)
+        row['content_hash'] = content_hash(*fields(row), now=now)
+        previous.append((content_hash(*fields(row), now=now - window), row))
+    recent = {fingerprint for (fingerprint,) in db.session.query(model.content_hash).filter(
+        model.content_hash.in_([fingerprint for fingerprint, _ in previous]),
+        model.created_at > now - window
+    )}
+    rows = [row for fingerprint, row in previous if fingerprint not in recent]
+    if not rows:
+        return []
+
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = dialect_insert(table).on_conflict_do_nothing(index_elements=['content_hash'])
+    else:
+        taken = {fingerprint for (fingerprint,) in db.session.query(model.content_hash).filter(
+            model.content_hash.in_([row['content_hash'] for row in rows])
+        )}
+        rows = [row for row in rows if row['content_hash'] not in taken]
+        if not rows:
+            return []
+        stmt = insert(table)
+
+    by_hash = {row['content_hash']: row for row in rows}
+    # Core executemany, so the rows go out as multi-row VALUES; skipped rows return nothing
+    inserted = db.session.execute(stmt.returning(table.c.id, table.c.content_hash), rows).all()
+    return [(row_id, by_hash[fingerprint]) for row_id, fingerprint in inserted]
+
+
+def _load(owner, key, scope, fingerprint):
+    """Return the stored (body, status) for `owner`'s `key`, None if absent, 'conflict' if reused"""
+    stored = db.session.get(IdempotencyKey, (owner, key))
+    if stored is None:
+        return None
+    if stored.expires_at < datetime.utcnow():
+        db.session.delete(stored)
+        db.session.commit()
+        return None
+    if stored.scope != scope or stored.fingerprint != fingerprint:
+        return 'conflict'
+    return json.loads(stored.response_body), stored.status_code
+
+
+def remember_response(body, status):
+    """Store the response for the current Idempotency-Key in the caller's transaction"""
+    context = g.get('idempotency')
+    if not context:
+        return
+    owner, key, scope, fingerprint = context
+    now = datetime.utcnow()
+    db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < now))
+    db.session.add(IdempotencyKey(
+        owner=owner,
+        key=key,
+        scope=scope,
+        fingerprint=fingerprint,
+        status_code=status,
+        response_body=json.dumps(body),
+        created_at=now,
+        expires_at=now + IDEMPOTENCY_TTL
+    ))
+
+
+def idempotent(scope):
+    """
+    Honour an Idempotency-Key header on a write endpoint.
+
+    Keys belong to the JWT identity that sent them, so one user's key never
+    replays another user's response. A repeated key replays the stored
+    response without running the view; a key reused with a different body
+    is rejected. The view records its response with remember_response()
+    before committing, so the write and the key land in one transaction. If
+    a concurrent request with the same key commits first, the loser's failed
+    commit is answered with the winner's stored response.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > 255:
+                return jsonify({'error': 'Idempotency-Key is too long'}), 400
+
+            owner = str(get_jwt_identity())
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+            stored = _load(owner, key, scope, fingerprint)
+            if stored == 'conflict':
+                return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+            if stored:
+                body, status = stored
+                return jsonify(body), status
+
+            g.idempotency = (owner, key, scope, fingerprint)
+            response = view(*args, **kwargs)
+
+            status = response[1] if isinstance(response, tuple) else response.status_code
+            if status >= 500:
+                stored = _load(owner, key, scope, fingerprint)
+                if stored and stored != 'conflict':
+                    body, status = stored
+                    return jsonify(body), status
+            return response
+        return wrapper
+    return decorator
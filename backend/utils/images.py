@@ -0,0 +1,178 @@
+"""Item photos: content-addressed originals and fixed-size thumbnails"""
+from PIL import Image, ImageOps
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+# Photos live under UPLOAD_FOLDER/PHOTO_DIR
+PHOTO_DIR = 'items'
+
+# Longest edge, in pixels, of each thumbnail made for a photo
+THUMBNAIL_SIZES = (160, 480, 1024)
+
+THUMBNAIL_QUALITY = 82
+
+# Pillow format -> stored extension for accepted uploads
+PHOTO_FORMATS = {'JPEG': 'jpg', 'MPO': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+# Seconds a thumbnail render may take before the upload fails
+THUMBNAIL_TIMEOUT = 60
+
+CHUNK_SIZE = 64 * 1024
+
+THUMBNAIL_NAME = re.compile(r'^[0-9a-f]{32}-(\d+)\.jpg$')
+
+
+class ThumbnailTimeout(Exception):
+    """Making a photo's thumbnails took longer than THUMBNAIL_TIMEOUT"""
+
+
+def thumbnail_name(digest, size):
+    return f'{digest}-{size}.jpg'
+
+
+def is_thumbnail_name(name):
+    """Whether `name` is a thumbnail file name (as opposed to an original)"""
+    match = THUMBNAIL_NAME.match(name)
+    return bool(match) and int(match.group(1)) in THUMBNAIL_SIZES
+
+
+def thumbnail_names(photo_path):
+    """{size: file name} of the thumbnails of a photo stored by store_photo"""
+    if not photo_path or not photo_path.startswith(f'{PHOTO_DIR}/'):
+        return {}
+    digest = os.path.splitext(os.path.basename(photo_path))[0]
+    return {size: thumbnail_name(digest, size) for size in THUMBNAIL_SIZES}
+
+
+def make_thumbnails(source_path, digest, folder, staging):
+    """
+    Pool task: write a JPEG thumbnail per THUMBNAIL_SIZES into `staging`,
+    largest first, each downscaled from the previous one, and return the
+    names written. JPEG sources are decoded at reduced scale (draft mode).
+    Sizes already in `folder` are skipped, since a name fixes its content.
+    The caller moves the files next to the original, or deletes `staging`
+    if it gave up waiting; a task still running then fails to write.
+    """
+    with Image.open(source_path) as image:
+        image.draft('RGB', (max(THUMBNAIL_SIZES), max(THUMBNAIL_SIZES)))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        names = []
+        for size in sorted(THUMBNAIL_SIZES, reverse=True):
+            name = thumbnail_name(digest, size)
+            image.thumbnail((size, size), Image.LANCZOS)
+            if not os.path.exists(os.path.join(folder, name)):
+                with open(os.path.join(staging, name), 'xb') as f:
+                    image.save(f, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+                names.append(name)
+        return names
+
+
+# Process pool for thumbnails, created on first use
+_pool = None
+
+
+def get_image_pool():
+    """
+    Process pool that makes thumbnails off the web worker's GIL. Workers are
+    spawned, like the receipt render pool, and sized by IMAGE_WORKERS
+    (default: two, or one on a single core).
+    """
+    global _pool
+    if _pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+
+        workers = int(os.environ.get('IMAGE_WORKERS', 0)) or min(2, os.cpu_count() or 1)
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _pool
+
+
+def reset_image_pool():
+    """Drop a broken pool so the next upload starts a fresh one"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+def store_photo(stream, upload_folder):
+    """
+    Copy an uploaded image from `stream` to disk in chunks, name it by the
+    SHA-256 of its bytes and make its thumbnails on the image pool. Returns
+    the photo's path relative to `upload_folder`; raises ValueError when the
+    upload is not a supported image and ThumbnailTimeout when thumbnailing
+    overruns. Thumbnails are only moved into place once all are made; if
+    that fails, none are kept and an original stored by this call is
+    removed again.
+    """
+    folder = os.path.join(upload_folder, PHOTO_DIR)
+    os.makedirs(folder, exist_ok=True)
+
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+
+        try:
+            with Image.open(tmp_path) as image:
+                image_format = image.format
+                image.verify()
+        except Exception:
+            raise ValueError('Upload a JPEG, PNG, WebP or GIF image')
+        if image_format not in PHOTO_FORMATS:
+            raise ValueError('Upload a JPEG, PNG, WebP or GIF image')
+
+        name = digest.hexdigest()[:32]
+        path = os.path.join(folder, f'{name}.{PHOTO_FORMATS[image_format]}')
+        existed = os.path.exists(path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    staging = tempfile.mkdtemp(dir=folder, prefix='.thumbnails-')
+    future = get_image_pool().submit(make_thumbnails, path, name, folder, staging)
+    try:
+        for thumbnail in future.result(timeout=THUMBNAIL_TIMEOUT):
+            os.replace(os.path.join(staging, thumbnail), os.path.join(folder, thumbnail))
+    except BaseException as e:
+        future.cancel()
+        # Another item may already use an original that was here before
+        if not existed:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if isinstance(e, BrokenProcessPool):
+            reset_image_pool()
+        if isinstance(e, TimeoutError):
+            raise ThumbnailTimeout(
+                f'Making thumbnails took longer than {THUMBNAIL_TIMEOUT} seconds; '
+                'try a smaller image'
+            ) from e
+        raise
+    finally:
+        # cancel() can't stop a task already running; it finds this gone and fails
+        shutil.rmtree(staging, ignore_errors=True)
+    return f'{PHOTO_DIR}/{os.path.basename(path)}'
@@ -0,0 +1,238 @@
+"""Database-backed job queue: enqueue in a request, run in `flask worker`"""
+from flask import current_app
+from extensions import db
+from models import Job
+from sqlalchemy import select, update, or_, and_
+from datetime import datetime, timedelta
+import json
+import os
+import socket
+import threading
+import time
+
+# Job kind -> handler(payload) returning a JSON-serializable result
+HANDLERS = {}
+
+# Job kind -> interval for jobs that re-enqueue themselves after each run
+PERIODIC = {}
+
+# A running job whose worker has not finished or heartbeaten it in this long is retried
+JOB_TIMEOUT = timedelta(minutes=10)
+
+# Least time between two heartbeats of one job; well inside JOB_TIMEOUT
+HEARTBEAT_INTERVAL = timedelta(minutes=1)
+
+# Delay before retry n is RETRY_BASE_DELAY * 2**(n-1)
+RETRY_BASE_DELAY = timedelta(seconds=10)
+
+
+class JobFailed(Exception):
+    """Raised by a handler for errors a retry cannot fix; the job fails at once"""
+
+
+# The job this thread is running: {'id', 'worker', 'beat'}, set by run_job
+_current = threading.local()
+
+
+def job_handler(kind):
+    """Register the decorated function as the handler for jobs of `kind`"""
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+def periodic_job(kind, interval):
+    """
+    Register the decorated function as the handler for `kind` and run it
+    every `interval` (a timedelta) while a worker is up.
+    """
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        PERIODIC[kind] = interval
+        return fn
+    return decorator
+
+
+def enqueue(kind, payload=None, max_attempts=3, run_at=None):
+    """Add a job in the caller's transaction; it becomes visible on commit"""
+    if kind not in HANDLERS:
+        raise ValueError(f'No handler registered for job kind: {kind}')
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        max_attempts=max_attempts,
+        run_at=run_at or datetime.utcnow()
+    )
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+
+def schedule_periodic(kinds=None, start_now=True):
+    """
+    Enqueue the next run of each periodic job kind (all by default) that has
+    no run queued or in progress, due now or one interval from now.
+    """
+    now = datetime.utcnow()
+    for kind in kinds or PERIODIC:
+        pending = db.session.query(Job.id).filter(
+            Job.kind == kind, Job.status.in_(('queued', 'running'))
+        ).first()
+        if pending is None:
+            enqueue(kind, run_at=now if start_now else now + PERIODIC[kind])
+    db.session.commit()
+
+
+def claim_next(worker_id):
+    """
+    Atomically mark the next due job as running for `worker_id` and return
+    it, or None when the queue is empty.
+
+    The conditional UPDATE only succeeds for one worker per job; on
+    PostgreSQL the candidate is picked with SKIP LOCKED so workers don't
+    queue up behind each other's row locks. A running job times out when
+    its locked_at, set here and moved on by heartbeat(), falls JOB_TIMEOUT
+    behind. A job that timed out on its last attempt (most likely taking its worker down with it) is failed
+    instead of being reclaimed.
+    """
+    now = datetime.utcnow()
+    stale = and_(Job.status == 'running', Job.locked_at < now - JOB_TIMEOUT)
+    exhausted = db.session.execute(
+        update(Job.__table__)
+        .where(stale, Job.attempts >= Job.max_attempts)
+        .values(status='failed', error='Timed out: the worker did not finish the job',
+                locked_by=None, finished_at=now)
+        .returning(Job.kind)
+    ).scalars().all()
+    db.session.commit()
+    periodic = [kind for kind in set(exhausted) if kind in PERIODIC]
+    if periodic:
+        schedule_periodic(periodic, start_now=False)
+
+    due = or_(
+        and_(Job.status == 'queued', Job.run_at <= now),
+        and_(stale, Job.attempts < Job.max_attempts)
+    )
+    candidate = (
+        select(Job.id).where(due).order_by(Job.run_at, Job.id).limit(1)
+        .with_for_update(skip_locked=True).scalar_subquery()
+    )
+    job_id = db.session.execute(
+        update(Job.__table__)
+        .where(Job.id == candidate, due)
+        .values(status='running', locked_by=worker_id, locked_at=now, attempts=Job.attempts + 1)
+        .returning(Job.id)
+    ).scalar_one_or_none()
+    db.session.commit()
+    return db.session.get(Job, job_id) if job_id is not None else None
+
+
+def heartbeat():
+    """
+    Tell other workers the current job is still running by moving its
+    locked_at forward, at most once per HEARTBEAT_INTERVAL. Handlers whose
+    work can outlast JOB_TIMEOUT call this from their loops; outside a job
+    it does nothing. The update runs on its own connection, so the
+    handler's transaction is left alone.
+    """
+    job = getattr(_current, 'job', None)
+    if job is None:
+        return
+    now = datetime.utcnow()
+    if now - job['beat'] < HEARTBEAT_INTERVAL:
+        return
+    job['beat'] = now
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(Job.__table__)
+                .where(Job.id == job['id'], Job.locked_by == job['worker'])
+                .values(locked_at=now)
+            )
+    except Exception as e:
+        current_app.logger.warning(f"Job {job['id']} heartbeat failed: {e}")
+
+
+def with_heartbeat(iterable):
+    """Yield from `iterable`, heartbeating the current job along the way"""
+    for item in iterable:
+        heartbeat()
+        yield item
+
+
+def _record_outcome(job_id, worker_id, **values):
+    """
+    Record a job's outcome if `worker_id` still holds it. Returns False,
+    writing nothing, when the job was reclaimed by another worker.
+    """
+    result = db.session.execute(
+        update(Job.__table__)
+        .where(Job.id == job_id, Job.locked_by == worker_id)
+        .values(locked_by=None, **values)
+    )
+    db.session.commit()
+    if result.rowcount == 0:
+        current_app.logger.warning(
+            f'Job {job_id} was reclaimed from worker {worker_id}; outcome not recorded'
+        )
+        return False
+    return True
+
+
+def run_job(job):
+    """
+    Run a claimed job and record success, a scheduled retry or failure.
+    The outcome is only written while this worker still holds the job.
+    """
+    job_id, kind, worker_id = job.id, job.kind, job.locked_by
+    attempts, max_attempts = job.attempts, job.max_attempts
+    handler = HANDLERS.get(kind)
+    _current.job = {'id': job_id, 'worker': worker_id, 'beat': datetime.utcnow()}
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind: {kind}')
+        payload = json.loads(job.payload)
+        # Start the handler without a transaction held open from loading the job
+        db.session.commit()
+        result = handler(payload)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception(f'Job {job_id} ({kind}) failed')
+        values = {'error': f'{type(e).__name__}: {e}'}
+        retryable = handler is not None and not isinstance(e, JobFailed)
+        if retryable and attempts < max_attempts:
+            values.update(status='queued',
+                          run_at=datetime.utcnow() + RETRY_BASE_DELAY * 2 ** (attempts - 1))
+        else:
+            values.update(status='failed', finished_at=datetime.utcnow())
+        _record_outcome(job_id, worker_id, **values)
+        return False
+    finally:
+        _current.job = None
+
+    return _record_outcome(job_id, worker_id, status='succeeded', result=json.dumps(result),
+                           error=None, finished_at=datetime.utcnow())
+
+
+def run_worker(poll_interval=1.0, burst=False):
+    """
+    Claim and run jobs until interrupted. With `burst`, return once the
+    queue is empty instead of polling. Must run inside an app context.
+    """
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    print(f"✓ Worker {worker_id} started ({', '.join(sorted(HANDLERS))})")
+    schedule_periodic()
+    while True:
+        job = claim_next(worker_id)
+        if job is None:
+            db.session.remove()
+            if burst:
+                return
+            time.sleep(poll_interval)
+            continue
+        ok = run_job(job)
+        print(f"{'✓' if ok else '✗'} job {job.id} ({job.kind}) attempt {job.attempts}")
+        if job.kind in PERIODIC:
+            schedule_periodic([job.kind], start_now=False)
@@ -0,0 +1,251 @@
+"""Incrementally maintained ledger totals and daily rollups"""
+from extensions import db
+from models import LedgerTotals, DailyRollup, Credit, Expense, Item, Distribution
+from sqlalchemy import func, update, delete, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+
+TOTALS_ID = 1
+
+
+def rebuild_totals():
+    """Recompute every running total from the base tables (repairs drift)"""
+    totals = db.session.get(LedgerTotals, TOTALS_ID)
+    if totals is None:
+        totals = LedgerTotals(id=TOTALS_ID)
+        db.session.add(totals)
+    _count_totals(totals)
+    db.session.flush()
+    return totals
+
+
+def _count_totals(totals):
+    """Set every field of `totals` from the base tables"""
+    credit_total, credit_count = db.session.query(
+        func.coalesce(func.sum(Credit.amount), 0), func.count(Credit.id)
+    ).one()
+    expense_total, expense_count = db.session.query(
+        func.coalesce(func.sum(Expense.amount), 0), func.count(Expense.id)
+    ).one()
+    item_count, item_quantity, item_available = db.session.query(
+        func.count(Item.id),
+        func.coalesce(func.sum(Item.total_quantity), 0),
+        func.coalesce(func.sum(Item.available_quantity), 0)
+    ).one()
+    active_distributions = Distribution.query.filter_by(status='distributed').count()
+    
+    totals.credit_total = float(credit_total)
+    totals.credit_count = credit_count
+    totals.expense_total = float(expense_total)
+    totals.expense_count = expense_count
+    totals.item_count = item_count
+    totals.item_quantity = int(item_quantity)
+    totals.item_available = int(item_available)
+    totals.active_distributions = active_distributions
+    totals.updated_at = datetime.utcnow()
+
+
+def rebuild_item_stats():
+    """Recompute every item's lending stats from its distributions; returns the items touched"""
+    stats = {}
+    # Replayed in the order returns were recorded, as return_item() applied
+    # them, so the last recorded condition wins even for a backdated return
+    rows = db.session.query(
+        Distribution.item_id, Distribution.status, Distribution.distribution_date,
+        Distribution.actual_return_date, Distribution.return_condition
+    ).order_by(Distribution.updated_at, Distribution.id).yield_per(1000)
+    for item_id, status, lent_on, returned_on, condition in rows:
+        entry = stats.setdefault(item_id, {
+            'b_id': item_id, 'times_lent': 0, 'returns_count': 0,
+            'loan_days_total': 0, 'last_return_condition': None
+        })
+        entry['times_lent'] += 1
+        if status == 'returned' and returned_on:
+            entry['returns_count'] += 1
+            entry['loan_days_total'] += max((returned_on - lent_on).days, 0)
+            if condition:
+                entry['last_return_condition'] = condition
+    
+    db.session.execute(
+        update(Item.__table__).values(
+            times_lent=0, returns_count=0, loan_days_total=0, last_return_condition=None
+        )
+    )
+    if stats:
+        db.session.execute(
+            update(Item.__table__).where(Item.id == bindparam('b_id')).values(
+                times_lent=bindparam('times_lent'),
+                returns_count=bindparam('returns_count'),
+                loan_days_total=bindparam('loan_days_total'),
+                last_return_condition=bindparam('last_return_condition')
+            ),
+            list(stats.values())
+        )
+    return len(stats)
+
+
+def _insert_totals_row():
+    """
+    Insert an empty totals row unless one exists, without failing when a
+    concurrent transaction inserts it first. True if this call inserted it.
+    """
+    table = LedgerTotals.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        result = db.session.execute(
+            insert(table).values(id=TOTALS_ID).on_conflict_do_nothing(index_elements=['id'])
+        )
+        return result.rowcount == 1
+    try:
+        with db.session.begin_nested():
+            db.session.execute(table.insert().values(id=TOTALS_ID))
+        return True
+    except IntegrityError:
+        return False
+
+
+def ensure_totals():
+    """
+    Create the totals row from the base tables if it is missing, in the
+    current transaction. Concurrent first writers don't collide: only the
+    one whose insert lands rebuilds, the others find the row in place.
+    Returns True if this call created it, in which case it already counts
+    the caller's flushed changes.
+    """
+    if db.session.get(LedgerTotals, TOTALS_ID) is not None:
+        return False
+    if not _insert_totals_row():
+        return False
+    rebuild_totals()
+    return True
+
+
+def get_totals():
+    """
+    Return the totals row. Reads never write: the row is created at
+    startup and by the first write (see apply_delta). Until it exists, an
+    unsaved LedgerTotals counted from the base tables is returned instead.
+    """
+    totals = db.session.get(LedgerTotals, TOTALS_ID)
+    if totals is None:
+        totals = LedgerTotals(id=TOTALS_ID)
+        _count_totals(totals)
+    return totals
+
+
+def apply_delta(**deltas):
+    """
+    Add `deltas` to the running totals inside the caller's transaction.
+    
+    Uses `SET col = col + :delta` so concurrent writers never lose updates.
+    Call after the base-table change has been added to the session.
+    """
+    values = {name: getattr(LedgerTotals, name) + delta for name, delta in deltas.items()}
+    values['updated_at'] = datetime.utcnow()
+    stmt = update(LedgerTotals).where(LedgerTotals.id == TOTALS_ID).values(**values)
+    if db.session.execute(stmt).rowcount == 0:
+        # No totals row yet: one built from the base tables already includes
+        # the caller's pending change once flushed. If another transaction
+        # created it first, that one can't see the change, so apply it
+        db.session.flush()
+        if not ensure_totals():
+            db.session.execute(stmt)
+
+
+def apply_rollup(kind, day, dimension, amount, count):
+    """Upsert `amount`/`count` into the (day, kind, dimension) rollup row"""
+    apply_rollups([dict(day=day, kind=kind, dimension=dimension, amount=amount, count=count)])
+
+
+def apply_rollups(entries):
+    """Upsert many rollup increments with a single executemany"""
+    dialect = db.session.get_bind().dialect.name
+    table = DailyRollup.__table__
+    entries = [dict(entry, dimension=entry['dimension'] or '') for entry in entries]
+    
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['day', 'kind', 'dimension'],
+            set_={
+                'amount': table.c.amount + stmt.excluded.amount,
+                'count': table.c.count + stmt.excluded.count
+            }
+        )
+        db.session.execute(stmt, entries)
+        return
+    
+    for entry in entries:
+        row = DailyRollup.query.filter_by(
+            day=entry['day'], kind=entry['kind'], dimension=entry['dimension']
+        ).with_for_update().first()
+        if row:
+            row.amount += entry['amount']
+            row.count += entry['count']
+        else:
+            db.session.add(DailyRollup(**entry))
+
+
+def record_credit(credit, sign=1):
+    """Apply a credit insert (sign=1) or delete (sign=-1) to totals and rollups"""
+    apply_delta(credit_total=sign * credit.amount, credit_count=sign)
+    apply_rollup('credit', credit.date, credit.payment_method, sign * credit.amount, sign)
+
+
+def record_expense(expense, sign=1):
+    """Apply an expense insert (sign=1) or delete (sign=-1) to totals and rollups"""
+    apply_delta(expense_total=sign * expense.amount, expense_count=sign)
+    apply_rollup('expense', expense.date, expense.category, sign * expense.amount, sign)
+
+
+def record_batch(kind, rows):
+    """Apply many inserted credits or expenses (dicts of column values) at once"""
+    if not rows:
+        return
+    total = sum(row['amount'] for row in rows)
+    if kind == 'credit':
+        apply_delta(credit_total=total, credit_count=len(rows))
+        dimension_field = 'payment_method'
+    else:
+        apply_delta(expense_total=total, expense_count=len(rows))
+        dimension_field = 'category'
+    
+    rollups = {}
+    for row in rows:
+        key = (row['date'], row[dimension_field] or '')
+        amount, count = rollups.get(key, (0, 0))
+        rollups[key] = (amount + row['amount'], count + 1)
+    apply_rollups([
+        dict(day=day, kind=kind, dimension=dimension, amount=amount, count=count)
+        for (day, dimension), (amount, count) in rollups.items()
+    ])
+
+
+def rebuild_rollups():
+    """Recompute every daily rollup row from the base tables"""
+    db.session.execute(delete(DailyRollup))
+    
+    credit_rows = db.session.query(
+        Credit.date, Credit.payment_method, func.sum(Credit.amount), func.count(Credit.id)
+    ).group_by(Credit.date, Credit.payment_method)
+    expense_rows = db.session.query(
+        Expense.date, Expense.category, func.sum(Expense.amount), func.count(Expense.id)
+    ).group_by(Expense.date, Expense.category)
+    
+    # NULL and '' both land in the '' dimension, so merge before inserting
+    merged = {}
+    for kind, rows in (('credit', credit_rows), ('expense', expense_rows)):
+        for day, dimension, amount, count in rows:
+            key = (day, kind, dimension or '')
+            prev_amount, prev_count = merged.get(key, (0, 0))
+            merged[key] = (prev_amount + float(amount), prev_count + count)
+    
+    db.session.add_all([
+        DailyRollup(day=day, kind=kind, dimension=dimension, amount=amount, count=count)
+        for (day, kind, dimension), (amount, count) in merged.items()
+    ])
+    db.session.flush()
+    return len(merged)
@@ -0,0 +1,173 @@
+"""Materialized set of overdue distributions, refreshed periodically by the job worker"""
+from extensions import db
+from models import Distribution, OverdueDistribution, RefreshMark, Item
+from utils.jobs import periodic_job
+from utils.versions import bump_versions
+from sqlalchemy import select, insert, delete, func, literal
+from datetime import datetime, date, timedelta
+
+# How often the worker rebuilds the overdue set
+OVERDUE_REFRESH_INTERVAL = timedelta(hours=1)
+
+# Once the set has missed a refresh, readers query distributions directly
+OVERDUE_STALE_AFTER = OVERDUE_REFRESH_INTERVAL * 2
+
+
+def outstanding_overdue(today=None):
+    """
+    Distributions still out past their expected return date. The filter
+    matches the partial index ix_distributions_outstanding_return, so only
+    outstanding rows are read.
+    """
+    today = today or date.today()
+    return select(
+        Distribution.id, Distribution.item_id, Distribution.recipient_name,
+        Distribution.recipient_contact, Distribution.quantity,
+        Distribution.distribution_date, Distribution.expected_return_date
+    ).where(
+        Distribution.status == 'distributed',
+        Distribution.expected_return_date < today
+    )
+
+
+def refresh_overdue(today=None):
+    """Replace the overdue set with the current overdue distributions; returns its size"""
+    now = datetime.utcnow()
+    query = outstanding_overdue(today).add_columns(literal(now, db.DateTime))
+    db.session.execute(delete(OverdueDistribution))
+    result = db.session.execute(
+        insert(OverdueDistribution).from_select(
+            ['distribution_id', 'item_id', 'recipient_name', 'recipient_contact', 'quantity',
+             'distribution_date', 'expected_return_date', 'refreshed_at'],
+            query
+        )
+    )
+    db.session.merge(RefreshMark(name='overdue_distributions', refreshed_at=now))
+    bump_versions('overdue_distributions')
+    return result.rowcount
+
+
+def last_refreshed():
+    """When the overdue set was last rebuilt, or None if it never has been"""
+    mark = db.session.get(RefreshMark, 'overdue_distributions')
+    return mark.refreshed_at if mark else None
+
+
+def is_fresh(refreshed_at):
+    return refreshed_at is not None and datetime.utcnow() - refreshed_at < OVERDUE_STALE_AFTER
+
+
+def overdue_state():
+    """
+    What overdue responses depend on besides table versions, for ETags and
+    cache keys: today's date (days overdue and the live count move on at
+    midnight) and whether the set is fresh, which lapses with time alone.
+    """
+    return f'{date.today().isoformat()}|{is_fresh(last_refreshed())}'
+
+
+def forget_overdue(distribution_id):
+    """Drop a returned distribution from the overdue set without waiting for a refresh"""
+    result = db.session.execute(
+        delete(OverdueDistribution).where(OverdueDistribution.distribution_id == distribution_id)
+    )
+    if result.rowcount:
+        bump_versions('overdue_distributions')
+
+
+def overdue_count():
+    """
+    Number of overdue distributions: from the overdue set while it is fresh,
+    otherwise (no worker running) counted live off the partial index.
+    """
+    if is_fresh(last_refreshed()):
+        return db.session.query(func.count(OverdueDistribution.distribution_id)).scalar()
+    live = outstanding_overdue().subquery()
+    return db.session.query(func.count()).select_from(live).scalar()
+
+
+def overdue_report(today=None):
+    """
+    Overdue distributions with per-recipient and per-item totals.
+
+    Read from the overdue set while it is fresh; once it has missed a
+    refresh (or was never built) the distributions are queried directly.
+    `source` says which was used and `refreshed_at` is None until the set
+    has been built once.
+    """
+    today = today or date.today()
+    refreshed_at = last_refreshed()
+    fresh = is_fresh(refreshed_at)
+    if fresh:
+        rows = db.session.query(
+            OverdueDistribution.distribution_id, OverdueDistribution.item_id, Item.name,
+            OverdueDistribution.recipient_name, OverdueDistribution.recipient_contact,
+            OverdueDistribution.quantity, OverdueDistribution.distribution_date,
+            OverdueDistribution.expected_return_date
+        ).outerjoin(Item, Item.id == OverdueDistribution.item_id).order_by(
+            OverdueDistribution.expected_return_date, OverdueDistribution.distribution_id
+        ).all()
+    else:
+        live = outstanding_overdue(today).subquery()
+        rows = db.session.query(
+            live.c.id, live.c.item_id, Item.name, live.c.recipient_name,
+            live.c.recipient_contact, live.c.quantity, live.c.distribution_date,
+            live.c.expected_return_date
+        ).outerjoin(Item, Item.id == live.c.item_id).order_by(
+            live.c.expected_return_date, live.c.id
+        ).all()
+    
+    overdue = []
+    by_recipient = {}
+    by_item = {}
+    for (dist_id, item_id, item_name, recipient_name, recipient_contact, quantity,
+         distribution_date, expected_return_date) in rows:
+        days_overdue = (today - expected_return_date).days
+        overdue.append({
+            'distribution_id': dist_id,
+            'item_id': item_id,
+            'item_name': item_name,
+            'recipient_name': recipient_name,
+            'recipient_contact': recipient_contact,
+            'quantity': quantity,
+            'distribution_date': distribution_date,
+            'expected_return_date': expected_return_date,
+            'days_overdue': days_overdue
+        })
+        
+        recipient = by_recipient.setdefault((recipient_name, recipient_contact), {
+            'recipient_name': recipient_name,
+            'recipient_contact': recipient_contact,
+            'distributions': 0,
+            'quantity': 0,
+            'max_days_overdue': 0
+        })
+        item = by_item.setdefault(item_id, {
+            'item_id': item_id,
+            'item_name': item_name,
+            'distributions': 0,
+            'quantity': 0,
+            'max_days_overdue': 0
+        })
+        for group in (recipient, item):
+            group['distributions'] += 1
+            group['quantity'] += quantity
+            group['max_days_overdue'] = max(group['max_days_overdue'], days_overdue)
+    
+    def ranked(groups):
+        return sorted(groups.values(), key=lambda g: (-g['max_days_overdue'], -g['quantity']))
+    
+    return {
+        'source': 'overdue_set' if fresh else 'live',
+        'refreshed_at': refreshed_at,
+        'total': len(overdue),
+        'quantity': sum(entry['quantity'] for entry in overdue),
+        'by_recipient': ranked(by_recipient),
+        'by_item': ranked(by_item),
+        'overdue': overdue
+    }
+
+
+@periodic_job('distributions.refresh_overdue', OVERDUE_REFRESH_INTERVAL)
+def refresh_overdue_job(payload):
+    return {'overdue': refresh_overdue()}
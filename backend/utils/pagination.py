@@ -0,0 +1,77 @@
+"""Keyset (cursor) pagination helpers for list endpoints"""
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import tuple_
+
+# Largest page a client may ask for
+MAX_PER_PAGE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+def encode_cursor(values):
+    """Pack the sort-key values of the last row into an opaque token"""
+    payload = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, types):
+    """Unpack a cursor token back into values of the given Python types"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise InvalidCursor('Invalid cursor')
+
+    decoded = []
+    for python_type, value in zip(types, values):
+        try:
+            if value is None:
+                decoded.append(None)
+            elif python_type is datetime:
+                decoded.append(datetime.fromisoformat(value))
+            elif python_type is date:
+                decoded.append(date.fromisoformat(value))
+            else:
+                decoded.append(python_type(value))
+        except (ValueError, TypeError):
+            raise InvalidCursor('Invalid cursor')
+    return decoded
+
+
+def keyset_page(query, columns, limit, cursor=None, descending=True):
+    """
+    Fetch one page of `query` ordered by `columns` (the last one must be unique).
+
+    Seeks past the cursor with a row-value comparison instead of OFFSET, so
+    every page costs the same regardless of depth. `limit` is clamped to
+    1..MAX_PER_PAGE. Returns (rows, next_cursor); next_cursor is None on the
+    last page.
+    """
+    limit = max(1, min(limit, MAX_PER_PAGE))
+
+    if cursor:
+        values = decode_cursor(cursor, [c.type.python_type for c in columns])
+        key = tuple_(*columns)
+        query = query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+
+    query = query.order_by(*[c.desc() if descending else c.asc() for c in columns])
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], c.key) for c in columns])
+    return rows, next_cursor
+
+
+def wants_cursor(args):
+    """Cursor mode is selected by passing `cursor` (empty for the first page)"""
+    return 'cursor' in args
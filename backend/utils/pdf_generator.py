@@ -1,142 +1,342 @@
+from reportlab import rl_config
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-from datetime import datetime
+from reportlab.lib.utils import ImageReader
 from PIL import Image
+from datetime import datetime
+import io
+import math
 import os
 
+# Embed image data as binary; ASCII85 only inflates it and reportlab's
+# pure-Python encoder is most of the cost of drawing the template
+rl_config.useA85 = 0
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS = os.path.join(BASE_DIR, "assets")
+
+TEMPLATE_IMG = os.path.join(ASSETS, "sys_receipt_full_template.png")
+RUPEE_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+
+BACKGROUND_FORM = 'receipt_background'
+
+# Sender name box, in template pixels
+NAME_PX_X = 466
+NAME_PX_Y = 545
+NAME_PX_HEIGHT = 40
+NAME_PX_WIDTH = 420
+NAME_FONT = "Helvetica-Bold"
+NAME_MAX_SIZE = 44
+NAME_MIN_SIZE = 22
+NAME_ADJUST_UP = 6
+
+# Amount box, in template pixels
+AMOUNT_PX_X = 60
+AMOUNT_PX_Y = 1674
+AMOUNT_PX_WIDTH = 320
+AMOUNT_FONT = "RupeeFont"
+AMOUNT_MAX_SIZE = 30
+AMOUNT_MIN_SIZE = 20
+AMOUNT_ADJUST_RIGHT = 18
+AMOUNT_ADJUST_DOWN = 12
+
+
+def fitted_font_size(text, font, max_width, max_size, min_size):
+    """
+    Largest whole point size (between min_size and max_size) at which `text`
+    fits in `max_width`. String width is linear in the font size, so this is
+    one width measurement instead of a shrink-by-one loop.
+    """
+    unit_width = pdfmetrics.stringWidth(text, font, 1)
+    if unit_width <= 0:
+        return max_size
+    return max(min_size, min(max_size, math.floor(max_width / unit_width)))
+
+
+class ReceiptRenderer:
+    """
+    Receipt PDF renderer with the per-process setup done once.
+
+    The template PNG is decoded a single time and kept in memory as is, so
+    receipts still embed it losslessly; each document draws it into a form
+    XObject on its first page and reuses the form for every page after. The
+    font is registered and its metrics, the template's scale factors and the
+    text boxes are computed up front.
+    """
+
+    def __init__(self, template_path=TEMPLATE_IMG, font_path=RUPEE_FONT_PATH):
+        if not os.path.exists(template_path):
+            raise FileNotFoundError("Template image not found")
+
+        if not os.path.exists(font_path):
+            raise FileNotFoundError("DejaVuSans-Bold.ttf not found")
+
+        if AMOUNT_FONT not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(AMOUNT_FONT, font_path))
+        self.amount_ascent = pdfmetrics.getFont(AMOUNT_FONT).face.ascent / 1000
+
+        self.background = ImageReader(template_path)
+        self.background.getRGBData()  # decode now; ImageReader keeps the pixels
+        template_width, template_height = self.background.getSize()
+
+        scale_x = PAGE_WIDTH / template_width
+        scale_y = PAGE_HEIGHT / template_height
+
+        self.name_x = NAME_PX_X * scale_x
+        self.name_y_top = PAGE_HEIGHT - (NAME_PX_Y * scale_y)
+        self.name_zone_height = NAME_PX_HEIGHT * scale_y
+        self.name_max_width = NAME_PX_WIDTH * scale_x
+
+        self.amount_x = AMOUNT_PX_X * scale_x + AMOUNT_ADJUST_RIGHT
+        self.amount_center_y = PAGE_HEIGHT - (AMOUNT_PX_Y * scale_y) - AMOUNT_ADJUST_DOWN
+        self.amount_max_width = AMOUNT_PX_WIDTH * scale_x
+
+    def _draw_background(self, c):
+        if not c.hasForm(BACKGROUND_FORM):
+            c.beginForm(BACKGROUND_FORM)
+            c.drawImage(
+                self.background, 0, 0, PAGE_WIDTH, PAGE_HEIGHT,
+                preserveAspectRatio=True, anchor='c', mask='auto'
+            )
+            c.endForm()
+        c.doForm(BACKGROUND_FORM)
+
+    def render(self, receipt, output, invariant=False):
+        """
+        Draw `receipt` into `output`, a file path or a writable binary file.
+        With `invariant`, the PDF's timestamps and document ID are fixed so the
+        same receipt always renders to the same bytes.
+        """
+        c = canvas.Canvas(output, pagesize=A4, invariant=1 if invariant else None)
+        self.draw_page(c, receipt)
+        c.save()
+        return output
+
+    def render_many(self, receipts, output):
+        """Draw every receipt in `receipts` as one page of a single PDF"""
+        c = canvas.Canvas(output, pagesize=A4)
+        for receipt in receipts:
+            self.draw_page(c, receipt)
+        c.save()
+        return output
+
+    def draw_page(self, c, receipt):
+        """Draw `receipt` on the current page of canvas `c` and end the page"""
+        self._draw_background(c)
+
+        # Header meta
+        c.setFont("Helvetica", 9)
+        c.setFillColor(colors.black)
+
+        date_str = (
+            receipt.date.strftime("%d-%m-%Y")
+            if isinstance(receipt.date, datetime)
+            else receipt.date
+        )
+
+        c.drawString(40, PAGE_HEIGHT - 35, f"Receipt No: {receipt.serial_number}")
+        c.drawRightString(PAGE_WIDTH - 40, PAGE_HEIGHT - 35, f"Date: {date_str}")
+
+        # Sender name, shrunk to fit its box and centred vertically in it
+        name_text = receipt.donor_name.upper() + ","
+        size = fitted_font_size(
+            name_text, NAME_FONT, self.name_max_width, NAME_MAX_SIZE, NAME_MIN_SIZE
+        )
+        c.setFont(NAME_FONT, size)
+
+        text_height = size * 0.7
+        y_centered = self.name_y_top - (self.name_zone_height + text_height) / 2
+        y_centered += NAME_ADJUST_UP
+
+        c.drawString(self.name_x, y_centered, name_text)
+
+        # Amount, centred on its baseline box
+        amount_text = f"₹ {receipt.amount:,.0f}/-"
+        size = fitted_font_size(
+            amount_text, AMOUNT_FONT, self.amount_max_width, AMOUNT_MAX_SIZE, AMOUNT_MIN_SIZE
+        )
+        c.setFont(AMOUNT_FONT, size)
+
+        y_amount = self.amount_center_y - (self.amount_ascent * size) / 2
+
+        c.drawString(self.amount_x, y_amount, amount_text)
+
+        c.showPage()
+
+
+_renderer = None
+
+
+def get_renderer():
+    """The process-wide ReceiptRenderer, built on first use"""
+    global _renderer
+    if _renderer is None:
+        _renderer = ReceiptRenderer()
+    return _renderer
+
 
 def generate_receipt_pdf(receipt, output_path):
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    return get_renderer().render(receipt, output_path)
 
-    # --------------------------------------------------
-    # Paths
-    # --------------------------------------------------
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    ASSETS = os.path.join(BASE_DIR, "assets")
-
-    TEMPLATE_IMG = os.path.join(ASSETS, "sys_receipt_full_template.png")
-    RUPEE_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
 
-    if not os.path.exists(TEMPLATE_IMG):
-        raise FileNotFoundError("Template image not found")
+def render_receipt_bytes(receipt):
+    """Render `receipt` in memory, byte-for-byte reproducible from its fields"""
+    buffer = io.BytesIO()
+    get_renderer().render(receipt, buffer, invariant=True)
+    return buffer.getvalue()
 
-    if not os.path.exists(RUPEE_FONT_PATH):
-        raise FileNotFoundError("DejaVuSans-Bold.ttf not found")
 
-    pdfmetrics.registerFont(TTFont("RupeeFont", RUPEE_FONT_PATH))
+def _render_unprepared(receipt, output):
+    """
+    generate_receipt_pdf as it was before ReceiptRenderer, kept as the
+    benchmark's baseline: every call registers the font, opens the template
+    with PIL for its size, embeds the PNG through drawImage and shrinks the
+    font sizes a point at a time. Run it with rl_config.useA85 on, as the
+    old code did.
+    """
+    pdfmetrics.registerFont(TTFont(AMOUNT_FONT, RUPEE_FONT_PATH))
+    c = canvas.Canvas(output, pagesize=A4)
 
-    # --------------------------------------------------
-    # Page
-    # --------------------------------------------------
-    PAGE_WIDTH, PAGE_HEIGHT = A4
-    c = canvas.Canvas(output_path, pagesize=A4)
-
-    # --------------------------------------------------
-    # Load template image size (PIXELS)
-    # --------------------------------------------------
     img = Image.open(TEMPLATE_IMG)
-    img_width_px, img_height_px = img.size
-
-    scale_x = PAGE_WIDTH / img_width_px
-    scale_y = PAGE_HEIGHT / img_height_px
+    scale_x = PAGE_WIDTH / img.size[0]
+    scale_y = PAGE_HEIGHT / img.size[1]
 
-    # --------------------------------------------------
-    # Draw template
-    # --------------------------------------------------
     c.drawImage(
-        TEMPLATE_IMG,
-        0,
-        0,
-        width=PAGE_WIDTH,
-        height=PAGE_HEIGHT,
-        preserveAspectRatio=True,
-        mask="auto",
+        TEMPLATE_IMG, 0, 0, width=PAGE_WIDTH, height=PAGE_HEIGHT,
+        preserveAspectRatio=True, mask="auto"
     )
 
-    # --------------------------------------------------
-    # Header Meta
-    # --------------------------------------------------
     c.setFont("Helvetica", 9)
     c.setFillColor(colors.black)
-
     date_str = (
         receipt.date.strftime("%d-%m-%Y")
         if isinstance(receipt.date, datetime)
         else receipt.date
     )
-
     c.drawString(40, PAGE_HEIGHT - 35, f"Receipt No: {receipt.serial_number}")
     c.drawRightString(PAGE_WIDTH - 40, PAGE_HEIGHT - 35, f"Date: {date_str}")
 
-    # ==================================================
-    # SENDER NAME (PIXEL-LOCKED, +10 SIZE AGAIN)
-    # ==================================================
-    NAME_PX_X = 466
-    NAME_PX_Y = 545
-
-    NAME_X = NAME_PX_X * scale_x
-    NAME_Y_TOP = PAGE_HEIGHT - (NAME_PX_Y * scale_y)
-
-    NAME_ZONE_HEIGHT = 40 * scale_y
-    NAME_MAX_WIDTH = 420 * scale_x
-
     name_text = receipt.donor_name.upper() + ","
-    name_font = "Helvetica-Bold"
-    size = 44  # 🔥 increased by +10 again
-
-    c.setFillColor(colors.black)
-
-    while c.stringWidth(name_text, name_font, size) > NAME_MAX_WIDTH and size > 22:
+    size = NAME_MAX_SIZE
+    while c.stringWidth(name_text, NAME_FONT, size) > NAME_PX_WIDTH * scale_x and size > NAME_MIN_SIZE:
         size -= 1
-
-    c.setFont(name_font, size)
-
-    text_height = size * 0.7
-    y_centered = NAME_Y_TOP - (NAME_ZONE_HEIGHT + text_height) / 2
-    y_centered += 6  # previous fine-tune
-
-    c.drawString(NAME_X, y_centered, name_text)
-
-    # ==================================================
-    # AMOUNT (MOVE SLIGHTLY RIGHT & DOWN)
-    # ==================================================
-    AMOUNT_PX_X = 60
-    AMOUNT_PX_Y = 1674
-
-    base_x = AMOUNT_PX_X * scale_x
-    base_center_y = PAGE_HEIGHT - (AMOUNT_PX_Y * scale_y)
-
-    # 🔧 micro adjustments
-    AMOUNT_ADJUST_RIGHT = 18
-    AMOUNT_ADJUST_DOWN = 12
-
-    amount_x = base_x + AMOUNT_ADJUST_RIGHT
-    amount_center_y = base_center_y - AMOUNT_ADJUST_DOWN
+    c.setFont(NAME_FONT, size)
+    name_y_top = PAGE_HEIGHT - (NAME_PX_Y * scale_y)
+    y_centered = name_y_top - (NAME_PX_HEIGHT * scale_y + size * 0.7) / 2 + NAME_ADJUST_UP
+    c.drawString(NAME_PX_X * scale_x, y_centered, name_text)
 
     amount_text = f"₹ {receipt.amount:,.0f}/-"
-    AMOUNT_MAX_WIDTH = 320 * scale_x
-
-    size = 30
-    c.setFont("RupeeFont", size)
-    c.setFillColor(colors.black)
-
-    while c.stringWidth(amount_text, "RupeeFont", size) > AMOUNT_MAX_WIDTH and size > 20:
+    size = AMOUNT_MAX_SIZE
+    c.setFont(AMOUNT_FONT, size)
+    while c.stringWidth(amount_text, AMOUNT_FONT, size) > AMOUNT_PX_WIDTH * scale_x and size > AMOUNT_MIN_SIZE:
         size -= 1
-        c.setFont("RupeeFont", size)
+        c.setFont(AMOUNT_FONT, size)
+    ascent = pdfmetrics.getFont(AMOUNT_FONT).face.ascent * size / 1000
+    amount_center_y = PAGE_HEIGHT - (AMOUNT_PX_Y * scale_y) - AMOUNT_ADJUST_DOWN
+    c.drawString(AMOUNT_PX_X * scale_x + AMOUNT_ADJUST_RIGHT, amount_center_y - ascent / 2, amount_text)
 
-    face = pdfmetrics.getFont("RupeeFont").face
-    ascent = (face.ascent * size) / 1000
-    y_amount = amount_center_y - ascent / 2
-
-    c.drawString(amount_x, y_amount, amount_text)
-
-    # --------------------------------------------------
-    # Save
-    # --------------------------------------------------
     c.showPage()
     c.save()
+    return output
+
+
+def benchmark_receipts(count=50):
+    """
+    Render `count` sample receipts twice: "before" with the old per-call
+    code path (_render_unprepared, ASCII85 on), "after" with the prepared
+    renderer. Returns {'before': receipts/sec, 'after': receipts/sec}.
+    """
+    from types import SimpleNamespace
+    from datetime import date
+    import time
+
+    receipt = SimpleNamespace(
+        serial_number="RCP-0000-0001",
+        donor_name="Benchmark Donor With A Fairly Long Name",
+        amount=125000.0,
+        date=date.today()
+    )
+
+    def rate(render):
+        start = time.perf_counter()
+        for _ in range(count):
+            render(receipt, io.BytesIO())
+        return count / (time.perf_counter() - start)
+
+    use_a85 = rl_config.useA85
+    rl_config.useA85 = 1
+    try:
+        before = rate(_render_unprepared)
+    finally:
+        rl_config.useA85 = use_a85
+    return {'before': before, 'after': rate(get_renderer().render)}
+
+
+# Process pool for batch rendering, created on first use
+_pool = None
+
+
+def render_pool_size():
+    """
+    RECEIPT_RENDER_WORKERS, or the cores shared out between the gunicorn
+    workers (WEB_CONCURRENCY) so their pools together use each core once.
+    """
+    configured = int(os.environ.get('RECEIPT_RENDER_WORKERS', 0))
+    if configured:
+        return configured
+    web_workers = int(os.environ.get('WEB_CONCURRENCY', 0)) or 1
+    return max(1, (os.cpu_count() or 1) // web_workers)
+
+
+def get_render_pool():
+    """
+    Process pool rendering receipts, one per process, sized by
+    render_pool_size(). Workers are spawned (not forked from a threaded web
+    worker) and build their renderer on start.
+    """
+    global _pool
+    if _pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+
+        workers = render_pool_size()
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=get_renderer
+        )
+    return _pool
+
+
+def reset_render_pool():
+    """Drop a broken pool so the next batch starts a fresh one"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+def render_receipt_data(serial_number, donor_name, amount, date):
+    """Pool task: render one receipt from plain values and return the PDF bytes"""
+    from types import SimpleNamespace
+
+    receipt = SimpleNamespace(
+        serial_number=serial_number, donor_name=donor_name, amount=amount, date=date
+    )
+    return render_receipt_bytes(receipt)
+
 
-    return output_path
+def render_receipt_file(serial_number, donor_name, amount, date, output_path):
+    """Pool task: render one receipt from plain values (ORM objects don't pickle)"""
+    from types import SimpleNamespace
+
+    receipt = SimpleNamespace(
+        serial_number=serial_number, donor_name=donor_name, amount=amount, date=date
+    )
+    return generate_receipt_pdf(receipt, output_path)
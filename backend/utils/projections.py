@@ -0,0 +1,109 @@
+"""Column-only projections used by list endpoints instead of ORM objects + to_dict()"""
+from extensions import db
+from sqlalchemy import select
+from models import Credit, Expense, Item, Distribution, Receipt
+
+
+class Projection:
+    """
+    A resource's JSON fields as labelled column expressions over one model.
+
+    Related values (a credit's receipt serial, a distribution's item name)
+    are correlated primary-key lookups in the same SELECT, so serializing a
+    page costs one query however many rows it holds. Unlike a join they
+    leave the FROM clause to the base table, so paginate()'s COUNT can
+    still be answered from an index.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+
+    def query(self, fields=None, keys=()):
+        """
+        A query selecting `fields` (default: all), labelled with their JSON
+        names, followed by any `keys` not already selected. Keys are the
+        ordering columns keyset_page() reads back from the last row.
+        """
+        names = list(fields or self.fields)
+        names += [key for key in keys if key not in names]
+        return db.session.query(
+            *[self.fields[name].label(name) for name in names]
+        ).select_from(self.model)
+
+    def to_dict(self, row, fields=None):
+        """
+        Map a row from query(fields) to its JSON object. Values are left raw;
+        the app's JSON provider writes dates in ISO format.
+        """
+        return dict(zip(fields or self.fields, row))
+
+
+def _lookup(column, key, foreign_key):
+    """Scalar subquery fetching `column` from the row whose `key` equals `foreign_key`"""
+    return select(column).where(key == foreign_key).correlate_except(column.table).scalar_subquery()
+
+
+CREDIT = Projection(Credit, {
+    'id': Credit.id,
+    'donor_name': Credit.donor_name,
+    'amount': Credit.amount,
+    'date': Credit.date,
+    'purpose': Credit.purpose,
+    'payment_method': Credit.payment_method,
+    'contact_info': Credit.contact_info,
+    'receipt_serial': _lookup(Receipt.serial_number, Receipt.id, Credit.receipt_id),
+    'created_at': Credit.created_at
+})
+
+EXPENSE = Projection(Expense, {
+    'id': Expense.id,
+    'amount': Expense.amount,
+    'date': Expense.date,
+    'purpose': Expense.purpose,
+    'category': Expense.category,
+    'beneficiary_name': Expense.beneficiary_name,
+    'document_path': Expense.document_path,
+    'created_at': Expense.created_at
+})
+
+ITEM = Projection(Item, {
+    'id': Item.id,
+    'name': Item.name,
+    'category': Item.category,
+    'total_quantity': Item.total_quantity,
+    'available_quantity': Item.available_quantity,
+    'distributed_quantity': Item.total_quantity - Item.available_quantity,
+    'condition': Item.condition,
+    'location': Item.location,
+    'photo_path': Item.photo_path,
+    'description': Item.description,
+    'created_at': Item.created_at
+})
+
+DISTRIBUTION = Projection(Distribution, {
+    'id': Distribution.id,
+    'item_id': Distribution.item_id,
+    'item_name': _lookup(Item.name, Item.id, Distribution.item_id),
+    'recipient_name': Distribution.recipient_name,
+    'recipient_contact': Distribution.recipient_contact,
+    'quantity': Distribution.quantity,
+    'distribution_date': Distribution.distribution_date,
+    'expected_return_date': Distribution.expected_return_date,
+    'actual_return_date': Distribution.actual_return_date,
+    'return_condition': Distribution.return_condition,
+    'notes': Distribution.notes,
+    'status': Distribution.status,
+    'created_at': Distribution.created_at
+})
+
+RECEIPT = Projection(Receipt, {
+    'id': Receipt.id,
+    'serial_number': Receipt.serial_number,
+    'donor_name': Receipt.donor_name,
+    'amount': Receipt.amount,
+    'date': Receipt.date,
+    'pdf_path': Receipt.pdf_path,
+    'emailed_to': Receipt.emailed_to,
+    'created_at': Receipt.created_at
+})
@@ -0,0 +1,20 @@
+"""`flask check-query-plans`: run the EXPLAIN and query-count tests in tests/"""
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERY_PLAN_TESTS = ['tests/test_query_plans.py', 'tests/test_query_counts.py']
+
+
+def run_query_plan_checks():
+    """
+    Run the query plan and query count tests against a scratch SQLite
+    database with every migration applied, never the configured one. A
+    separate interpreter, because the tests import the app with their own
+    DATABASE_URL. Needs requirements-dev.txt. Returns pytest's exit code.
+    """
+    return subprocess.call(
+        [sys.executable, '-m', 'pytest', '-q', *QUERY_PLAN_TESTS], cwd=BACKEND_DIR
+    )
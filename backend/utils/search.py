@@ -0,0 +1,243 @@
+"""Full-text search index over credits, expenses, items, distributions and receipts"""
+from extensions import db
+from models import Credit, Expense, Item, Distribution, Receipt
+from sqlalchemy import text, or_, inspect, Integer, Float, func, literal, union_all
+import re
+
+# Kind codes are folded into the SQLite rowid (ref_id * 8 + code) so a
+# document can be replaced or removed by rowid instead of scanning the index
+KIND_CODES = {
+    'credit': 1,
+    'expense': 2,
+    'item': 3,
+    'distribution': 4,
+    'receipt': 5
+}
+
+# Set once the index exists for the current database; until then search
+# falls back to ILIKE filters. The index is created by a migration.
+_available = False
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def _terms(term):
+    """Split user input into index tokens"""
+    return re.findall(r'\w+', term.lower())
+
+
+def _match_expression(terms):
+    """Build a prefix query for every token, all of which must match"""
+    if _dialect() == 'sqlite':
+        return ' '.join(f'"{t}"*' for t in terms)
+    return ' & '.join(f'{t}:*' for t in terms)
+
+
+def document_for(kind, obj):
+    """Return the (title, body) text indexed for a record"""
+    if kind == 'credit':
+        return obj.donor_name, obj.purpose
+    if kind == 'expense':
+        return obj.beneficiary_name or '', obj.purpose
+    if kind == 'item':
+        return obj.name, obj.description or ''
+    if kind == 'distribution':
+        return obj.recipient_name, obj.recipient_contact or ''
+    if kind == 'receipt':
+        return obj.serial_number, obj.donor_name
+    raise ValueError(f'Unknown search kind: {kind}')
+
+
+def _fallback_columns(kind):
+    """The model and (title, body) column expressions matching document_for"""
+    if kind == 'credit':
+        return Credit, (Credit.donor_name, Credit.purpose)
+    if kind == 'expense':
+        return Expense, (func.coalesce(Expense.beneficiary_name, ''), Expense.purpose)
+    if kind == 'item':
+        return Item, (Item.name, func.coalesce(Item.description, ''))
+    if kind == 'distribution':
+        return Distribution, (Distribution.recipient_name, func.coalesce(Distribution.recipient_contact, ''))
+    if kind == 'receipt':
+        return Receipt, (Receipt.serial_number, Receipt.donor_name)
+    raise ValueError(f'Unknown search kind: {kind}')
+
+
+def _fallback_search(term, kinds, limit):
+    """
+    search() without the index: an ILIKE substring match on the indexed
+    columns of each kind, unranked (rank 0), newest records first. Scans the
+    base tables, so it is only meant to bridge the gap until the migration
+    has run.
+    """
+    selects = []
+    for kind in kinds:
+        model, (title, body) = _fallback_columns(kind)
+        selects.append(
+            db.select(
+                literal(kind).label('kind'), model.id.label('ref_id'),
+                title.label('title'), body.label('body'), literal(0.0, Float).label('rank')
+            ).where(or_(title.ilike(f'%{term}%'), body.ilike(f'%{term}%')))
+        )
+    query = union_all(*selects).subquery()
+    rows = db.session.execute(
+        db.select(query).order_by(query.c.ref_id.desc()).limit(limit)
+    )
+    return [tuple(row) for row in rows]
+
+
+def ensure_search_index():
+    """Use the index if the migration created it, backfilling it while empty"""
+    global _available
+
+    try:
+        if not inspect(db.engine).has_table('search_index'):
+            _available = False
+            print("⚠ Search index missing (run `flask db upgrade`), falling back to ILIKE")
+            return False
+
+        # An empty index is (re)filled on every start, so a backfill that
+        # failed part way is retried rather than left empty for good
+        _available = True
+        if db.session.execute(text("SELECT 1 FROM search_index LIMIT 1")).first() is None:
+            rebuild_search_index()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        _available = False
+        print(f"⚠ Search index unavailable, falling back to ILIKE: {e}")
+        return False
+
+    return True
+
+
+def index_document(kind, obj):
+    """Insert or replace the index entry for a record in the current transaction"""
+    if not _available:
+        return
+    if obj.id is None:
+        db.session.flush()
+    index_documents(kind, [obj])
+
+
+def index_documents(kind, objs):
+    """Insert or replace index entries for many records of one kind"""
+    if not _available or not objs:
+        return
+    code = KIND_CODES[kind]
+    params = []
+    for obj in objs:
+        title, body = document_for(kind, obj)
+        params.append({
+            'rowid': obj.id * 8 + code,
+            'kind': kind,
+            'ref_id': obj.id,
+            'title': title,
+            'body': body
+        })
+
+    if _dialect() == 'sqlite':
+        db.session.execute(text(
+            "INSERT OR REPLACE INTO search_index (rowid, kind, ref_id, title, body) "
+            "VALUES (:rowid, :kind, :ref_id, :title, :body)"
+        ), params)
+    else:
+        db.session.execute(text(
+            "INSERT INTO search_index (kind, ref_id, title, body) "
+            "VALUES (:kind, :ref_id, :title, :body) "
+            "ON CONFLICT (kind, ref_id) DO UPDATE SET title = EXCLUDED.title, body = EXCLUDED.body"
+        ), params)
+
+
+def remove_document(kind, ref_id):
+    """Drop the index entry for a deleted record in the current transaction"""
+    if not _available:
+        return
+    if _dialect() == 'sqlite':
+        db.session.execute(
+            text("DELETE FROM search_index WHERE rowid = :rowid"),
+            {'rowid': ref_id * 8 + KIND_CODES[kind]}
+        )
+    else:
+        db.session.execute(
+            text("DELETE FROM search_index WHERE kind = :kind AND ref_id = :ref_id"),
+            {'kind': kind, 'ref_id': ref_id}
+        )
+
+
+def rebuild_search_index():
+    """Re-index every searchable record from the base tables"""
+    if not _available:
+        return 0
+    db.session.execute(text("DELETE FROM search_index"))
+
+    count = 0
+    for kind, model in (('credit', Credit), ('expense', Expense), ('item', Item),
+                        ('distribution', Distribution), ('receipt', Receipt)):
+        batch = []
+        for obj in model.query.yield_per(1000):
+            batch.append(obj)
+            if len(batch) == 1000:
+                index_documents(kind, batch)
+                count += len(batch)
+                batch = []
+        index_documents(kind, batch)
+        count += len(batch)
+    return count
+
+
+def search_filter(kind, term, id_column, fallback_columns):
+    """
+    Filter expression restricting `id_column` to records matching `term`.
+
+    Uses the index when available, otherwise ILIKE over `fallback_columns`.
+    """
+    terms = _terms(term)
+    if not _available or not terms:
+        return or_(*[column.ilike(f'%{term}%') for column in fallback_columns])
+
+    if _dialect() == 'sqlite':
+        matches = text(
+            "SELECT ref_id FROM search_index WHERE search_index MATCH :q AND kind = :kind"
+        )
+    else:
+        matches = text(
+            "SELECT ref_id FROM search_index "
+            "WHERE document @@ to_tsquery('simple', :q) AND kind = :kind"
+        )
+    matches = matches.bindparams(q=_match_expression(terms), kind=kind).columns(ref_id=Integer)
+    return id_column.in_(matches)
+
+
+def search(term, kinds=None, limit=20):
+    """
+    Return ranked (kind, ref_id, title, body, rank) tuples, best match first.
+    Without the index, records containing `term` are returned unranked.
+    """
+    kinds = [k for k in (kinds or KIND_CODES) if k in KIND_CODES]
+    terms = _terms(term)
+    if not kinds or not term.strip():
+        return []
+    if not _available or not terms:
+        return _fallback_search(term.strip(), kinds, limit)
+    kind_params = {f'kind{i}': k for i, k in enumerate(kinds)}
+    kind_list = ', '.join(f':{name}' for name in kind_params)
+
+    if _dialect() == 'sqlite':
+        sql = (
+            "SELECT kind, ref_id, title, body, -bm25(search_index, 0, 0, 2.0, 1.0) AS rank "
+            "FROM search_index WHERE search_index MATCH :q "
+            f"AND kind IN ({kind_list}) ORDER BY rank DESC LIMIT :limit"
+        )
+    else:
+        sql = (
+            "SELECT kind, ref_id, title, body, "
+            "ts_rank(document, to_tsquery('simple', :q)) AS rank "
+            "FROM search_index WHERE document @@ to_tsquery('simple', :q) "
+            f"AND kind IN ({kind_list}) ORDER BY rank DESC LIMIT :limit"
+        )
+    rows = db.session.execute(
+        text(sql), {'q': _match_expression(terms), 'limit': limit, **kind_params}
+    )
+    return [tuple(row) for row in rows]
@@ -0,0 +1,78 @@
+"""JSON encoding for API responses and ?fields= sparse fieldset parsing"""
+from flask.json.provider import DefaultJSONProvider
+from datetime import date, datetime
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+
+
+class InvalidFields(ValueError):
+    """Raised when ?fields= names a field the resource does not have"""
+
+
+class APIJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson when it is installed.
+
+    Dates and datetimes are written in ISO 8601 either way, so serializers
+    can hand raw column values to jsonify instead of calling isoformat()
+    per field.
+    """
+
+    sort_keys = False
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (date, datetime)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Pretty-printed debug output goes through the stdlib encoder
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def dumps_bytes(obj):
+    """Encode `obj` to UTF-8 JSON bytes"""
+    if orjson is None:
+        return dumps(obj).encode()
+    return orjson.dumps(obj, default=APIJSONProvider.default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def dumps(obj):
+    """Encode `obj` to a JSON string"""
+    if orjson is None:
+        import json
+        return json.dumps(obj, default=APIJSONProvider.default, separators=(',', ':'))
+    return dumps_bytes(obj).decode()
+
+
+def parse_fields(value, allowed):
+    """
+    Split a comma-separated ?fields= value into field names.
+
+    Returns None when the parameter is absent or empty (meaning every field)
+    and raises InvalidFields for names not in `allowed`.
+    """
+    if not value:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise InvalidFields(f"Unknown field(s): {', '.join(unknown)}")
+    return names or None
@@ -0,0 +1,61 @@
+"""Gap-free receipt serial numbers from a per-year counter row"""
+from extensions import db
+from models import Receipt, ReceiptSequence
+from sqlalchemy import update, func, cast, Integer
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime
+
+SERIAL_PREFIX = 'RCP'
+
+
+def format_serial(year, number):
+    return f'{SERIAL_PREFIX}-{year}-{number:04d}'
+
+
+def _existing_max(year):
+    """Highest number already issued for `year`, for seeding a new counter row"""
+    prefix = f'{SERIAL_PREFIX}-{year}-'
+    number = cast(func.substr(Receipt.serial_number, len(prefix) + 1), Integer)
+    return db.session.query(func.max(number)).filter(
+        Receipt.serial_number.like(f'{prefix}%')
+    ).scalar() or 0
+
+
+def _create_counter(year):
+    """Insert the counter row for `year` unless a concurrent request already did"""
+    dialect = db.session.get_bind().dialect.name
+    values = {'year': year, 'last_number': _existing_max(year)}
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        db.session.execute(
+            insert(ReceiptSequence.__table__).values(**values).on_conflict_do_nothing(index_elements=['year'])
+        )
+    else:
+        db.session.execute(ReceiptSequence.__table__.insert().values(**values))
+
+
+def allocate_serials(count=1, year=None):
+    """
+    Reserve `count` consecutive serial numbers for `year` (default: this
+    year) in the caller's transaction and return them in order.
+
+    A single `UPDATE ... RETURNING` advances the counter, so allocation is
+    O(1) however many receipts exist. The counter row stays locked until
+    the caller commits; if it rolls back, the numbers are released with
+    it, which keeps the sequence free of gaps.
+    """
+    year = year or datetime.now().year
+    table = ReceiptSequence.__table__
+    stmt = (
+        update(table)
+        .where(table.c.year == year)
+        .values(last_number=table.c.last_number + count)
+        .returning(table.c.last_number)
+    )
+
+    last = db.session.execute(stmt).scalar_one_or_none()
+    if last is None:
+        _create_counter(year)
+        last = db.session.execute(stmt).scalar_one()
+
+    return [format_serial(year, number) for number in range(last - count + 1, last + 1)]
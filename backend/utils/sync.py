@@ -0,0 +1,68 @@
+"""Delta sync: rows changed or deleted since a client's last sync token"""
+from extensions import db
+from models import Credit, Expense, Item, Distribution, Tombstone
+from utils.projections import CREDIT, EXPENSE, ITEM, DISTRIBUTION
+from sqlalchemy import delete
+from datetime import datetime, timedelta
+from utils.pagination import encode_cursor, decode_cursor
+
+# Tables a client can mirror, keyed by the name used in sync responses
+SYNC_MODELS = {
+    'credits': (Credit, CREDIT),
+    'expenses': (Expense, EXPENSE),
+    'items': (Item, ITEM),
+    'distributions': (Distribution, DISTRIBUTION)
+}
+
+# updated_at is stamped before commit, so a transaction that commits just
+# after a sync can carry a slightly older timestamp; re-send that window
+SYNC_OVERLAP = timedelta(seconds=30)
+
+# Tokens older than this get a full resync, and tombstones past it are pruned
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+
+def new_token(now):
+    return encode_cursor([now])
+
+
+def parse_token(token):
+    """Return the timestamp encoded in a sync token"""
+    return decode_cursor(token, [datetime])[0]
+
+
+def record_tombstone(table_name, row_id):
+    """Remember a delete in the caller's transaction and prune expired tombstones"""
+    now = datetime.utcnow()
+    db.session.execute(delete(Tombstone).where(Tombstone.deleted_at < now - TOMBSTONE_RETENTION))
+    db.session.add(Tombstone(table_name=table_name, row_id=row_id, deleted_at=now))
+
+
+def collect_changes(since=None):
+    """
+    Gather rows updated after `since` plus tombstones, or everything if None.
+    
+    Returns (changes, deleted, full, token): `full` tells the client to
+    replace its copy rather than merge, `token` is what it sends next time.
+    """
+    now = datetime.utcnow()
+    full = since is None or since < now - TOMBSTONE_RETENTION
+    cutoff = None if full else since - SYNC_OVERLAP
+    
+    changes = {}
+    for name, (model, projection) in SYNC_MODELS.items():
+        query = projection.query()
+        if cutoff is not None:
+            query = query.filter(model.updated_at > cutoff)
+        changes[name] = [projection.to_dict(row) for row in query.order_by(model.updated_at)]
+    
+    deleted = {name: [] for name in SYNC_MODELS}
+    if cutoff is not None:
+        tombstones = db.session.query(Tombstone.table_name, Tombstone.row_id).filter(
+            Tombstone.deleted_at > cutoff
+        )
+        for table_name, row_id in tombstones:
+            if table_name in deleted:
+                deleted[table_name].append(row_id)
+    
+    return changes, deleted, full, new_token(now)
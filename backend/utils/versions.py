@@ -0,0 +1,107 @@
+"""Per-table write counters and conditional GET (ETag / 304) support"""
+from flask import request, make_response, current_app, g
+from functools import wraps
+from extensions import db
+from models import TableVersion
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+import hashlib
+
+# Tables whose writes change what read endpoints return
+VERSIONED_TABLES = (
+    'credits', 'expenses', 'items', 'distributions', 'receipts', 'overdue_distributions'
+)
+
+
+def ensure_versions():
+    """Create a counter row for every versioned table that lacks one"""
+    existing = {name for (name,) in db.session.query(TableVersion.table_name)}
+    for name in VERSIONED_TABLES:
+        if name not in existing:
+            db.session.add(TableVersion(table_name=name, version=0))
+    db.session.commit()
+
+
+def bump_versions(*tables, connection=None):
+    """
+    Increment the counters for `tables` inside the current transaction.
+
+    ORM writes are picked up by the flush listener below; call this directly
+    after Core INSERT/UPDATE statements, which bypass the session.
+    """
+    tables = sorted(set(tables).intersection(VERSIONED_TABLES))
+    if not tables:
+        return
+    stmt = (
+        update(TableVersion.__table__)
+        .where(TableVersion.table_name.in_(tables))
+        .values(version=TableVersion.version + 1)
+    )
+    (connection or db.session).execute(stmt)
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_on_flush(session, flush_context, instances):
+    tables = set()
+    for obj in session.new | session.deleted:
+        tables.add(getattr(obj, '__tablename__', None))
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            tables.add(getattr(obj, '__tablename__', None))
+    bump_versions(*tables, connection=session.connection())
+
+
+def current_versions(tables):
+    """
+    Return {table: version} for `tables` in one lookup, remembered for the
+    rest of the request so stacked decorators share it.
+    """
+    known = g.setdefault('table_versions', {})
+    missing = [name for name in tables if name not in known]
+    if missing:
+        rows = db.session.query(TableVersion.table_name, TableVersion.version).filter(
+            TableVersion.table_name.in_(missing)
+        )
+        known.update(rows.all())
+    return {name: known[name] for name in tables if name in known}
+
+
+def _etag_for(tables, depends_on=None):
+    versions = current_versions(tables)
+    payload = '|'.join(
+        [f'{name}={versions.get(name, 0)}' for name in sorted(tables)]
+        + [request.full_path, request.headers.get('Accept', '')]
+        + ([str(depends_on())] if depends_on else [])
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def etag(*tables, depends_on=None):
+    """
+    Tag a GET endpoint's response with a weak ETag built from the versions of
+    `tables` and the request's query string, and answer a matching
+    If-None-Match with 304 without running the view.
+
+    A response that also changes without any write (e.g. it depends on
+    today's date) passes `depends_on`, a callable returning that state; its
+    result is folded into the tag.
+
+    Versions are read before the view runs, so a write racing the request can
+    only leave the tag older than the body (costing one extra full response),
+    never newer.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            tag = _etag_for(tables, depends_on)
+            if request.if_none_match.contains_weak(tag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(tag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -1,7 +1,80 @@
-import React, { createContext, useContext, useState, useCallback, useEffect } from 'react';
+import React, { createContext, useContext, useState, useCallback, useEffect, useRef } from 'react';
 import { Credit, Expense, Item, Distribution, DashboardMetrics, Transaction } from '@/types';
 import api from '@/lib/api';
 
+const mapCredit = (c: any): Credit => ({
+  id: String(c.id),
+  serialNumber: c.receipt_serial || `RCP-${new Date().getFullYear()}-${String(c.id).padStart(4, '0')}`,
+  donorName: c.donor_name,
+  amount: c.amount,
+  date: c.date,
+  purpose: c.purpose,
+  paymentMethod: c.payment_method,
+  contactInfo: c.contact_info,
+  createdAt: c.created_at,
+});
+
+const mapExpense = (e: any): Expense => ({
+  id: String(e.id),
+  amount: e.amount,
+  date: e.date,
+  purpose: e.purpose,
+  category: e.category,
+  beneficiaryName: e.beneficiary_name || '',
+  documentPath: e.document_path || undefined,
+  createdAt: e.created_at,
+});
+
+const mapItem = (i: any): Item => ({
+  id: String(i.id),
+  name: i.name,
+  category: i.category,
+  totalQuantity: i.total_quantity,
+  availableQuantity: i.available_quantity,
+  distributedQuantity: i.distributed_quantity,
+  condition: i.condition,
+  location: i.location,
+  description: i.description,
+  createdAt: i.created_at,
+});
+
+const mapDistribution = (d: any): Distribution => ({
+  id: String(d.id),
+  itemId: String(d.item_id),
+  itemName: d.item_name || '',
+  quantity: d.quantity,
+  recipientName: d.recipient_name,
+  recipientContact: d.recipient_contact,
+  distributedDate: d.distribution_date,
+  expectedReturnDate: d.expected_return_date,
+  returnedDate: d.actual_return_date,
+  conditionOnReturn: d.return_condition,
+  status: d.status,
+});
+
+// Apply a sync delta to a local list: replace on a full sync, otherwise
+// upsert changed rows by id and drop deleted ones
+function mergeRows<T extends { id: string }>(
+  current: T[],
+  changed: T[],
+  deletedIds: number[],
+  full: boolean,
+  compare: (a: T, b: T) => number
+): T[] {
+  if (full) return [...changed].sort(compare);
+  if (changed.length === 0 && deletedIds.length === 0) return current;
+
+  const byId = new Map(current.map(row => [row.id, row]));
+  deletedIds.forEach(id => byId.delete(String(id)));
+  changed.forEach(row => byId.set(row.id, row));
+  return Array.from(byId.values()).sort(compare);
+}
+
+const byDateDesc = (key: string) => (a: any, b: any) =>
+  String(b[key]).localeCompare(String(a[key])) || Number(b.id) - Number(a.id);
+
+const byName = (a: Item, b: Item) => a.name.localeCompare(b.name);
+
 interface DataContextType {
   credits: Credit[];
   expenses: Expense[];
@@ -35,97 +108,8 @@ export function DataProvider({ children }: { children: React.ReactNode }) {
     availableItems: 0,
   });
 
-  // Fetch data from API on mount (only if authenticated)
-  useEffect(() => {
-    const token = localStorage.getItem('auth_token');
-    if (!token) return;
-
-    const fetchData = async () => {
-      try {
-        // Fetch dashboard metrics
-        const metricsRes = await api.getDashboardMetrics();
-        if (metricsRes.data) {
-          setMetrics({
-            totalCollected: metricsRes.data.financial.total_collected,
-            totalSpent: metricsRes.data.financial.total_spent,
-            availableBalance: metricsRes.data.financial.available_balance,
-            totalItems: metricsRes.data.inventory.total_items,
-            distributedItems: metricsRes.data.inventory.distributed_items,
-            availableItems: metricsRes.data.inventory.available_items,
-          });
-        }
-
-        // Fetch credits (all records)
-        const creditsRes = await api.getCredits({ per_page: '10000' });
-        if (creditsRes.data?.credits) {
-          setCredits(creditsRes.data.credits.map((c: any) => ({
-            id: String(c.id),
-            serialNumber: c.receipt_serial || `RCP-${new Date().getFullYear()}-${String(c.id).padStart(4, '0')}`,
-            donorName: c.donor_name,
-            amount: c.amount,
-            date: c.date,
-            purpose: c.purpose,
-            paymentMethod: c.payment_method,
-            contactInfo: c.contact_info,
-            createdAt: c.created_at,
-          })));
-        }
-
-        // Fetch expenses (all records)
-        const expensesRes = await api.getExpenses({ per_page: '10000' });
-        if (expensesRes.data?.expenses) {
-          setExpenses(expensesRes.data.expenses.map((e: any) => ({
-            id: String(e.id),
-            amount: e.amount,
-            date: e.date,
-            purpose: e.purpose,
-            category: e.category,
-            beneficiaryName: e.beneficiary_name,
-            createdAt: e.created_at,
-          })));
-        }
-
-        // Fetch items (all records)
-        const itemsRes = await api.getItems({ per_page: '10000' });
-        if (itemsRes.data?.items) {
-          setItems(itemsRes.data.items.map((i: any) => ({
-            id: String(i.id),
-            name: i.name,
-            category: i.category,
-            totalQuantity: i.total_quantity,
-            availableQuantity: i.available_quantity,
-            distributedQuantity: i.distributed_quantity,
-            condition: i.condition,
-            location: i.location,
-            description: i.description,
-            createdAt: i.created_at,
-          })));
-        }
-
-        // Fetch distributions (all records)
-        const distributionsRes = await api.getDistributions({ per_page: '10000' });
-        if (distributionsRes.data?.distributions) {
-          setDistributions(distributionsRes.data.distributions.map((d: any) => ({
-            id: String(d.id),
-            itemId: String(d.item_id),
-            itemName: d.item_name || '',
-            quantity: d.quantity,
-            recipientName: d.recipient_name,
-            recipientContact: d.recipient_contact,
-            distributedDate: d.distribution_date,
-            expectedReturnDate: d.expected_return_date,
-            returnedDate: d.actual_return_date,
-            conditionOnReturn: d.return_condition,
-            status: d.status,
-          })));
-        }
-      } catch (error) {
-        console.error('Error fetching data:', error);
-      }
-    };
-
-    fetchData();
-  }, []);
+  // Token from the last /api/sync call; refreshes only fetch what changed since
+  const syncToken = useRef<string | null>(null);
 
   const getNextReceiptNumber = useCallback(() => {
     const year = new Date().getFullYear();
@@ -151,71 +135,28 @@ export function DataProvider({ children }: { children: React.ReactNode }) {
         });
       }
 
-      const creditsRes = await api.getCredits({ per_page: '10000' });
-      if (creditsRes.data?.credits) {
-        setCredits(creditsRes.data.credits.map((c: any) => ({
-          id: String(c.id),
-          serialNumber: c.receipt_serial || `RCP-${new Date().getFullYear()}-${String(c.id).padStart(4, '0')}`,
-          donorName: c.donor_name,
-          amount: c.amount,
-          date: c.date,
-          purpose: c.purpose,
-          paymentMethod: c.payment_method,
-          contactInfo: c.contact_info,
-          createdAt: c.created_at,
-        })));
-      }
-
-      const expensesRes = await api.getExpenses({ per_page: '10000' });
-      if (expensesRes.data?.expenses) {
-        setExpenses(expensesRes.data.expenses.map((e: any) => ({
-          id: String(e.id),
-          amount: e.amount,
-          date: e.date,
-          purpose: e.purpose,
-          category: e.category,
-          beneficiaryName: e.beneficiary_name || '',
-          createdAt: e.created_at,
-        })));
-      }
-
-      const itemsRes = await api.getItems({ per_page: '10000' });
-      if (itemsRes.data?.items) {
-        setItems(itemsRes.data.items.map((i: any) => ({
-          id: String(i.id),
-          name: i.name,
-          category: i.category,
-          totalQuantity: i.total_quantity,
-          availableQuantity: i.available_quantity,
-          distributedQuantity: i.distributed_quantity,
-          condition: i.condition,
-          location: i.location,
-          description: i.description,
-          createdAt: i.created_at,
-        })));
-      }
+      const syncRes = await api.sync(syncToken.current);
+      const delta = syncRes.data;
+      if (!delta) return;
 
-      const distributionsRes = await api.getDistributions({ per_page: '10000' });
-      if (distributionsRes.data?.distributions) {
-        setDistributions(distributionsRes.data.distributions.map((d: any) => ({
-          id: String(d.id),
-          itemId: String(d.item_id),
-          itemName: d.item_name || '',
-          quantity: d.quantity,
-          recipientName: d.recipient_name,
-          recipientContact: d.recipient_contact,
-          distributedDate: d.distribution_date,
-          expectedReturnDate: d.expected_return_date,
-          returnedDate: d.actual_return_date,
-          conditionOnReturn: d.return_condition,
-          status: d.status,
-        })));
-      }
+      setCredits(prev => mergeRows(prev, delta.credits.map(mapCredit), delta.deleted.credits, delta.full, byDateDesc('date')));
+      setExpenses(prev => mergeRows(prev, delta.expenses.map(mapExpense), delta.deleted.expenses, delta.full, byDateDesc('date')));
+      setItems(prev => mergeRows(prev, delta.items.map(mapItem), delta.deleted.items, delta.full, byName));
+      setDistributions(prev => mergeRows(prev, delta.distributions.map(mapDistribution), delta.deleted.distributions, delta.full, byDateDesc('distributedDate')));
+      syncToken.current = delta.token;
     } catch (error) {
       console.error('Error refreshing data:', error);
     }
   }, []);
 
+  // Fetch data from API on mount (only if authenticated)
+  useEffect(() => {
+    const token = localStorage.getItem('auth_token');
+    if (!token) return;
+
+    refreshData();
+  }, [refreshData]);
+
   const recentTransactions: Transaction[] = [
     ...credits.map(c => ({ id: c.id, type: 'credit' as const, amount: c.amount, description: c.purpose, date: c.date, name: c.donorName })),
     ...expenses.map(e => ({ id: e.id, type: 'expense' as const, amount: e.amount, description: e.purpose, date: e.date, name: e.beneficiaryName || 'General Expense' })),
@@ -276,6 +217,7 @@ export function DataProvider({ children }: { children: React.ReactNode }) {
         purpose: expense.purpose,
         category: expense.category,
         beneficiary_name: expense.beneficiaryName,
+        document_path: expense.documentPath,
       });
       
       if (result.error) {
@@ -17,6 +17,16 @@ interface ApiResponse<T = any> {
   message?: string;
 }
 
+export interface SyncResponse {
+  token: string;
+  full: boolean;
+  credits: any[];
+  expenses: any[];
+  items: any[];
+  distributions: any[];
+  deleted: Record<'credits' | 'expenses' | 'items' | 'distributions', number[]>;
+}
+
 class ApiClient {
   private baseUrl: string;
   private token: string | null = null;
@@ -184,6 +194,30 @@ class ApiClient {
     return this.request(`/property/items${qs}`);
   }
 
+  async getItem(id: number) {
+    return this.request(`/property/items/${id}`);
+  }
+
+  async uploadItemPhoto(id: number, file: File) {
+    return this.request(`/property/items/${id}/photo`, {
+      method: 'PUT',
+      headers: { 'Content-Type': file.type || 'application/octet-stream' },
+      body: file,
+    });
+  }
+
+  // Thumbnail URL for an item's photo_path (sizes: 160, 480, 1024); usable in <img src>
+  itemPhotoUrl(photoPath: string | null | undefined, size: 160 | 480 | 1024 = 160) {
+    if (!photoPath || !photoPath.startsWith('items/')) return null;
+    const name = photoPath.slice('items/'.length).replace(/\.[^.]+$/, '');
+    return `${this.baseUrl}/property/photos/${name}-${size}.jpg`;
+  }
+
+  async getItemDistributions(id: number, params?: Record<string, string>) {
+    const qs = params ? `?${new URLSearchParams(params).toString()}` : '';
+    return this.request(`/property/items/${id}/distributions${qs}`);
+  }
+
   async distributeItem(data: any) {
     return this.request('/property/distributions', {
       method: 'POST',
@@ -191,11 +225,29 @@ class ApiClient {
     });
   }
 
+  async distributeBatch(data: {
+    distribution_date: string;
+    expected_return_date?: string;
+    notes?: string;
+    distributions?: any[];
+    items?: { item_id: number; quantity?: number }[];
+    recipients?: { recipient_name: string; recipient_contact?: string }[];
+  }) {
+    return this.request('/property/distributions/batch', {
+      method: 'POST',
+      body: JSON.stringify(data),
+    });
+  }
+
   async getDistributions(params?: Record<string, string>) {
     const qs = params ? `?${new URLSearchParams(params).toString()}` : '';
     return this.request(`/property/distributions${qs}`);
   }
 
+  async getOverdueDistributions() {
+    return this.request('/property/distributions/overdue');
+  }
+
   async returnItem(id: number, data?: any) {
     return this.request(`/property/distributions/${id}/return`, {
       method: 'POST',
@@ -203,6 +255,12 @@ class ApiClient {
     });
   }
 
+  // Sync: rows changed since the last token (everything when omitted)
+  async sync(since?: string | null) {
+    const qs = since ? `?${new URLSearchParams({ since }).toString()}` : '';
+    return this.request<SyncResponse>(`/sync${qs}`);
+  }
+
   // Receipts
   async generateReceipt(creditId: number) {
     return this.request(`/receipts/generate/${creditId}`, {
@@ -210,6 +268,29 @@ class ApiClient {
     });
   }
 
+  // Batch: { credit_ids: number[] } or { start_date, end_date }. Batches over 200
+  // receipts come back with a `job` instead of `generated`; poll it with getJob
+  async generateReceiptsBatch(selection: { credit_ids?: number[]; start_date?: string; end_date?: string }) {
+    return this.request<{
+      generated?: number;
+      allocated?: number;
+      job?: { id: number; status: string };
+      failed: { credit_id: number; receipt_id?: number; error: string }[];
+    }>(
+      '/receipts/generate/batch',
+      {
+        method: 'POST',
+        body: JSON.stringify(selection),
+      }
+    );
+  }
+
+  async getJob(id: number) {
+    return this.request<{ job: { id: number; status: string; error: string | null }; result?: any }>(
+      `/jobs/${id}/result`
+    );
+  }
+
   async getReceipts(params?: Record<string, string>) {
     const qs = params ? `?${new URLSearchParams(params).toString()}` : '';
     return this.request(`/receipts${qs}`);
@@ -252,6 +333,87 @@ class ApiClient {
     }
   }
 
+  async exportReceipts(filters: { format?: 'zip' | 'pdf'; search?: string; start_date?: string; end_date?: string } = {}) {
+    try {
+      const headers: HeadersInit = {};
+      const token = localStorage.getItem('auth_token');
+      if (token) {
+        headers['Authorization'] = `Bearer ${token}`;
+      }
+
+      const format = filters.format || 'zip';
+      const params = new URLSearchParams();
+      Object.entries({ ...filters, format }).forEach(([key, value]) => {
+        if (value) params.append(key, value);
+      });
+
+      const response = await fetch(
+        `${this.baseUrl}/receipts/export?${params.toString()}`,
+        { headers }
+      );
+
+      if (!response.ok) {
+        throw new Error('Failed to export receipts');
+      }
+
+      const blob = await response.blob();
+      const url = window.URL.createObjectURL(blob);
+
+      const a = document.createElement('a');
+      a.href = url;
+      a.download = `receipts.${format}`;
+      document.body.appendChild(a);
+      a.click();
+
+      window.URL.revokeObjectURL(url);
+      document.body.removeChild(a);
+
+      return { success: true };
+    } catch (error) {
+      return {
+        error: error instanceof Error ? error.message : 'Export failed',
+      };
+    }
+  }
+
+  // Chunked, resumable upload of an expense document; resolves to the stored document_path
+  async uploadDocument(file: File, onProgress?: (sent: number, total: number) => void) {
+    const start = await this.request<any>('/documents/uploads', {
+      method: 'POST',
+      body: JSON.stringify({ filename: file.name, size: file.size, content_type: file.type }),
+    });
+    if (start.error || !start.data) return { error: start.error || 'Upload failed' };
+
+    const { upload, max_chunk_size } = start.data;
+    // Stay under the server's per-request body limit
+    const chunkSize = Math.min(8 * 1024 * 1024, max_chunk_size - 1024);
+    let offset = upload.offset;
+    let retries = 0;
+
+    while (offset < file.size) {
+      const result = await this.request<any>(`/documents/uploads/${upload.id}`, {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/offset+octet-stream', 'Upload-Offset': String(offset) },
+        body: file.slice(offset, offset + chunkSize),
+      });
+      if (result.data?.upload) {
+        offset = result.data.upload.offset;
+        retries = 0;
+        onProgress?.(offset, file.size);
+        if (result.data.upload.status === 'complete') {
+          return { data: { document_path: result.data.upload.document_path, sha256: result.data.upload.sha256 } };
+        }
+        continue;
+      }
+      // Resume from wherever the server says the upload stands
+      if (++retries > 5) return { error: result.error || 'Upload failed' };
+      const status = await this.request<any>(`/documents/uploads/${upload.id}`);
+      if (!status.data?.upload) return { error: status.error || 'Upload failed' };
+      offset = status.data.upload.offset;
+    }
+    return { error: 'Upload failed' };
+  }
+
   async healthCheck() {
     return this.request('/health');
   }
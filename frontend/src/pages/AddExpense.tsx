@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useRef, useState } from 'react';
 import { DashboardLayout } from '@/components/layout/DashboardLayout';
 import { useData } from '@/contexts/DataContext';
 import { Button } from '@/components/ui/button';
@@ -6,7 +6,8 @@ import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
 import { Textarea } from '@/components/ui/textarea';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
-import { TrendingDown, Check, Upload, Loader2 } from 'lucide-react';
+import { TrendingDown, Check, Upload, Loader2, FileText, X } from 'lucide-react';
+import api from '@/lib/api';
 import { useToast } from '@/hooks/use-toast';
 
 const categories = [
@@ -30,6 +31,8 @@ export default function AddExpense() {
     beneficiaryName: '',
   });
   const [isSubmitting, setIsSubmitting] = useState(false);
+  const [attachment, setAttachment] = useState<{ name: string; path?: string; progress: number } | null>(null);
+  const fileInputRef = useRef<HTMLInputElement>(null);
 
   const formatCurrency = (amount: number) => {
     return new Intl.NumberFormat('en-IN', {
@@ -39,11 +42,40 @@ export default function AddExpense() {
     }).format(amount);
   };
 
+  const handleDocument = async (file: File | undefined) => {
+    if (!file) return;
+
+    setAttachment({ name: file.name, progress: 0 });
+    const result = await api.uploadDocument(file, (sent, total) =>
+      setAttachment(prev => prev && { ...prev, progress: Math.round((sent / total) * 100) })
+    );
+
+    if (result.error || !result.data) {
+      setAttachment(null);
+      toast({
+        title: "Upload Failed",
+        description: result.error || "Could not upload the document.",
+        variant: "destructive",
+      });
+      return;
+    }
+    setAttachment({ name: file.name, path: result.data.document_path, progress: 100 });
+  };
+
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
 
     if (isSubmitting) return;
 
+    if (attachment && !attachment.path) {
+      toast({
+        title: "Upload In Progress",
+        description: "Please wait for the document to finish uploading.",
+        variant: "destructive",
+      });
+      return;
+    }
+
     if (!formData.amount || !formData.purpose) {
       toast({
         title: "Validation Error",
@@ -72,6 +104,7 @@ export default function AddExpense() {
         purpose: formData.purpose,
         category: formData.category,
         beneficiaryName: formData.beneficiaryName || undefined,
+        documentPath: attachment?.path,
       });
 
       toast({
@@ -87,6 +120,7 @@ export default function AddExpense() {
         category: 'other',
         beneficiaryName: '',
       });
+      setAttachment(null);
     } catch (error) {
       toast({
         title: "Error",
@@ -196,15 +230,50 @@ export default function AddExpense() {
 
             <div className="space-y-2 md:col-span-2">
               <Label>Supporting Documents (Optional)</Label>
-              <div className="border-2 border-dashed border-border rounded-lg p-8 text-center hover:border-primary/50 transition-colors cursor-pointer">
-                <Upload className="w-8 h-8 mx-auto text-muted-foreground mb-2" />
-                <p className="text-sm text-muted-foreground">
-                  Click to upload or drag and drop
-                </p>
-                <p className="text-xs text-muted-foreground mt-1">
-                  PDF, JPG, PNG (max 5MB)
-                </p>
-              </div>
+              <input
+                ref={fileInputRef}
+                type="file"
+                accept=".pdf,.jpg,.jpeg,.png"
+                className="hidden"
+                onChange={(e) => {
+                  handleDocument(e.target.files?.[0]);
+                  e.target.value = '';
+                }}
+              />
+              {attachment ? (
+                <div className="flex items-center gap-3 border border-border rounded-lg p-4">
+                  <FileText className="w-6 h-6 text-muted-foreground" />
+                  <div className="flex-1 min-w-0">
+                    <p className="text-sm truncate">{attachment.name}</p>
+                    <p className="text-xs text-muted-foreground">
+                      {attachment.path ? 'Uploaded' : `Uploading... ${attachment.progress}%`}
+                    </p>
+                  </div>
+                  {attachment.path && (
+                    <Button type="button" variant="ghost" size="icon" onClick={() => setAttachment(null)}>
+                      <X className="w-4 h-4" />
+                    </Button>
+                  )}
+                </div>
+              ) : (
+                <div
+                  className="border-2 border-dashed border-border rounded-lg p-8 text-center hover:border-primary/50 transition-colors cursor-pointer"
+                  onClick={() => fileInputRef.current?.click()}
+                  onDragOver={(e) => e.preventDefault()}
+                  onDrop={(e) => {
+                    e.preventDefault();
+                    handleDocument(e.dataTransfer.files?.[0]);
+                  }}
+                >
+                  <Upload className="w-8 h-8 mx-auto text-muted-foreground mb-2" />
+                  <p className="text-sm text-muted-foreground">
+                    Click to upload or drag and drop
+                  </p>
+                  <p className="text-xs text-muted-foreground mt-1">
+                    PDF, JPG, PNG
+                  </p>
+                </div>
+              )}
             </div>
           </div>
 
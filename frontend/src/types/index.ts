@@ -17,6 +17,7 @@ export interface Expense {
   purpose: string;
   category: 'medical' | 'educational' | 'emergency' | 'events' | 'rent' | 'other';
   beneficiaryName?: string;
+  documentPath?: string;
   createdAt: string;
 }
 